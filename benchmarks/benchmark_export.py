@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Name:    benchmark_export.py
+# Purpose: Measure speedup of Nansat.export() with number of workers
+# Licence: This file is part of NANSAT. You can redistribute it or modify
+#          under the terms of GNU General Public License, v.3
+#          http://www.gnu.org/licenses/gpl-3.0.html
+#
+# Usage: python benchmark_export.py [nBands] [size] [maxWorkers]
+#
+# A synthetic multi-band object (random arrays on a lat/lon grid) is warped
+# onto a polar stereographic Domain, so that each band is evaluated through
+# the warping VRT while exporting.
+import os
+import sys
+import time
+import tempfile
+from os.path import dirname, abspath
+
+import numpy as np
+
+try:
+    from nansat import Nansat, Domain
+except ImportError:  # development
+    sys.path.append(dirname(dirname(abspath(__file__))))
+    from nansat import Nansat, Domain
+
+nBands = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+size = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+maxWorkers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+srcDomain = Domain(4326, '-te 0 60 40 80 -ts %d %d' % (size, size))
+dstDomain = Domain('+proj=stere +lat_0=90 +lon_0=20 +datum=WGS84',
+                   '-te -800000 -2400000 800000 -800000 -ts %d %d'
+                   % (size, size))
+
+n = Nansat(domain=srcDomain, logLevel=40)
+for i in range(nBands):
+    n.add_band(np.random.randn(size, size).astype('float32'),
+               parameters={'name': 'band%02d' % i})
+n.reproject(dstDomain, eResampleAlg=1)
+
+fileName = os.path.join(tempfile.gettempdir(), 'benchmark_export.tif')
+workers = 1
+while workers <= maxWorkers:
+    t0 = time.time()
+    n.export(fileName, driver='GTiff', workers=workers)
+    duration = time.time() - t0
+    if workers == 1:
+        duration1 = duration
+    print('workers: %2d, time: %7.2f s, speedup: %5.2f' % (
+                                workers, duration, duration1 / duration))
+    workers *= 2
+os.remove(fileName)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# Name:    benchmark_mosaic_average.py
+# Purpose: Measure speedup of Mosaic.average() with number of processes
+# Licence: This file is part of NANSAT. You can redistribute it or modify
+#          under the terms of GNU General Public License, v.3
+#          http://www.gnu.org/licenses/gpl-3.0.html
+#
+# Usage: python benchmark_mosaic_average.py [nLayers] [size] [maxThreads]
+#
+# Synthetic layers (random arrays on the Domain of the mosaic) are used,
+# so no input files are needed and no reprojection is done.
+import sys
+import time
+from os.path import dirname, abspath
+
+import numpy as np
+
+try:
+    from nansat import Nansat, Domain, Mosaic
+except ImportError:  # development
+    sys.path.append(dirname(dirname(abspath(__file__))))
+    from nansat import Nansat, Domain, Mosaic
+
+nLayers = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+maxThreads = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+domain = Domain(4326, '-te 0 60 20 70 -ts %d %d' % (size, size))
+
+
+def synthetic_opener(fileName, logLevel=30):
+    ''' Create Nansat object with random data, seeded by <fileName> '''
+    np.random.seed(int(fileName))
+    n = Nansat(domain=domain, logLevel=logLevel)
+    n.add_band(np.random.randn(size, size).astype('float32'),
+               parameters={'name': 'data'})
+    n.add_band((np.random.rand(size, size) > 0.2).astype('uint8') * 64,
+               parameters={'name': 'mask'})
+    return n
+
+files = [str(i) for i in range(nLayers)]
+threads = 1
+while threads <= maxThreads:
+    mosaic = Mosaic(domain=domain, logLevel=40)
+    t0 = time.time()
+    mosaic.average(files, bands=['data'], doReproject=False,
+                   opener=synthetic_opener, threads=threads)
+    duration = time.time() - t0
+    if threads == 1:
+        duration1 = duration
+    print('threads: %2d, time: %7.2f s, speedup: %5.2f' % (
+                                threads, duration, duration1 / duration))
+    threads *= 2
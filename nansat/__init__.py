@@ -39,15 +39,16 @@ except Exception as e:
 from nansat.nsr import NSR
 from nansat.domain import Domain
 from nansat.nansat import Nansat
+from nansat.domain_index import DomainIndex
 
-__all__ = ['NSR', 'Domain', 'Nansat']
+__all__ = ['NSR', 'Domain', 'Nansat', 'DomainIndex']
 
 try:
-    from nansat.figure import Figure
+    from nansat.figure import Figure, FigureRenderer
 except ImportError:
     warnings.warn('''Cannot import Figure! Nansat will not make figures!''')
 else:
-    __all__.append('Figure')
+    __all__ += ['Figure', 'FigureRenderer']
 
 try:
     from nansat.nansatmap import Nansatmap
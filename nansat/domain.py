@@ -16,6 +16,7 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
 from __future__ import absolute_import
 import re
+import hashlib
 from math import sin, pi, cos, acos, copysign
 import string
 from xml.etree.ElementTree import ElementTree
@@ -26,6 +27,7 @@ from mpl_toolkits.basemap import Basemap
 from matplotlib.patches import Polygon
 
 from nansat.tools import add_logger, initial_bearing, haversine, gdal, osr, ogr
+from nansat.tools import transform_coordinates
 from nansat.tools import OptionError, ProjectionError
 from nansat.nsr import NSR
 from nansat.vrt import VRT
@@ -72,6 +74,11 @@ class Domain(object):
     Nansat inherits from Domain and adds bands to self.vrt
 
     '''
+    # cache of the latest geolocation grids (see get_geolocation_grids)
+    _geolocationGridsCache = None
+    # fingerprint and cache of borders, corners, etc (see _memoize)
+    _cache = None
+
     def __init__(self, srs=None, ext=None, ds=None, lon=None,
                  lat=None, name='', logLevel=None):
         '''Create Domain from GDALDataset or string options or lat/lon grids
@@ -227,6 +234,58 @@ class Domain(object):
                                                                corners[1][3])
         return outStr
 
+    def fingerprint(self):
+        '''Get hash of the geo-reference of the Domain
+
+        The hash is calculated from projection, GeoTransform, GCPs,
+        geolocation arrays, raster size and the TPS flag of self.vrt. It
+        changes whenever the geo-reference changes (e.g. after reproject(),
+        resize() or crop() of Nansat) and can be used as a key of caches.
+
+        Returns
+        --------
+        fingerprint : str
+            MD5 hex digest
+
+        '''
+        dataset = self.vrt.dataset
+        gcps = [(gcp.GCPX, gcp.GCPY, gcp.GCPZ, gcp.GCPPixel, gcp.GCPLine)
+                for gcp in dataset.GetGCPs()]
+        md5 = hashlib.md5()
+        for item in [dataset.RasterXSize, dataset.RasterYSize,
+                     dataset.GetProjection(), dataset.GetGeoTransform(),
+                     dataset.GetGCPProjection(), gcps,
+                     sorted(self.vrt.geolocationArray.d.items()),
+                     bool(self.vrt.tps)]:
+            md5.update(repr(item))
+
+        return md5.hexdigest()
+
+    def _memoize(self, key, function, *args, **kwargs):
+        '''Call function once for the current geo-reference of the Domain
+
+        Parameters
+        -----------
+        key : hashable
+            key of the result in the cache
+        function : callable
+            function to call if the result is not in the cache
+        *args, **kwargs : arguments of the function
+
+        Returns
+        --------
+        result of function(*args, **kwargs). The result is stored in cache
+        and reused until fingerprint of the Domain changes.
+
+        '''
+        fingerprint = self.fingerprint()
+        if self._cache is None or self._cache[0] != fingerprint:
+            self._cache = (fingerprint, {})
+        if key not in self._cache[1]:
+            self._cache[1][key] = function(*args, **kwargs)
+
+        return self._cache[1][key]
+
     def write_kml(self, xmlFileName=None, kmlFileName=None):
         '''Write KML file with domains
 
@@ -364,18 +423,33 @@ class Domain(object):
         kmlFile.write('</kml>')
         kmlFile.close()
 
-    def get_geolocation_grids(self, stepSize=1, dstSRS=NSR()):
+    def get_geolocation_grids(self, stepSize=1, dstSRS=None, out=None,
+                              dtype='float64', cache=False):
         '''Get longitude and latitude grids representing the full data grid
 
         If GEOLOCATION is not present in the self.vrt.dataset then grids
         are generated by converting pixel/line of each pixel into lat/lon
         If GEOLOCATION is present in the self.vrt.dataset then grids are read
         from the geolocation bands.
+        If the Domain has only GeoTransform (no GCPs, no GEOLOCATION), grids
+        are calculated block by block from the affine GeoTransform and
+        one transformation of coordinate arrays per block (see
+        Domain._get_coordinates).
 
         Parameters
         -----------
         stepSize : int
             Reduction factor if output is desired on a reduced grid size
+        dstSRS : NSR
+            destination spatial reference (WGS84 lat/lon by default)
+        out : tuple of two numpy arrays
+            preallocated arrays (e.g. memmaps) for longitude and latitude
+        dtype : str
+            data type of the output grids. 'float32' halves memory usage.
+        cache : bool
+            keep the grids and return them on the next call with the same
+            parameters. Cached grids are read-only. Ignored if <out> is
+            given.
 
         Returns
         --------
@@ -384,21 +458,50 @@ class Domain(object):
         latitude : numpy array
             grid with latitudes
         '''
-
-        X = range(0, self.vrt.dataset.RasterXSize, stepSize)
-        Y = range(0, self.vrt.dataset.RasterYSize, stepSize)
-        Xm, Ym = np.meshgrid(X, Y)
-
-        if len(self.vrt.geolocationArray.d) > 0:
+        if dstSRS is None:
+            dstSRS = NSR()
+        cacheKey = (self.fingerprint(), stepSize, dstSRS.wkt, dtype)
+        cache = cache and out is None
+        if (cache and self._geolocationGridsCache is not None and
+                self._geolocationGridsCache[0] == cacheKey):
+            return self._geolocationGridsCache[1]
+
+        X = np.arange(0, self.vrt.dataset.RasterXSize, stepSize)
+        Y = np.arange(0, self.vrt.dataset.RasterYSize, stepSize)
+        if out is None:
+            out = (np.empty((len(Y), len(X)), dtype),
+                   np.empty((len(Y), len(X)), dtype))
+        longitude, latitude = out
+
+        if (len(self.vrt.geolocationArray.d) == 0 and
+                len(self.vrt.dataset.GetGCPs()) == 0 and
+                self.vrt.dataset.GetProjection() != ''):
+            # fast path: affine transformation of pixel/line into X/Y
+            # and one transformation of X/Y arrays into dstSRS per block
+            blockSize = max(1, 1000000 / len(X))
+            for i0 in range(0, len(Y), blockSize):
+                Xg, Yg = self._get_coordinates(
+                                X, Y[i0:i0 + blockSize][:, None], dstSRS)
+                longitude[i0:i0 + blockSize] = Xg
+                latitude[i0:i0 + blockSize] = Yg
+        elif len(self.vrt.geolocationArray.d) > 0:
             # if the vrt dataset has geolocationArray
             # read lon,lat grids from geolocationArray
+            Xm, Ym = np.meshgrid(X, Y)
             lon, lat = self.vrt.geolocationArray.get_geolocation_grids()
-            longitude, latitude = lon[Ym, Xm], lat[Ym, Xm]
+            longitude[:], latitude[:] = lon[Ym, Xm], lat[Ym, Xm]
         else:
             # generate lon,lat grids using GDAL Transformer
-            lonVec, latVec = self.transform_points(Xm.flatten(), Ym.flatten(), dstSRS=dstSRS)
-            longitude = lonVec.reshape(Xm.shape)
-            latitude = latVec.reshape(Xm.shape)
+            Xm, Ym = np.meshgrid(X, Y)
+            lonVec, latVec = self.transform_points(Xm.flatten(), Ym.flatten(),
+                                                   dstSRS=dstSRS)
+            longitude[:] = lonVec.reshape(Xm.shape)
+            latitude[:] = latVec.reshape(Xm.shape)
+
+        if cache:
+            longitude.flags.writeable = False
+            latitude.flags.writeable = False
+            self._geolocationGridsCache = (cacheKey, (longitude, latitude))
 
         return longitude, latitude
 
@@ -595,6 +698,9 @@ class Domain(object):
     def get_border(self, nPoints=10):
         '''Generate two vectors with values of lat/lon for the border of domain
 
+        The result is cached until the geo-reference changes (see
+        Domain.fingerprint)
+
         Parameters
         -----------
         nPoints : int, optional
@@ -606,6 +712,12 @@ class Domain(object):
             vectors with lon/lat values for each point at the border
 
         '''
+        lonVec, latVec = self._memoize(('border', nPoints),
+                                       self._get_border, nPoints)
+        return np.array(lonVec), np.array(latVec)
+
+    def _get_border(self, nPoints):
+        ''' Calculate lat/lon for the border of domain (see get_border) '''
         # prepare vectors with pixels and lines for upper, left, lower
         # and right borders
         sizes = [self.vrt.dataset.RasterXSize, self.vrt.dataset.RasterYSize]
@@ -671,6 +783,11 @@ class Domain(object):
             string with WKT representation of the border polygon
 
         '''
+        return self._memoize(('border_wkt', args, tuple(kwargs.items())),
+                             self._get_border_wkt, *args, **kwargs)
+
+    def _get_border_wkt(self, *args, **kwargs):
+        ''' Create WKT of the border polygon (see get_border_wkt) '''
         lonList, latList = self.get_border(*args, **kwargs)
 
         # apply > 180 deg correction to longitudes
@@ -694,7 +811,11 @@ class Domain(object):
 
         '''
 
-        return ogr.CreateGeometryFromWkt(self.get_border_wkt(*args, **kwargs))
+        geometry = self._memoize(('border_geometry', args,
+                                  tuple(kwargs.items())),
+                                 ogr.CreateGeometryFromWkt,
+                                 self.get_border_wkt(*args, **kwargs))
+        return geometry.Clone()
 
     def overlaps(self, anotherDomain):
         ''' Checks if this Domain overlaps another Domain
@@ -747,37 +868,49 @@ class Domain(object):
                      self.vrt.dataset.RasterXSize]
         rowVector = [0, self.vrt.dataset.RasterYSize, 0,
                      self.vrt.dataset.RasterYSize]
-        return self.transform_points(colVector, rowVector)
+        lonVec, latVec = self._memoize('corners', self.transform_points,
+                                       colVector, rowVector)
+        return np.array(lonVec), np.array(latVec)
 
-    def get_min_max_lat_lon(self):
+    def get_min_max_lat_lon(self, exact=False):
         '''Get minimum and maximum lat and long values in the geolocation grid
 
+        By default, the extrema are found on a decimated geolocation grid
+        (about 100 x 100 points) and on a densely sampled border which is
+        accurate for convex footprints. If the Domain (with GeoTransform)
+        covers a pole, the respective latitude is set to +/-90.
+
+        Parameters
+        -----------
+        exact : bool
+            If True, use the full geolocation grid
+
         Returns
         --------
         minLat, maxLat, minLon, maxLon : float
             min/max lon/lat values for the Domain
 
         '''
-        allLongitudes, allLatitudes = self.get_geolocation_grids()
-        maxLat = -90
-        minLat = 90
-        for latitudes in allLatitudes:
-            for lat in latitudes:
-                if lat > maxLat:
-                    maxLat = lat
-                if lat < minLat:
-                    minLat = lat
-
-        maxLon = -180
-        minLon = 180
-        for longitudes in allLongitudes:
-            for lon in longitudes:
-                if lon > maxLon:
-                    maxLon = lon
-                if lon < minLon:
-                    minLon = lon
-
-        return minLat, maxLat, minLon, maxLon
+        if exact:
+            lon, lat = self.get_geolocation_grids()
+        else:
+            ySize, xSize = self.shape()
+            stepSize = max(1, max(xSize, ySize) / 100)
+            lonGrid, latGrid = self.get_geolocation_grids(stepSize)
+            lonBorder, latBorder = self.get_border(nPoints=1000)
+            lon = np.hstack([lonGrid.flatten(), lonBorder])
+            lat = np.hstack([latGrid.flatten(), latBorder])
+            if (len(self.vrt.geolocationArray.d) == 0 and
+                    len(self.vrt.dataset.GetGCPs()) == 0):
+                # add poles if they are inside
+                col, row = self.transform_points([0, 0], [90, -90],
+                                                 DstToSrc=1)
+                inside = ((np.array(col) >= 0) * (np.array(col) <= xSize) *
+                          (np.array(row) >= 0) * (np.array(row) <= ySize))
+                lat = np.hstack([lat, np.array([90, -90])[inside]])
+
+        return (float(np.nanmin(lat)), float(np.nanmax(lat)),
+                float(np.nanmin(lon)), float(np.nanmax(lon)))
 
     def get_pixelsize_meters(self):
         '''Returns the pixelsize (deltaX, deltaY) of the domain
@@ -792,7 +925,11 @@ class Domain(object):
         deltaX, deltaY : float
         pixel size in X and Y directions given in meters
         '''
+        return self._memoize('pixelsize_meters',
+                             self._get_pixelsize_meters)
 
+    def _get_pixelsize_meters(self):
+        ''' Calculate pixel size in meters (see get_pixelsize_meters) '''
         srs = osr.SpatialReference(self.vrt.dataset.GetProjection())
         if srs.IsProjected:
             if srs.GetAttrValue('unit') == 'metre':
@@ -894,6 +1031,46 @@ class Domain(object):
         return self.vrt.transform_points(colVector, rowVector,
                                          DstToSrc, dstSRS=dstSRS)
 
+    def _get_coordinates(self, cols, rows, dstSRS):
+        '''Get coordinates of pixels in dstSRS from arrays of pixel/line
+
+        If the Domain has only GeoTransform (no GCPs, no GEOLOCATION),
+        pixel/line are converted with the affine GeoTransform and the arrays
+        are transformed at once (see nansat.tools.transform_coordinates).
+        Otherwise the GDAL transformer is used (see transform_points).
+
+        Parameters
+        -----------
+        cols, rows : numpy arrays
+            pixel and line coordinates (arrays of broadcastable shapes)
+        dstSRS : NSR
+            destination spatial reference
+
+        Returns
+        --------
+        x, y : numpy arrays
+            coordinates in dstSRS (of the broadcasted shape)
+
+        '''
+        cols, rows = np.broadcast_arrays(cols, rows)
+        if (len(self.vrt.geolocationArray.d) == 0 and
+                len(self.vrt.dataset.GetGCPs()) == 0 and
+                self.vrt.dataset.GetProjection() != ''):
+            geoTransform = self.vrt.dataset.GetGeoTransform()
+            x = (geoTransform[0] + cols * geoTransform[1] +
+                 rows * geoTransform[2])
+            y = (geoTransform[3] + cols * geoTransform[4] +
+                 rows * geoTransform[5])
+            srcSRS = NSR(self.vrt.dataset.GetProjection())
+            if srcSRS.IsSame(dstSRS):
+                return x, y
+            return transform_coordinates(srcSRS, dstSRS, x, y)
+
+        x, y = self.transform_points(cols.flatten(), rows.flatten(),
+                                     dstSRS=dstSRS)
+        return (np.reshape(x, cols.shape).astype('float64'),
+                np.reshape(y, cols.shape).astype('float64'))
+
     def azimuth_y(self, reductionFactor=1):
         '''Calculate the angle of each pixel position vector with respect to
         the Y-axis (azimuth).
@@ -0,0 +1,293 @@
+# Name:    domain_index.py
+# Purpose: Container of DomainIndex class
+# Authors:      Asuka Yamakawa, Anton Korosov, Knut-Frode Dagestad,
+#               Morten W. Hansen, Alexander Myasoyedov,
+#               Dmitry Petrenko, Evgeny Morozov, Aleksander Vines
+# Created:      19.10.2026
+# Copyright:    (c) NERSC 2011 - 2026
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import
+import datetime
+
+import numpy as np
+
+from nansat.tools import ogr
+
+
+def _to_seconds(time):
+    ''' Convert datetime (or None) into seconds since 1970-01-01 (or nan) '''
+    if time is None:
+        return np.nan
+    if time.tzinfo is not None:
+        time = time.replace(tzinfo=None) - time.utcoffset()
+    return (time - datetime.datetime(1970, 1, 1)).total_seconds()
+
+
+def _str_pack(boxes, nodeSize):
+    ''' Sort boxes with the Sort-Tile-Recursive algorithm
+
+    Parameters
+    -----------
+    boxes : numpy array
+        (N, 4) array with minX, minY, maxX, maxY of boxes
+    nodeSize : int
+        number of boxes in one node
+
+    Returns
+    --------
+    order : numpy array
+        permutation of boxes. Each <nodeSize> consequtive boxes in this
+        order form one node.
+
+    '''
+    nBoxes = boxes.shape[0]
+    nNodes = int(np.ceil(nBoxes / float(nodeSize)))
+    nSlices = int(np.ceil(np.sqrt(nNodes)))
+    sliceSize = nSlices * nodeSize
+
+    # sort by X-center, split into vertical slices, sort slices by Y-center
+    xOrder = np.argsort(boxes[:, 0] + boxes[:, 2], kind='mergesort')
+    order = []
+    for i in range(0, nBoxes, sliceSize):
+        sliceOrder = xOrder[i:i + sliceSize]
+        yCenter = boxes[sliceOrder, 1] + boxes[sliceOrder, 3]
+        order.append(sliceOrder[np.argsort(yCenter, kind='mergesort')])
+
+    return np.hstack(order)
+
+
+class DomainIndex(object):
+    '''Spatial index of many Domains for fast overlap queries
+
+    Border geometries and bounding boxes of Domains are computed once,
+    when a Domain is added. Bounding boxes are packed into a static
+    R-tree (Sort-Tile-Recursive) which is kept in numpy arrays and used to
+    select candidates before the exact test of intersection with OGR.
+    The index can be saved to and loaded from an NPZ-file.
+
+    Examples
+    --------
+    index = DomainIndex()
+    for fileName in fileNames:
+        index.add(Nansat(fileName), fileName)
+    index.save('archive_index.npz')
+
+    index = DomainIndex('archive_index.npz')
+    fileNames = index.query(Domain(4326, '-te 0 60 30 80 -ts 100 100'),
+                            start=datetime.datetime(2016, 1, 1))
+
+    '''
+    def __init__(self, fileName=None, nodeSize=16):
+        '''Create empty DomainIndex or load it from file
+
+        Parameters
+        -----------
+        fileName : str
+            name of the NPZ-file made by DomainIndex.save()
+        nodeSize : int
+            number of children in the nodes of the tree
+
+        '''
+        self.nodeSize = nodeSize
+        self.keys = []
+        self.wkts = []
+        self._bboxes = []
+        self._times = []
+        self._geometries = []
+        self._tree = None
+
+        if fileName is not None:
+            self.load(fileName)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, domain, key=None, start=None, end=None):
+        '''Add Domain to the index
+
+        Parameters
+        -----------
+        domain : Domain or Nansat
+            domain to add
+        key : str
+            key of the domain, returned by DomainIndex.query().
+            Domain name is used by default.
+        start, end : datetime
+            time coverage of the Domain. By default it is fetched from
+            time_coverage_start/end metadata of Nansat objects.
+
+        '''
+        if key is None:
+            key = domain.name
+        if start is None:
+            start = self._get_time(domain, 'time_coverage_start')
+        if end is None:
+            end = self._get_time(domain, 'time_coverage_end')
+        if end is None:
+            end = start
+
+        wkt = domain.get_border_wkt()
+        geometry = ogr.CreateGeometryFromWkt(wkt)
+        minX, maxX, minY, maxY = geometry.GetEnvelope()
+
+        self.keys.append(key)
+        self.wkts.append(wkt)
+        self._geometries.append(geometry)
+        self._bboxes.append([minX, minY, maxX, maxY])
+        self._times.append([_to_seconds(start), _to_seconds(end)])
+        self._tree = None
+
+    def query(self, domain, start=None, end=None):
+        '''Find Domains which intersect the given Domain (and period)
+
+        Parameters
+        -----------
+        domain : Domain, or str
+            Domain or WKT of the region of interest
+        start, end : datetime
+            If given, only Domains with time coverage that intersects the
+            period are returned. Domains without time are skipped.
+
+        Returns
+        --------
+        keys : list
+            keys of the found Domains
+
+        '''
+        if len(self.keys) == 0:
+            return []
+        if isinstance(domain, basestring):
+            geometry = ogr.CreateGeometryFromWkt(domain)
+        else:
+            geometry = domain.get_border_geometry()
+        minX, maxX, minY, maxY = geometry.GetEnvelope()
+
+        candidates = self._query_tree([minX, minY, maxX, maxY])
+
+        # filter by time
+        times = np.array(self._times, 'float64').reshape(-1, 2)[candidates]
+        valid = np.ones(len(candidates), bool)
+        if start is not None:
+            valid *= times[:, 1] >= _to_seconds(start)
+        if end is not None:
+            valid *= times[:, 0] <= _to_seconds(end)
+        candidates = candidates[valid]
+
+        # exact test of intersection
+        return [self.keys[i] for i in sorted(candidates)
+                if self._get_geometry(i).Intersects(geometry)]
+
+    def save(self, fileName):
+        '''Save the index into NPZ-file
+
+        Parameters
+        -----------
+        fileName : str
+            name of the output file. Keys are saved as strings.
+
+        '''
+        np.savez(fileName,
+                 keys=np.array([str(key) for key in self.keys]),
+                 wkts=np.array(self.wkts),
+                 bboxes=np.array(self._bboxes, 'float64').reshape(-1, 4),
+                 times=np.array(self._times, 'float64').reshape(-1, 2),
+                 nodeSize=self.nodeSize)
+
+    def load(self, fileName):
+        '''Load the index from NPZ-file made by DomainIndex.save()
+
+        Parameters
+        -----------
+        fileName : str
+            name of the input file
+
+        '''
+        data = np.load(fileName)
+        self.keys = [str(key) for key in data['keys']]
+        self.wkts = [str(wkt) for wkt in data['wkts']]
+        self._bboxes = data['bboxes'].tolist()
+        self._times = data['times'].tolist()
+        self.nodeSize = int(data['nodeSize'])
+        self._geometries = [None] * len(self.keys)
+        self._tree = None
+
+    def _get_time(self, domain, name):
+        ''' Get datetime from metadata of Nansat or None '''
+        try:
+            time = getattr(domain, name)
+        except Exception:
+            time = None
+        if not isinstance(time, datetime.datetime):
+            time = None
+        return time
+
+    def _get_geometry(self, i):
+        ''' Get OGR geometry of the i-th Domain (create from WKT once) '''
+        if self._geometries[i] is None:
+            self._geometries[i] = ogr.CreateGeometryFromWkt(self.wkts[i])
+        return self._geometries[i]
+
+    def _build_tree(self):
+        ''' Build R-tree from bounding boxes
+
+        Bounding boxes of Domains (leaves) are sorted and kept in
+        self._leafBoxes (self._order gives their indices). The tree is a
+        list of levels, starting from the lowest. Each level is a tuple of
+        (boxes, starts, ends): boxes of nodes and ranges of their children
+        in the level below (or in the leaves).
+
+        '''
+        bboxes = np.array(self._bboxes, 'float64').reshape(-1, 4)
+        self._order = _str_pack(bboxes, self.nodeSize)
+        self._leafBoxes = bboxes[self._order]
+
+        levels = []
+        boxes = self._leafBoxes
+        while True:
+            # group consequtive entries into nodes
+            starts = np.arange(0, boxes.shape[0], self.nodeSize)
+            ends = np.minimum(starts + self.nodeSize, boxes.shape[0])
+            nodeBoxes = np.array([
+                np.minimum.reduceat(boxes[:, 0], starts),
+                np.minimum.reduceat(boxes[:, 1], starts),
+                np.maximum.reduceat(boxes[:, 2], starts),
+                np.maximum.reduceat(boxes[:, 3], starts)]).T
+            if nodeBoxes.shape[0] == 1:
+                levels.append((nodeBoxes, starts, ends))
+                break
+            # sort nodes before grouping them on the next level
+            order = _str_pack(nodeBoxes, self.nodeSize)
+            levels.append((nodeBoxes[order], starts[order], ends[order]))
+            boxes = nodeBoxes[order]
+
+        self._tree = levels
+
+    def _query_tree(self, bbox):
+        ''' Find indices of Domains with bounding boxes intersecting bbox '''
+        if self._tree is None:
+            self._build_tree()
+
+        def intersects(boxes):
+            return ((boxes[:, 0] <= bbox[2]) * (boxes[:, 2] >= bbox[0]) *
+                    (boxes[:, 1] <= bbox[3]) * (boxes[:, 3] >= bbox[1]))
+
+        # go from the root down to the leaves
+        nodes = np.arange(self._tree[-1][0].shape[0])
+        for boxes, starts, ends in reversed(self._tree):
+            nodes = nodes[intersects(boxes[nodes])]
+            if len(nodes) == 0:
+                return np.array([], 'int64')
+            nodes = np.hstack([np.arange(starts[n], ends[n]) for n in nodes])
+
+        # test leaves
+        nodes = nodes[intersects(self._leafBoxes[nodes])]
+
+        return self._order[nodes]
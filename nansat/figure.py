@@ -16,11 +16,16 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
 from __future__ import absolute_import
 import os
+import multiprocessing as mp
 from math import floor, log10
+import collections
+if hasattr(collections, 'OrderedDict'):
+    from collections import OrderedDict
+else:
+    from ordereddict import OrderedDict
 
 import numpy as np
 from matplotlib import cm
-import matplotlib.pyplot as plt
 
 try:
     import Image
@@ -30,6 +35,21 @@ except:
     from PIL import Image, ImageDraw, ImageFont
 
 from nansat.tools import add_logger, OptionError
+from nansat.stats import get_histogram, subset_array
+
+# fonts and palettes shared by all figures in a process
+_fonts = {}
+_palettes = {}
+
+# renderer used by worker processes in FigureRenderer.render_many()
+_workerRenderer = None
+
+
+def _get_font(fileName, size):
+    ''' Load TrueType font of the given size once per process '''
+    if (fileName, size) not in _fonts:
+        _fonts[(fileName, size)] = ImageFont.truetype(fileName, size)
+    return _fonts[(fileName, size)]
 
 
 class Figure(object):
@@ -67,8 +87,10 @@ class Figure(object):
     lonGrid = None
     lonTicks = 5
     latTicks = 5
+    latlonStepSize = 1
 
     transparency = None
+    legendCache = None
 
     LEGEND_HEIGHT = 0.1
     CBAR_HEIGHTMIN = 5
@@ -83,10 +105,13 @@ class Figure(object):
     TITLE_LOCATION_X = 0.1
     TITLE_LOCATION_Y = 0.05
     DEFAULT_EXTENSION = '.png'
+    LEGEND_CACHE_SIZE = 100
 
     palette = None
     pilImg = None
     pilImgLegend = None
+    reprojMask = None
+    _canvas = None
 
     extensionList = ['png', 'PNG', 'tif', 'TIF', 'bmp',
                      'BMP', 'jpg', 'JPG', 'jpeg', 'JPEG']
@@ -159,9 +184,13 @@ class Figure(object):
         logoSize : list of two int
             desired X,Y size of logo. If None - original size is used
         latGrid : numpy array
-            full size array with latitudes. For adding lat/lon grid lines
+            array with latitudes. For adding lat/lon grid lines
         lonGrid : numpy array
-            full size array with longitudes. For adding lat/lon grid lines
+            array with longitudes. For adding lat/lon grid lines
+        latlonStepSize : int
+            1, step of latGrid and lonGrid relative to the image, e.g.
+            grids from Domain.get_geolocation_grids(stepSize=10) have
+            latlonStepSize=10
         nGridLines : int
             number of lat/lon grid lines to show
         latlonLabels : int
@@ -170,6 +199,10 @@ class Figure(object):
             transparency of the image background(mask), set for PIL alpha
             mask in Figure.save()
         default : None
+        legendCache : OrderedDict
+            If given, legend images are kept in and reused from that
+            dictionary (see FigureRenderer). The least recently used
+            legends are removed if it has more than LEGEND_CACHE_SIZE items.
 
         Advanced parameters
         --------------------
@@ -199,6 +232,8 @@ class Figure(object):
             0.3, title  offset Y relative to legend height
         DEFAULT_EXTENSION : string
             '.png'
+        LEGEND_CACHE_SIZE : int
+            100, maximum number of legend images in legendCache
         --------------------------------------------------
 
         Modifies
@@ -213,9 +248,11 @@ class Figure(object):
             longName and units.
 
         '''
-        # make a copy of nparray (otherwise a new reference to the same data is
-        # created and the original input data is destroyed at process())
-        array = np.array(nparray)
+        # input data is not copied: methods which modify self.array in place
+        # make a private copy first (see _own_array()) and process() renders
+        # into a new uint8 array
+        array = np.asarray(nparray)
+        self._ownArray = array is not nparray
 
         self.logger = add_logger('Nansat')
 
@@ -254,6 +291,7 @@ class Figure(object):
         '''
         # modify default parameters
         self._set_defaults(kwargs)
+        self._own_array()
 
         # apply logarithm/gamme correction to pixel values
         for iBand in range(self.array.shape[0]):
@@ -285,6 +323,7 @@ class Figure(object):
         '''
         # modify default parameters
         self._set_defaults(kwargs)
+        self._own_array()
 
         # get values of free indeces in the palette
         availIndeces = range(self.numOfColor, 255 - 1)
@@ -366,11 +405,12 @@ class Figure(object):
     def add_latlon_grids(self, **kwargs):
         '''Add lat/lon grid lines into the PIL image
 
-        Compute step of the grid
-        Make matrices with binarized lat/lon
-        Find edge (make line)
-        Convert to mask
-        Add mask to PIL
+        Find lines where lat/lon grids are equal to ticks
+        Draw the lines into mask
+        Add mask to the image
+
+        The grids can be decimated (see latlonStepSize), so that memory
+        for full size grids is not needed.
 
         Parameters
         ----------
@@ -385,6 +425,8 @@ class Figure(object):
         latTicks : int or list
             number of lines to draw
             or locations of gridlines
+        latlonStepSize : int
+            step of latGrid and lonGrid relative to the image
 
         Modifies
         ---------
@@ -402,24 +444,94 @@ class Figure(object):
         latTicks = self._get_auto_ticks(self.latTicks, self.latGrid)
         lonTicks = self._get_auto_ticks(self.lonTicks, self.lonGrid)
 
-        # convert lat/lon grids to indeces
-        latI = np.zeros(self.latGrid.shape, 'int8')
-        lonI = np.zeros(self.latGrid.shape, 'int8')
-        for latTick in latTicks:
-            latI[self.latGrid > latTick] += 1
-        for lonTick in lonTicks:
-            lonI[self.lonGrid > lonTick] += 1
+        # draw lines where lat/lon are equal to ticks into mask
+        gridImage = Image.new('L', (self.width, self.height), 0)
+        draw = ImageDraw.Draw(gridImage)
+        for grid, ticks in [(self.latGrid, latTicks), (self.lonGrid, lonTicks)]:
+            for segment in self._get_grid_lines(grid, ticks):
+                draw.line(tuple(segment), fill=1)
 
-        # find pixels on the grid lines (binarize)
-        latI = np.diff(latI, axis=0)[:, :-1] + np.diff(latI, axis=1)[:-1, :]
-        lonI = np.diff(lonI, axis=0)[:, :-1] + np.diff(lonI, axis=1)[:-1, :]
+        # add mask to the image
+        self.apply_mask(mask_array=np.array(gridImage),
+                        mask_lut={1: [255, 255, 255]})
 
-        # make grid from both lat and lon
-        latI += lonI
-        latI[latI != 0] = 1
+    def _get_grid_lines(self, grid, ticks):
+        '''Get line segments where grid values are equal to ticks
 
-        # add mask to the image
-        self.apply_mask(mask_array=latI, mask_lut={1: [255, 255, 255]})
+        Crossings of the grid cell edges with each tick value are found by
+        linear interpolation and crossings in the same cell are joined
+        (marching squares). The grid can be decimated (see latlonStepSize),
+        then the last cells are extrapolated to the last row and column of
+        the image.
+
+        Parameters
+        ----------
+            grid : ndarray
+                grid with lon or lat
+            ticks : list
+                values of grid lines
+
+        Returns
+        -------
+            segments : ndarray
+                N x 4 array with x0, y0, x1, y1 of segments in image pixels
+
+        '''
+        # positions of grid nodes in image pixels (rows, columns). If the
+        # decimated grid ends before the image edge, a row/column extrapolated
+        # to the edge is added
+        step = float(self.latlonStepSize)
+        nodes = []
+        for axis, size in [(0, self.height), (1, self.width)]:
+            position = np.arange(grid.shape[axis]) * step
+            if position[-1] < size - 1 and grid.shape[axis] > 1:
+                last = np.take(grid, [-1], axis=axis)
+                edge = last + ((last - np.take(grid, [-2], axis=axis)) *
+                               (size - 1 - position[-1]) / step)
+                grid = np.concatenate([grid, edge], axis=axis)
+                position = np.append(position, size - 1)
+            nodes.append(position)
+
+        # edges of a cell: row and column offsets of the first and second node
+        edgeNodes = [(0, 0, 0, 1), (0, 1, 1, 1), (1, 0, 1, 1), (0, 0, 1, 0)]
+        segments = [np.zeros((0, 4))]
+        for tick in ticks:
+            above = grid > tick
+            hCross = above[:, :-1] != above[:, 1:]
+            vCross = above[:-1, :] != above[1:, :]
+            # crossings on top, right, bottom and left edges of cells
+            cross = [hCross[:-1, :], vCross[:, 1:],
+                     hCross[1:, :], vCross[:, :-1]]
+            count = sum(edge.astype('int8') for edge in cross)
+            rows, cols = np.nonzero(count >= 2)
+            if len(rows) == 0:
+                continue
+
+            points = np.zeros((len(rows), 4, 2))
+            valid = np.zeros((len(rows), 4), 'bool')
+            for iEdge, (r0, c0, r1, c1) in enumerate(edgeNodes):
+                g0 = grid[rows + r0, cols + c0]
+                g1 = grid[rows + r1, cols + c1]
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    frac = (tick - g0) / (g1 - g0)
+                points[:, iEdge, 0] = cols + c0 + frac * (c1 - c0)
+                points[:, iEdge, 1] = rows + r0 + frac * (r1 - r0)
+                valid[:, iEdge] = cross[iEdge][rows, cols]
+
+            # move crossings to the front and join them pairwise
+            order = np.argsort(~valid, axis=1, kind='mergesort')
+            points = points[np.arange(len(rows))[:, None], order]
+            segments.append(points[:, :2].reshape(-1, 4))
+            segments.append(points[count[rows, cols] == 4, 2:].reshape(-1, 4))
+
+        segments = np.vstack(segments)
+        segments = segments[np.isfinite(segments).all(axis=1)]
+        # convert node indices into image pixels
+        for iCol, axis in enumerate([1, 0, 1, 0]):
+            segments[:, iCol] = np.interp(segments[:, iCol],
+                                          np.arange(len(nodes[axis])),
+                                          nodes[axis])
+        return segments
 
     def _get_auto_ticks(self, ticks, grid):
         ''' Automatically create a list of lon or lat ticks from number of list
@@ -472,6 +584,8 @@ class Figure(object):
         latTicks : int or list
             number of lines to draw
             or locations of gridlines
+        latlonStepSize : int
+            step of latGrid and lonGrid relative to the image
 
         Modifies
         ---------
@@ -486,7 +600,7 @@ class Figure(object):
             return
 
         draw = ImageDraw.Draw(self.pilImg)
-        font = ImageFont.truetype(self.fontFileName, self.fontSize)
+        font = _get_font(self.fontFileName, self.fontSize)
 
         # get vectors with ticks based on input
         latTicks = self._get_auto_ticks(self.latTicks, self.latGrid)
@@ -498,19 +612,19 @@ class Figure(object):
         latTicksIdx = self._get_tick_index_from_grid(latTicks, self.latGrid,
                                        self.lonGrid.shape[0], 1)
 
-        # draw lons
-        lonsOffset = self.lonGrid.shape[1] / len(lonTicksIdx) / 8.
+        # draw lons (grid index is converted to image pixels)
+        lonsOffset = self.width / max(len(lonTicksIdx), 1) / 8.
         for lonTickIdx in lonTicksIdx:
             lon = self.lonGrid[0, lonTickIdx]
-            draw.text((lonTickIdx+lonsOffset, 0), '%4.2f' % lon,
-                                                    fill=255, font=font)
+            draw.text((lonTickIdx * self.latlonStepSize + lonsOffset, 0),
+                      '%4.2f' % lon, fill=255, font=font)
 
         # draw lats
-        latsOffset = self.latGrid.shape[0] / len(latTicksIdx) / 8.
+        latsOffset = self.height / max(len(latTicksIdx), 1) / 8.
         for latTickIdx in latTicksIdx:
             lat = self.latGrid[latTickIdx, 0]
-            draw.text((0, latTickIdx+latsOffset), '%4.2f' % lat,
-                      fill=255, font=font)
+            draw.text((0, latTickIdx * self.latlonStepSize + latsOffset),
+                      '%4.2f' % lat, fill=255, font=font)
 
     def _get_tick_index_from_grid(self, ticks, grid, rows, cols):
         ''' Get index of pixels from lon/lat grids closest given ticks
@@ -548,6 +662,11 @@ class Figure(object):
         Then get rid of (1.0-ratio)/2 from the both sides and
         return the minimum and maximum values.
 
+        The histogram is computed by blocks of rows (see
+        nansat.stats.StreamingHistogram) without copying the band. If
+        subsetArraySize is given, only a regular subset of about
+        subsetArraySize pixels is used.
+
         Parameters
         -----------
         Any of Figure.__init__() parameters
@@ -561,6 +680,7 @@ class Figure(object):
         # modify default values
         self._set_defaults(kwargs)
         ratio = self.ratio
+        subsetArraySize = kwargs.get('subsetArraySize', None)
 
         # find masked pixels if mask_array and mask_lut provided
         masked = None
@@ -579,19 +699,16 @@ class Figure(object):
 
         # create a 2D array and set min and max values
         clim = [[0] * self.array.shape[0], [0] * self.array.shape[0]]
+        percentileMin = 100 * (1 - ratio) / 2.
+        percentileMax = 100 * (1 - (1 - ratio) / 2.)
         for iBand in range(self.array.shape[0]):
-            bandArray = self.array[iBand, :, :]
-            # remove masked data
-            if masked is not None:
-                bandArray = bandArray[masked == 0]
-            # remove nan, inf
-            bandArray = bandArray[np.isfinite(bandArray)]
-            # get percentile
-            percentileMin = 100 * (1 - ratio) / 2.
-            percentileMax = 100 * (1 - (1 - ratio) / 2.)
-            if bandArray.size > 0:
-                clim[0][iBand] = np.percentile(bandArray, percentileMin)
-                clim[1][iBand] = np.percentile(bandArray, percentileMax)
+            # histogram of finite, not masked values
+            hist = get_histogram(self.array[iBand, :, :],
+                                 subsetArraySize=subsetArraySize,
+                                 mask=masked)
+            if hist.count > 0:
+                clim[0][iBand], clim[1][iBand] = hist.percentile(
+                                            [percentileMin, percentileMax])
             else:
                 clim[0][iBand], clim[1][iBand] = 0, 1
 
@@ -616,6 +733,7 @@ class Figure(object):
         '''
         # modify default parameters
         self._set_defaults(kwargs)
+        self._own_array()
 
         for iBand in range(self.array.shape[0]):
             # if clipping integer matrix, make clipping ranges valid
@@ -644,6 +762,7 @@ class Figure(object):
         '''
         # modify default values
         self._set_defaults(kwargs)
+        self._own_array()
 
         for iBand in range(self.array.shape[0]):
             self.array[iBand, :, :] = (
@@ -671,8 +790,20 @@ class Figure(object):
         # modify default parameters
         self._set_defaults(kwargs)
 
+        # use identical legend if it was already created
+        legendKey = (self.array.shape[0], self.width, self.height,
+                     tuple(self.cmin), tuple(self.cmax), self.logarithm,
+                     self.gamma, self.numOfColor, self.numOfTicks,
+                     str(self.caption), str(self.titleString), self.fontSize,
+                     self.fontFileName)
+        if self.legendCache is not None and legendKey in self.legendCache:
+            # move the legend to the end (most recently used)
+            self.pilImgLegend = self.legendCache.pop(legendKey)
+            self.legendCache[legendKey] = self.pilImgLegend
+            return
+
         # set fonts size for colorbar
-        font = ImageFont.truetype(self.fontFileName, self.fontSize)
+        font = _get_font(self.fontFileName, self.fontSize)
 
         # create a pilImage for the legend
         self.pilImgLegend = Image.new('P', (self.width,
@@ -748,6 +879,12 @@ class Figure(object):
                 text = draw.textsize(line, font=font)
                 textHeight += text[1]
 
+        if self.legendCache is not None:
+            self.legendCache[legendKey] = self.pilImgLegend
+            # remove the least recently used legends
+            while len(self.legendCache) > self.LEGEND_CACHE_SIZE:
+                del self.legendCache[next(iter(self.legendCache))]
+
     def create_pilImage(self, **kwargs):
         ''' self.create_pilImage is replaced from None to PIL image
 
@@ -773,7 +910,14 @@ class Figure(object):
         self._set_defaults(kwargs)
 
         # if legend is created, expand array with empty space below the data
-        if self.pilImgLegend is not None:
+        # (the canvas from process() already has that space)
+        if (self.pilImgLegend is not None and
+                self._canvas is not None and
+                self._canvas.shape[1] == (self.height +
+                                          self.pilImgLegend.size[1]) and
+                np.may_share_memory(self._canvas, self.array)):
+            self.array = self._canvas
+        elif self.pilImgLegend is not None:
             appendArray = 255 * np.ones((self.array.shape[0],
                                          self.pilImgLegend.size[1],
                                          self.width), 'uint8')
@@ -797,9 +941,8 @@ class Figure(object):
         '''Do all common operations for preparation of a figure for saving
 
         #. Modify default values of parameters by the provided ones (if any)
-        #. Clip to min/max
-        #. Apply logarithm if required
-        #. Convert data to uint8
+        #. Clip to min/max, apply logarithm if required and convert data to
+           uint8 (in one pass by blocks of rows, see _render_uint8())
         #. Create palette
         #. Apply mask for colouring land, clouds, etc if required
         #. Create legend if required
@@ -830,15 +973,14 @@ class Figure(object):
         # we replace them with mask before creating PIL Image
         self.reprojMask = self.array[0, :, :] == 0
 
-        # clip values to min/max
-        self.clip()
-
-        # apply logarithm
-        if self.logarithm:
-            self.apply_logarithm()
-
-        # convert to uint8
-        self.convert_palettesize()
+        # clip values to min/max, apply logarithm and convert to uint8
+        # into array with space for legend
+        legendHeight = 0
+        if self.legend:
+            legendHeight = int(self.height * self.LEGEND_HEIGHT)
+        self._canvas = self._render_uint8(legendHeight)
+        self.array = self._canvas[:, :self.height, :]
+        self._ownArray = True
 
         # create the paletter
         self._create_palette()
@@ -864,34 +1006,151 @@ class Figure(object):
         if self.logoFileName is not None:
             self.add_logo()
 
-    def _make_transparent_color(self):
+    def _own_array(self):
+        ''' Replace self.array with a copy if it refers to the input data '''
+        if not self._ownArray:
+            self.array = np.array(self.array)
+            self._ownArray = True
+
+    def _render_uint8(self, legendHeight=0, blockSize=1000):
+        '''Clip, apply logarithm and convert self.array to uint8 at once
+
+        Does the same as clip(), apply_logarithm() and convert_palettesize()
+        (with the same data types and order of operations, so the result is
+        identical) but self.array is not modified: blocks of rows are
+        copied, scaled and written into a new uint8 array. So only one
+        float block exists at a time.
+
+        Parameters
+        -----------
+        legendHeight : int
+            number of empty (255) rows to add below the data
+        blockSize : int
+            number of rows to process at once
+
+        Returns
+        --------
+        canvas : numpy array
+            uint8 array (bands x (height + legendHeight) x width)
+
+        '''
+        nBands = self.array.shape[0]
+        canvas = np.empty((nBands, self.height + legendHeight, self.width),
+                          'uint8')
+        canvas[:, self.height:, :] = 255
+
+        for iBand in range(nBands):
+            # if clipping integer matrix, make clipping ranges valid
+            if self.array.dtype in ['int8', 'uint8', 'int16', 'uint16']:
+                self.cmin[iBand] = np.ceil(self.cmin[iBand])
+                self.cmin[iBand] = np.floor(self.cmin[iBand])
+            cmin = float(self.cmin[iBand])
+            cmax = float(self.cmax[iBand])
+            # Clipping, allowing for reversed colorscale (cmin > cmax)
+            clipMin, clipMax = min(cmin, cmax), max(cmin, cmax)
+
+            for row in range(0, self.height, blockSize):
+                rows = slice(row, min(row + blockSize, self.height))
+                block = np.clip(self.array[iBand, rows, :], clipMin,
+                                clipMax).astype(self.array.dtype, copy=False)
+                if self.logarithm:
+                    block[:] = (np.power((block - cmin) / (cmax - cmin),
+                                         1.0 / self.gamma) *
+                                (cmax - cmin) + cmin)
+                canvas[iBand, rows, :] = ((block.astype('float32') - cmin) *
+                                          (self.numOfColor - 1) /
+                                          (cmax - cmin))
+
+        return canvas
+
+    def _make_transparent_color(self, paletteAlpha=True):
         ''' makes colors specified by self.transparency
         and self.reprojMask (if the image is reprojected) transparent
 
+        For palette images alpha is added to the palette (PNG tRNS chunk):
+        colors equal to self.transparency become transparent and pixels of
+        self.reprojMask get a free palette index with transparent color.
+        Otherwise (RGB images, or no free index, or paletteAlpha=False) the
+        image is converted to RGBA.
+
+        Parameters
+        -----------
+        paletteAlpha : bool
+            Put alpha into palette of P-mode images?
+
         Modifies
         --------
         self.pilImg : PIL image
             Adds transparency to PIL image
 
         '''
-        self.pilImg = self.pilImg.convert('RGBA')
-        datas = self.pilImg.getdata()
-        newData = list()
-
-        for item in datas:
-            if (item[0] == self.transparency[0] and
-                    item[1] == self.transparency[1] and
-                    item[2] == self.transparency[2]):
-                newData.append((255, 255, 255, 0))
-            else:
-                newData.append(item)
+        reprojMask = self._get_full_reproj_mask()
+        transparency = self.transparency
+        if transparency is not None and np.size(transparency) == 1:
+            transparency = [transparency] * 3
+
+        if self.pilImg.mode == 'P' and paletteAlpha:
+            indices = np.array(self.pilImg)
+            palette = np.array(self.pilImg.getpalette()[:768],
+                               'uint8').reshape(256, 3)
+            alpha = np.zeros(256, 'uint8') + 255
+            if transparency is not None:
+                alpha[np.all(palette == transparency[:3], axis=1)] = 0
+            if reprojMask.any():
+                # find index not used in the visible pixels
+                used = np.bincount(indices[~reprojMask], minlength=256) > 0
+                freeIndices = np.nonzero(~used)[0]
+                if len(freeIndices) == 0:
+                    return self._make_transparent_color(paletteAlpha=False)
+                indices[reprojMask] = freeIndices[-1]
+                palette[freeIndices[-1]] = 255
+                alpha[freeIndices[-1]] = 0
+            self.pilImg = Image.fromarray(indices)
+            self.pilImg.putpalette(palette.flatten())
+            self._set_palette_alpha(alpha)
+        else:
+            img = np.array(self.pilImg.convert('RGBA'))
+            if transparency is not None:
+                img[np.all(img[:, :, :3] == transparency[:3],
+                           axis=2)] = (255, 255, 255, 0)
+            # The alphaMask is set in process() before clip() the Image
+            img[:, :, 3][reprojMask] = 0
+            self.pilImg = Image.fromarray(img)
+
+    def _get_full_reproj_mask(self):
+        ''' Get self.reprojMask with the shape of self.pilImg (with legend) '''
+        reprojMask = np.zeros((self.pilImg.size[1], self.pilImg.size[0]),
+                              'bool')
+        if self.reprojMask is not None:
+            rows, cols = self.reprojMask.shape
+            reprojMask[:rows, :cols] = self.reprojMask
+        return reprojMask
+
+    def _set_palette_alpha(self, alpha):
+        '''Set alpha of palette colors of P-mode self.pilImg
+
+        Alpha is saved in the tRNS chunk of PNG files, so transparency
+        needs no conversion of the image to RGBA.
+
+        Parameters
+        -----------
+        alpha : numpy array
+            256 values of alpha (0 - transparent, 255 - opaque) for each
+            palette index
 
-        self.pilImg.putdata(newData)
+        Modifies
+        --------
+        self.pilImg.info['transparency']
 
-        # The alphaMask is set in process() before clip() the Image
-        img = np.array(self.pilImg)
-        img[:, :, 3][self.reprojMask] = 0
-        self.pilImg = Image.fromarray(np.uint8(img))
+        '''
+        alpha = np.array(alpha, 'uint8')
+        # trailing opaque colors can be skipped
+        opaque = np.nonzero(alpha < 255)[0]
+        if len(opaque) == 0:
+            self.pilImg.info.pop('transparency', None)
+        else:
+            self.pilImg.info['transparency'] = alpha[:opaque[-1] +
+                                                     1].tobytes()
 
     def save(self, fileName, **kwargs):
         ''' Save self.pilImg to a physical file
@@ -920,7 +1179,8 @@ class Figure(object):
             self.pilImg = self.pilImg.convert('RGB')
 
         if self.transparency is not None:
-            self._make_transparent_color()
+            self._make_transparent_color(
+                            paletteAlpha=fileExtension in ['png', 'PNG'])
         self.pilImg.save(fileName)
 
     def _create_palette(self):
@@ -935,6 +1195,11 @@ class Figure(object):
         self.palette : numpy array (uint8)
 
         '''
+        # use palette which was already created for that colormap
+        if (self.cmapName, self.numOfColor) in _palettes:
+            self.palette = _palettes[(self.cmapName, self.numOfColor)].copy()
+            return
+
         # test if given colormap name is in builtin or added colormaps
         try:
             cmap = cm.get_cmap(self.cmapName)
@@ -955,6 +1220,7 @@ class Figure(object):
 
         # set palette to be used by PIL
         self.palette = lut.T.flatten().astype(np.uint8)
+        _palettes[(self.cmapName, self.numOfColor)] = self.palette.copy()
 
     def _get_histogram(self, iBand):
         '''Create a subset array and return the histogram.
@@ -969,14 +1235,12 @@ class Figure(object):
         bins : numpy array
 
         '''
-        array = self.array[iBand, :, :].flatten()
-        array = array[array > np.nanmin(array)]
-        array = array[array < np.nanmax(array)]
-        step = max(int(round(float(len(array)) /
-                       float(self.subsetArraySize))), 1.0)
-        arraySubset = array[::int(step)]
-        hist, bins, patches = plt.hist(arraySubset, bins=100)
-        plt.close()
+        arraySubset = subset_array(self.array[iBand, :, :],
+                                   self.subsetArraySize)
+        arraySubset = arraySubset[np.isfinite(arraySubset)]
+        arraySubset = arraySubset[(arraySubset > arraySubset.min()) *
+                                  (arraySubset < arraySubset.max())]
+        hist, bins = np.histogram(arraySubset, bins=100)
         return hist.astype(float), bins
 
     def _round_number(self, val):
@@ -1026,3 +1290,117 @@ class Figure(object):
                     setattr(self, key, [idict[key]])
                 else:
                     setattr(self, key, idict[key])
+
+
+class FigureRenderer(object):
+    '''Render many arrays into figures with the same parameters
+
+    Palettes and fonts are loaded once per process and identical legend
+    images (same size, color limits, caption, etc.) are created once per
+    renderer (up to Figure.LEGEND_CACHE_SIZE legends are kept), which
+    makes rendering of many quick-looks much faster than calls of
+    Nansat.write_figure().
+
+    Examples
+    --------
+    renderer = FigureRenderer(cmapName='gray', legend=True)
+    renderer.render(n['sigma0_HH'], 'sigma0.png', clim=[0, 0.1],
+                    caption='sigma0_HH')
+    renderer.render_many([(n1['chlor_a'], 'chl1.png'),
+                          (n2['chlor_a'], 'chl2.png', {'clim': 'hist'})],
+                         workers=4)
+
+    '''
+    def __init__(self, **kwargs):
+        '''Set default parameters of figures
+
+        Parameters
+        -----------
+        Any of Figure.__init__() parameters and
+        clim : [min, max] or 'hist'
+            color limits (instead of cmin and cmax) or estimation of color
+            limits with Figure.clim_from_histogram()
+
+        '''
+        self.kwargs = kwargs
+        self.legendCache = OrderedDict()
+
+    def render(self, array, fileName=None, **kwargs):
+        '''Create figure from array and save it
+
+        Parameters
+        -----------
+        array : numpy array or callable
+            data for Figure (2D or 3D). Callable (e.g. functools.partial)
+            which returns the data is called here (in the worker process
+            for render_many())
+        fileName : str
+            name of the output file. If None, the figure is not saved
+        **kwargs : dict
+            parameters of the figure. Override the parameters of the
+            renderer.
+
+        Returns
+        --------
+        fig : Figure
+            processed figure
+
+        '''
+        params = dict(self.kwargs)
+        params.update(kwargs)
+        clim = params.pop('clim', None)
+        if callable(array):
+            array = array()
+
+        fig = Figure(array, legendCache=self.legendCache, **params)
+        if clim == 'hist':
+            clim = fig.clim_from_histogram(**params)
+        if clim is not None:
+            params['cmin'], params['cmax'] = clim[0], clim[1]
+        fig.process(**params)
+        if fileName is not None:
+            fig.save(fileName)
+
+        return fig
+
+    def render_many(self, items, workers=1):
+        '''Render and save many figures, optionally in several processes
+
+        Parameters
+        -----------
+        items : list of tuples
+            (array, fileName) or (array, fileName, kwargs), see render()
+        workers : int
+            number of processes. Each process has own caches.
+
+        Returns
+        --------
+        fileNames : list of str
+            names of the saved files
+
+        '''
+        items = [tuple(item) + ({}, ) * (3 - len(item)) for item in items]
+        if workers > 1 and len(items) > 1:
+            pool = mp.Pool(workers, _init_renderer, (self, ))
+            try:
+                fileNames = pool.map(_render_item, items)
+            finally:
+                pool.terminate()
+        else:
+            _init_renderer(self)
+            fileNames = map(_render_item, items)
+
+        return fileNames
+
+
+def _init_renderer(renderer):
+    ''' Set renderer for the worker process '''
+    global _workerRenderer
+    _workerRenderer = renderer
+
+
+def _render_item(item):
+    ''' Render one (array, fileName, kwargs) item in the worker process '''
+    array, fileName, kwargs = item
+    _workerRenderer.render(array, fileName, **kwargs)
+    return fileName
@@ -0,0 +1,168 @@
+# Name:    mapper_registry.py
+# Purpose: Declared capabilities of mappers for lazy import
+# Authors:      Asuka Yamakawa, Anton Korosov, Knut-Frode Dagestad,
+#               Morten W. Hansen, Alexander Myasoyedov,
+#               Dmitry Petrenko, Evgeny Morozov, Aleksander Vines
+# Created:      19.10.2026
+# Copyright:    (c) NERSC 2011 - 2026
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import
+import os
+import pkgutil
+from fnmatch import fnmatchcase
+
+# Capabilities of mappers which are checked before a mapper module is
+# imported. Keys are names of mapper modules, values are dicts with:
+#   patterns : list of fnmatch patterns of the file name. A pattern is
+#              matched against the base name and against the full name.
+#   drivers  : list of short names of GDAL drivers which can open the file
+#   imports  : list of modules required by the mapper
+# A mapper is a candidate for a file if any of the patterns or drivers
+# matches (or if neither is declared). Only checks which are done by the
+# mapper unconditionally, before anything else, may be declared here:
+# mappers which are not listed are always candidates.
+MAPPERS = {
+    'mapper_amsr2_l1r': {
+        'patterns': ['GW1AM2_*.h5'],
+        'imports': ['pythesint']},
+    'mapper_ascat_nasa': {
+        'patterns': ['ascat_*.nc'],
+        'imports': ['pythesint']},
+    'mapper_aster_l1a': {
+        'patterns': ['*AST_L1A_*']},
+    'mapper_case2reg': {
+        'patterns': ['*MER_*N1_C2IOP*.nc', '*N1_C2IOP*MER_*.nc'],
+        'imports': ['pythesint']},
+    'mapper_csks': {
+        'patterns': ['CSKS*']},
+    'mapper_emodnet': {
+        'patterns': ['*.mnt']},
+    'mapper_globcolour_l3b': {
+        'patterns': ['L3b_*.nc']},
+    'mapper_gtopo30': {
+        'patterns': ['gtopo30.vrt', '*.DEM']},
+    'mapper_metno_hires_seaice': {
+        'patterns': ['metno_hires_seaice*']},
+    'mapper_metno_local_hires_seaice': {
+        'patterns': ['metno_local_hires_seaice*']},
+    'mapper_mod44w': {
+        'patterns': ['MOD44W.vrt'],
+        'imports': ['pythesint']},
+    'mapper_ncep_wind_online': {
+        'patterns': ['ncep_wind_online*']},
+    'mapper_netcdf_cf': {
+        'patterns': ['*nc'],
+        'imports': ['netCDF4', 'dateutil']},
+    'mapper_nora10_local_vpv': {
+        'patterns': ['nora10_local_vpv*']},
+    'mapper_obpg_l2_nc': {
+        'patterns': ['*.nc'],
+        'imports': ['pythesint']},
+    'mapper_opendap': {
+        'patterns': ['http://*', 'https://*'],
+        'imports': ['netCDF4']},
+    'mapper_opendap_arome': {
+        'patterns': ['http://thredds.met.no/thredds/catalog/arome25/*'],
+        'imports': ['netCDF4']},
+    'mapper_opendap_globcurrent': {
+        'patterns': ['http://www.ifremer.fr/opendap/cerdap1/globcurrent/'
+                     'v2.0/*'],
+        'imports': ['netCDF4', 'pythesint', 'dateutil']},
+    'mapper_opendap_globcurrent_thredds': {
+        'patterns': ['http://tds0.ifremer.fr/thredds/dodsC/CLS-L4*'],
+        'imports': ['netCDF4', 'pythesint']},
+    'mapper_opendap_occci': {
+        'patterns': ['https://rsg.pml.ac.uk/thredds/dodsC/CCI_ALL*',
+                     'https://www.oceancolour.org/thredds/dodsC/CCI_ALL*'],
+        'imports': ['netCDF4', 'pythesint']},
+    'mapper_opendap_osisaf': {
+        'patterns': ['http://thredds.met.no/thredds/dodsC/cryoclim/met.no/'
+                     'osisaf-nh*',
+                     'http://thredds.met.no/thredds/dodsC/osisaf_test/met.no/'
+                     'ice/*',
+                     'http://thredds.met.no/thredds/dodsC/osisaf/met.no/'
+                     'ice/*'],
+        'imports': ['netCDF4', 'pythesint']},
+    'mapper_opendap_siwtacsst': {
+        'patterns': ['http://thredds.met.no/thredds/dodsC/myocean/siw-tac/'
+                     'sst-metno-arc-sst03/*',
+                     'http://thredds.met.no/thredds/dodsC/myocean/siw-tac/'
+                     'sst-metno-arc-sst03_V1/*',
+                     'http://thredds.met.no/thredds/dodsC/sea_ice/'
+                     'SST-METNO-ARC-SST_L4-OBS-V2-V1/*'],
+        'imports': ['netCDF4', 'pythesint']},
+    'mapper_opendap_sstcci': {
+        'patterns': ['http://dap.ceda.ac.uk/data/neodc/esacci/sst/data/lt/'
+                     'Analysis/L4/v01.1/*'],
+        'imports': ['netCDF4', 'pythesint', 'dateutil']},
+    'mapper_pathfinder52': {
+        'patterns': ['*AVHRR_Pathfinder-PFV5.2*']},
+    'mapper_smos_mat': {
+        'patterns': ['*.MAT', '*OSUDP2*.mat']},
+    'mapper_viirs_l1': {
+        'patterns': ['*GMTCO_npp_*']},
+}
+
+
+def is_candidate(mapperName, fileName, driver=None):
+    '''Check if mapper may open the file without importing the mapper
+
+    Parameters
+    -----------
+    mapperName : str
+        name of the mapper module (e.g. 'mapper_netcdf_cf')
+    fileName : str
+        name of the input file
+    driver : str
+        short name of the GDAL driver which opened the file (or None)
+
+    Returns
+    --------
+    isCandidate : bool
+        False if the declared patterns and drivers do not match the file
+
+    '''
+    entry = MAPPERS.get(mapperName, {})
+    patterns = entry.get('patterns', [])
+    drivers = entry.get('drivers', [])
+    if len(patterns) == 0 and len(drivers) == 0:
+        return True
+
+    if driver is not None and driver in drivers:
+        return True
+
+    names = [fileName, os.path.basename(fileName)]
+    for pattern in patterns:
+        for name in names:
+            if fnmatchcase(name, pattern):
+                return True
+
+    return False
+
+
+def get_missing_imports(mapperName):
+    '''Find declared imports of mapper which are not installed
+
+    Modules are only searched, not imported.
+
+    Parameters
+    -----------
+    mapperName : str
+        name of the mapper module
+
+    Returns
+    --------
+    missing : list
+        names of modules which cannot be found
+
+    '''
+    return [module for module in MAPPERS.get(mapperName, {}).get('imports', [])
+            if pkgutil.find_loader(module) is None]
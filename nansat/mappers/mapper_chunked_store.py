@@ -0,0 +1,138 @@
+# Name:        mapper_chunked_store
+# Purpose:     Mapping for chunked directory stores made by Nansat.export_store
+# Authors:      Anton Korosov
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+import os
+import json
+from string import Template
+
+from nansat.vrt import VRT, GeolocationArray
+from nansat.tools import gdal, WrongMapperError
+
+# name of the JSON file with metadata of the store
+STORE_METADATA = 'nansat_store.json'
+
+# source of the band VRT with one chunk (GeoTIFF with one strip)
+CHUNK_SOURCE = Template('''
+    <SimpleSource>
+      <SourceFilename relativeToVRT="0">$SrcFileName</SourceFilename>
+      <SourceBand>1</SourceBand>
+      <SourceProperties RasterXSize="$XSize" RasterYSize="$YSize"
+        DataType="$DataType" BlockXSize="$XSize" BlockYSize="$YSize"/>
+      <SrcRect xOff="0" yOff="0" xSize="$XSize" ySize="$YSize"/>
+      <DstRect xOff="$XOff" yOff="$YOff" xSize="$XSize" ySize="$YSize"/>
+    </SimpleSource>''')
+
+# band VRT with all chunks
+BAND_VRT = Template('''<VRTDataset rasterXSize="$XSize" rasterYSize="$YSize">
+  <VRTRasterBand dataType="$DataType" band="1">$Sources
+  </VRTRasterBand>
+</VRTDataset>''')
+
+
+class Mapper(VRT):
+    ''' VRT with bands from chunked directory store (Nansat.export_store)
+
+    The store is a directory with nansat_store.json (georeference, band
+    metadata, GCPs) and one subdirectory per band with chunks of data
+    (compressed GeoTIFFs). Each band is one VRT with a mosaic of chunks,
+    and GDAL opens and decompresses only the chunks needed for the
+    requested window.
+
+    '''
+    def __init__(self, fileName, gdalDataset, gdalMetadata, **kwargs):
+        ''' Create VRT '''
+        fileName = os.path.abspath(fileName)
+        if os.path.basename(fileName) == STORE_METADATA:
+            fileName = os.path.dirname(fileName)
+        storeFileName = os.path.join(fileName, STORE_METADATA)
+        if not os.path.isfile(storeFileName):
+            raise WrongMapperError
+
+        with open(storeFileName) as storeFile:
+            store = json.load(storeFile)
+
+        ySize, xSize = store['shape']
+        gcps = [gdal.GCP(gcp[2], gcp[3], gcp[4], gcp[0], gcp[1])
+                for gcp in store['gcps']]
+        metadata = dict([(str(key), str(store['metadata'][key]))
+                         for key in store['metadata']])
+
+        # create empty VRT dataset with geolocation only
+        VRT.__init__(self,
+                     srcGeoTransform=tuple(store['geotransform']),
+                     srcProjection=str(store['projection']),
+                     srcRasterXSize=xSize,
+                     srcRasterYSize=ySize,
+                     srcGCPs=gcps,
+                     srcGCPProjection=str(store['gcpProjection']),
+                     srcMetadata=metadata)
+
+        metaDict = []
+        geolocation = {}
+        for band in store['bands']:
+            bandVRT = self._create_band_vrt(os.path.join(fileName,
+                                                         band['path']),
+                                            band['dataType'], store)
+            bandMetadata = dict([(str(key), str(band['metadata'][key]))
+                                 for key in band['metadata']])
+            bandName = bandMetadata.get('name', str(band['path']))
+            self.bandVRTs[bandName] = bandVRT
+            if bandName in ['GEOLOCATION_X_DATASET', 'GEOLOCATION_Y_DATASET']:
+                geolocation[bandName] = bandVRT
+                continue
+            metaDict.append({'src': {'SourceFilename': bandVRT.fileName,
+                                     'SourceBand': 1},
+                             'dst': bandMetadata})
+
+        # add bands with metadata and corresponding values to the empty VRT
+        self._create_bands(metaDict)
+
+        if len(geolocation) == 2:
+            self.add_geolocationArray(GeolocationArray(
+                                        geolocation['GEOLOCATION_X_DATASET'],
+                                        geolocation['GEOLOCATION_Y_DATASET']))
+
+    def _create_band_vrt(self, bandPath, dataType, store):
+        '''Create VRT with mosaic of chunks of one band
+
+        Parameters
+        -----------
+        bandPath : str
+            directory with chunks of the band
+        dataType : str
+            GDAL data type of the band
+        store : dict
+            content of nansat_store.json
+
+        Returns
+        --------
+        bandVRT : VRT
+            VRT with one band and one source per chunk
+
+        '''
+        ySize, xSize = store['shape']
+        chunkYSize, chunkXSize = store['chunks']
+
+        bandVRT = VRT(srcRasterXSize=xSize, srcRasterYSize=ySize)
+        sources = ''
+        for yOff in range(0, ySize, chunkYSize):
+            for xOff in range(0, xSize, chunkXSize):
+                chunkName = os.path.join(bandPath, '%d.%d.tif' %
+                                         (yOff / chunkYSize,
+                                          xOff / chunkXSize))
+                sources += CHUNK_SOURCE.substitute(
+                                SrcFileName=chunkName,
+                                DataType=dataType,
+                                XOff=xOff,
+                                YOff=yOff,
+                                XSize=min(chunkXSize, xSize - xOff),
+                                YSize=min(chunkYSize, ySize - yOff))
+
+        bandVRT.write_xml(BAND_VRT.substitute(XSize=xSize, YSize=ySize,
+                                              DataType=dataType,
+                                              Sources=sources))
+
+        return bandVRT
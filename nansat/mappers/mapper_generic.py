@@ -12,6 +12,10 @@ import datetime
 
 import numpy as np
 from scipy.io.netcdf import netcdf_file
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
 
 try:
     from cfunits import Units
@@ -384,15 +388,23 @@ class Mapper(VRT):
         try:
             ncFile = netcdf_file(fileName, 'r')
         except (TypeError, IOError) as e:
-            self.logger.info('%s' % e)
-            return None
+            # NetCDF4 files (e.g. from Nansat.export_netcdf4) are read with
+            # netCDF4, if available
+            if netCDF4 is None:
+                self.logger.info('%s' % e)
+                return None
+            try:
+                ncFile = netCDF4.Dataset(fileName, 'r')
+            except (RuntimeError, IOError) as e:
+                self.logger.info('%s' % e)
+                return None
 
         # check if all GCP variables exist in the file
         if not all([var in ncFile.variables for var in gcpVariables]):
             return None
 
         # get data from GCP variables into array
-        varData = [ncFile.variables[var][:] for var in gcpVariables]
+        varData = [np.array(ncFile.variables[var][:]) for var in gcpVariables]
         varData = np.array(varData)
 
         # close input file
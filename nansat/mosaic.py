@@ -16,6 +16,11 @@
 # but WITHOUT ANY WARRANTY without even the implied warranty of
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
 from __future__ import absolute_import
+import os
+import time
+import datetime
+import json
+import tempfile
 import multiprocessing as mp
 import ctypes
 
@@ -26,32 +31,58 @@ else:
     from scipy.stats import nanmedian
 
 from nansat.nansat import Nansat
+from nansat.tools import OptionError, parse_time
 
-# shared arrays for mean, squared mean and count
+# shared arrays for count, mask, sum and squared sum (one slot per worker)
 sharedArray = None
+sharedShape = None
 domain = None
+# index of slot in the sharedArray used by the current worker
+workerSlot = 0
 
 
 def mparray2ndarray(sharedArray, shape, dtype='float32'):
     ''' convert shared multiprocessing Array to numpy ndarray '''
-    # get access to shared array and convert to numpy ndarray
-    sharedNDArray = np.frombuffer(sharedArray.get_obj(), dtype=dtype)
+    # get access to shared array (Array or RawArray) and convert to ndarray
+    if hasattr(sharedArray, 'get_obj'):
+        sharedArray = sharedArray.get_obj()
+    sharedNDArray = np.frombuffer(sharedArray, dtype=dtype)
     # change shape to match bands
     sharedNDArray.shape = shape
 
     return sharedNDArray
 
 
+def init_worker(slotCounter):
+    ''' Assign a slot of the sharedArray to a new worker process '''
+    global workerSlot
+    with slotCounter.get_lock():
+        workerSlot = slotCounter.value
+        slotCounter.value += 1
+
+
 def sumup(layer):
-    ''' Sum up bands from input images in multiple threads'''
+    ''' Sum up bands from input images in multiple threads
+
+    Each worker adds the data into its own slot of the sharedArray,
+    therefore no locking is needed.
+
+    Returns
+    --------
+    fileName, status, duration, bandMetadata : see Layer.make_nansat_object
+    bandMetadata is None for skipped layers
+
+    '''
     global sharedArray
+    global sharedShape
     global domain
+    global workerSlot
 
     # get nansat from the input Layer
-    layer.make_nansat_object(domain)
-    # if not in the period, quit
-    if not layer.within_period():
-        return 1
+    # if not in the period or not overlapping, quit
+    if layer.make_nansat_object(domain) != 'used':
+        return layer.fileName, layer.status, layer.duration, None
+    t0 = time.time()
     # get mask
     mask = layer.get_mask_array()
     # get arrays with data
@@ -61,31 +92,203 @@ def sumup(layer):
     # get metadata
     bandMetadata = [layer.n.get_metadata(bandID=band) for band in layer.bands]
 
-    with sharedArray.get_lock(): #  synchronize access
-        sharedNDArray = mparray2ndarray(sharedArray,
-                                        (2+len(layer.bands)*2,
-                                         mask.shape[0],
-                                         mask.shape[1]),
-                                        'float32')
-        gpi = finiteMask * (mask == 64)
-
-        # update counter
-        sharedNDArray[0][gpi] += 1
+    slot = mparray2ndarray(sharedArray, sharedShape, 'float64')[workerSlot]
+    gpi = finiteMask * (mask == 64)
 
-        # update mask with max
-        sharedNDArray[1] = np.max([sharedNDArray[1], mask], axis=0)
+    # update counter
+    slot[0][gpi] += 1
 
-        # update sum for each band
-        for i, bandArray in enumerate(bandArrays):
-            sharedNDArray[2+i][gpi] += bandArray[gpi]
+    # update mask with max
+    np.maximum(slot[1], mask, out=slot[1])
 
-        # update squared sum for each band
-        for i, bandArray in enumerate(bandArrays):
-            sharedNDArray[2+len(layer.bands)+i][gpi] += bandArray[gpi]
+    # update sum and squared sum for each band
+    for i, bandArray in enumerate(bandArrays):
+        bandValues = bandArray[gpi]
+        slot[2 + i][gpi] += bandValues
+        slot[2 + len(layer.bands) + i][gpi] += np.square(bandValues)
 
     # release layer
-    layer = None
-    return bandMetadata
+    layer.n = None
+    return (layer.fileName, layer.status,
+            layer.duration + time.time() - t0, bandMetadata)
+
+
+def reduce_slots(slots):
+    ''' Add slot <slots[1]> of the sharedArray to slot <slots[0]> '''
+    global sharedArray
+    global sharedShape
+
+    sharedNDArray = mparray2ndarray(sharedArray, sharedShape, 'float64')
+    dst, src = sharedNDArray[slots[0]], sharedNDArray[slots[1]]
+    # counter, sums and squared sums are added, mask is maximum
+    dst[0] += src[0]
+    np.maximum(dst[1], src[1], out=dst[1])
+    dst[2:] += src[2:]
+
+    return 0
+
+
+def composite_layer(args):
+    ''' Put pixels of the input layer into composite if they are better
+
+    Each worker keeps the best key, source index and band values in its
+    own slot of the sharedArray: [key, index, band1, band2, ...]. The layer
+    is read by blocks of rows.
+
+    Parameters
+    -----------
+    args : tuple
+        (layer, index, mode, keyBand, blockSize), see Mosaic.composite
+
+    Returns
+    --------
+    fileName, status, duration, bandMetadata : see sumup()
+
+    '''
+    global sharedArray
+    global sharedShape
+    global domain
+    global workerSlot
+
+    layer, index, mode, keyBand, blockSize = args
+    if layer.make_nansat_object(domain) != 'used':
+        return layer.fileName, layer.status, layer.duration, None
+    t0 = time.time()
+
+    # key for latest or first is time, required for all files
+    layerKey = None
+    if mode in ['latest', 'first']:
+        ntime = layer.n.get_metadata().get('time_coverage_start', None)
+        if ntime is None:
+            raise OptionError('%s has no time_coverage_start required for '
+                              'mode "%s"' % (layer.fileName, mode))
+        ntime = layer._naive_utc(parse_time(ntime))
+        layerKey = (ntime - datetime.datetime(1970, 1, 1)).total_seconds()
+        if mode == 'first':
+            layerKey = -layerKey
+
+    slot = mparray2ndarray(sharedArray, sharedShape, 'float64')[workerSlot]
+    rows = slot.shape[1]
+    for yOff in range(0, rows, blockSize):
+        ySize = min(blockSize, rows - yOff)
+        mask = layer.get_mask_array(yOff, ySize)
+        bandArrays = np.array([layer.n._get_band_data(band, 0, yOff, None,
+                                                      ySize)
+                               for band in layer.bands], 'float64')
+        if mode in ['latest', 'first']:
+            key = np.zeros(mask.shape) + layerKey
+        else:
+            key = bandArrays[layer.bands.index(keyBand)]
+            if mode == 'min':
+                key = -key
+        gpi = (np.isfinite(bandArrays.sum(axis=0)) * np.isfinite(key) *
+               (mask == 64))
+
+        # update pixels with better key (or same key and lower index)
+        block = slot[:, yOff:yOff + ySize]
+        better = gpi * ((key > block[0]) +
+                        (key == block[0]) * (index < block[1]))
+        block[0][better] = key[better]
+        block[1][better] = index
+        for i in range(block.shape[0] - 2):
+            block[2 + i][better] = bandArrays[i][better]
+
+    bandMetadata = [layer.n.get_metadata(bandID=band) for band in layer.bands]
+    layer.n = None
+    return (layer.fileName, layer.status,
+            layer.duration + time.time() - t0, bandMetadata)
+
+
+def reduce_composite_slots(slots):
+    ''' Merge slot <slots[1]> of the sharedArray into slot <slots[0]> '''
+    global sharedArray
+    global sharedShape
+
+    sharedNDArray = mparray2ndarray(sharedArray, sharedShape, 'float64')
+    dst, src = sharedNDArray[slots[0]], sharedNDArray[slots[1]]
+    better = ((src[0] > dst[0]) + (src[0] == dst[0]) * (src[1] < dst[1]))
+    dst[:, better] = src[:, better]
+
+    return 0
+
+
+def read_layer(layer):
+    ''' Read bands and mask from the input Layer in a worker process
+
+    Returns
+    --------
+    fileName, status, duration : see Layer.make_nansat_object
+    data : None for skipped layers or tuple with
+        (bandArrays, mask, metadata)
+
+    '''
+    global domain
+
+    if layer.make_nansat_object(domain) != 'used':
+        return layer.fileName, layer.status, layer.duration, None
+    t0 = time.time()
+    mask = layer.get_mask_array()
+    bandArrays = np.array([layer.n[band] for band in layer.bands], 'float32')
+    bandMetadata = [layer.n.get_metadata(bandID=band) for band in layer.bands]
+    layer.n = None
+
+    return (layer.fileName, layer.status, layer.duration + time.time() - t0,
+            (bandArrays, mask, bandMetadata))
+
+
+def slot_accumulator(slot, bands):
+    ''' Get Accumulator which keeps its arrays in <slot> of the sharedArray
+
+    The slot contains [count, mask, sum1, sum2, ..., m2_1, m2_2, ...]
+
+    '''
+    # arrays of the new accumulator are replaced by views of the slot
+    accumulator = Accumulator(shape=(0, 0), bands=bands)
+    accumulator.count = slot[0]
+    accumulator.mask = slot[1]
+    accumulator.sum = slot[2:2 + len(bands)]
+    accumulator.m2 = slot[2 + len(bands):]
+
+    return accumulator
+
+
+def accumulate_layer(layer):
+    ''' Add input Layer into the Accumulator in the slot of the worker
+
+    Each worker adds the data into its own slot of the sharedArray,
+    therefore no locking is needed.
+
+    Returns
+    --------
+    fileName, status, duration, bandMetadata : see sumup()
+
+    '''
+    global sharedArray
+    global sharedShape
+    global workerSlot
+
+    fileName, status, duration, data = read_layer(layer)
+    if data is None:
+        return fileName, status, duration, None
+    t0 = time.time()
+    bandArrays, mask, bandMetadata = data
+    slot = mparray2ndarray(sharedArray, sharedShape, 'float64')[workerSlot]
+    slot_accumulator(slot, layer.bands).add_layer(bandArrays, mask)
+
+    return fileName, status, duration + time.time() - t0, bandMetadata
+
+
+def reduce_accumulator_slots(slots):
+    ''' Combine slot <slots[1]> of the sharedArray into slot <slots[0]> '''
+    global sharedArray
+    global sharedShape
+
+    sharedNDArray = mparray2ndarray(sharedArray, sharedShape, 'float64')
+    bands = range((sharedShape[1] - 2) / 2)
+    dst = slot_accumulator(sharedNDArray[slots[0]], bands)
+    dst.combine(slot_accumulator(sharedNDArray[slots[1]], bands))
+
+    return 0
 
 
 class Layer:
@@ -106,39 +309,262 @@ class Layer:
         self.logLevel     = logLevel
 
     def make_nansat_object(self, domain):
+        ''' Open file, check time and footprint, reproject onto domain
+
+        Opening is lazy, so files out of period or not overlapping the
+        domain are rejected before the expensive reprojection.
+
+        Modifies
+        ---------
+        self.n : Nansat object
+        self.status : str
+            'used' - the file is opened and reprojected
+            'period' - the file is out of period
+            'overlap' - the file does not overlap the domain
+        self.duration : float
+            time spent (seconds)
+
+        Returns
+        --------
+        self.status : str
+
+        '''
+        t0 = time.time()
         # Open self.fileName with self.opener
-        print 'Layer', self.fileName, self.logLevel
         self.n = self.opener(self.fileName, logLevel=self.logLevel)
-        if self.doReproject:
-            self.n.reproject(domain, eResampleAlg=self.eResampleAlg)
+        if not self.within_period():
+            self.status = 'period'
+        elif self.doReproject and not self.n.overlaps(domain):
+            self.status = 'overlap'
+        else:
+            self.status = 'used'
+            if self.doReproject:
+                self.n.reproject(domain, eResampleAlg=self.eResampleAlg)
+        self.duration = time.time() - t0
+
+        return self.status
 
     def within_period(self):
         ''' Test if given file is within period of time '''
         withinPeriod = True
         ntime = self.n.get_metadata().get('time_coverage_start', None)
         if (ntime is None and any(self.period)):
-            withinPeriod = False
+            return False
+        if ntime is not None:
+            ntime = self._naive_utc(parse_time(ntime))
 
-        if (self.period[0] is not None and ntime < self.period[0]):
-            withinPeriod = False
-
-        if (self.period[1] is not None and ntime > self.period[1]):
-            withinPeriod = False
+        for i, limit in enumerate(self.period):
+            if limit is None:
+                continue
+            if isinstance(limit, str):
+                limit = parse_time(limit)
+            limit = self._naive_utc(limit)
+            if ((i == 0 and ntime < limit) or
+                    (i == 1 and ntime > limit)):
+                withinPeriod = False
 
         return withinPeriod
 
-    def get_mask_array(self):
-        ''' Get array with mask values '''
+    def _naive_utc(self, dt):
+        ''' Convert timezone aware datetime into naive datetime in UTC '''
+        if dt.tzinfo is not None:
+            dt = dt.replace(tzinfo=None) - dt.utcoffset()
+        return dt
+
+    def get_mask_array(self, yOff=0, ySize=None):
+        ''' Get array with mask values (optionally only rows from yOff) '''
+        if ySize is None:
+            ySize = self.n.shape()[0] - yOff
         if self.n.has_band(self.maskName):
-            mask = self.n[self.maskName]
+            mask = self.n._get_band_data(self.maskName, 0, yOff, None, ySize)
         elif self.doReproject:
-            mask = self.n['swathmask'] * 64
+            mask = self.n._get_band_data('swathmask', 0, yOff,
+                                         None, ySize) * 64
         else:
-            mask = np.ones(self.n.shape()) * 64
+            mask = np.ones((ySize, self.n.shape()[1])) * 64
 
         return mask
 
 
+class Accumulator(object):
+    '''Persistent sums of mosaiced layers for incremental averaging
+
+    Keeps number of valid values, sum and sum of squared deviations from
+    mean (M2) of each band, maximum of the mask, band metadata and the
+    manifest (list of added files). Files which were rejected (out of
+    period or not overlapping) are kept with their status in self.rejected.
+    Layers are added with the Welford algorithm and accumulators (e.g. from
+    several worker processes) are combined with the Chan algorithm, so
+    variance is numerically stable. The accumulator is saved into NPZ-file.
+    '''
+    def __init__(self, fileName=None, shape=None, bands=None):
+        '''Create empty accumulator or load it from file
+
+        Parameters
+        -----------
+        fileName : str
+            name of the file saved by Accumulator.save()
+        shape : tuple
+            (ySize, xSize) of the mosaic, for a new accumulator
+        bands : list
+            names of bands, for a new accumulator
+
+        '''
+        if fileName is not None:
+            self.load(fileName)
+            return
+
+        self.bands = [str(b) for b in bands]
+        self.count = np.zeros(shape, 'int64')
+        self.mask = np.zeros(shape, 'uint8')
+        self.sum = np.zeros((len(self.bands),) + tuple(shape), 'float64')
+        self.m2 = np.zeros((len(self.bands),) + tuple(shape), 'float64')
+        self.metadata = None
+        self.manifest = []
+        self.rejected = {}
+
+    def add_layer(self, bandArrays, mask, metadata=None, fileName=None):
+        '''Add data from one layer (Welford algorithm)
+
+        Parameters
+        -----------
+        bandArrays : numpy array
+            3D array with data from all bands
+        mask : numpy array
+            L2-mask (64 - valid pixels)
+        metadata : list of dict
+            metadata of the bands
+        fileName : str
+            name of the input file to add into manifest
+
+        '''
+        gpi = np.isfinite(bandArrays.sum(axis=0)) * (mask == 64)
+        np.maximum(self.mask, mask, out=self.mask, casting='unsafe')
+        self.count[gpi] += 1
+        count = self.count[gpi]
+        for i, bandArray in enumerate(bandArrays):
+            values = bandArray[gpi].astype('float64')
+            oldMean = (self.sum[i][gpi] /
+                       np.maximum(count - 1, 1)) * (count > 1)
+            newMean = oldMean + (values - oldMean) / count
+            self.m2[i][gpi] += (values - oldMean) * (values - newMean)
+            self.sum[i][gpi] += values
+
+        if self.metadata is None and metadata is not None:
+            self.metadata = metadata
+        if fileName is not None:
+            self.manifest.append(fileName)
+
+    def add_layers(self, layers):
+        '''Read input Layers and add the used ones, record rejected ones
+
+        Parameters
+        -----------
+        layers : list of Layer
+            input layers
+
+        Returns
+        --------
+        layerResults : list
+            (fileName, status, duration) of each layer
+
+        '''
+        layerResults = []
+        for layer in layers:
+            fileName, status, duration, data = read_layer(layer)
+            layerResults.append((fileName, status, duration))
+            if data is None:
+                self.rejected[fileName] = status
+            else:
+                bandArrays, mask, metadata = data
+                self.add_layer(bandArrays, mask, metadata, fileName)
+
+        return layerResults
+
+    def combine(self, other):
+        '''Add another accumulator (Chan algorithm)
+
+        Parameters
+        -----------
+        other : Accumulator
+            accumulator with the same shape and bands
+
+        '''
+        if other.bands != self.bands or other.count.shape != self.count.shape:
+            raise OptionError('Accumulators have different bands or shapes')
+        count = self.count + other.count
+        gpi = (self.count > 0) * (other.count > 0)
+        for i in range(len(self.bands)):
+            meanA = self.sum[i][gpi] / self.count[gpi]
+            meanB = other.sum[i][gpi] / other.count[gpi]
+            self.m2[i][gpi] += (np.square(meanB - meanA) *
+                                self.count[gpi] * other.count[gpi] /
+                                count[gpi])
+            self.m2[i] += other.m2[i]
+            self.sum[i] += other.sum[i]
+        self.count[...] = count
+        np.maximum(self.mask, other.mask, out=self.mask, casting='unsafe')
+        if self.metadata is None:
+            self.metadata = other.metadata
+        self.manifest += other.manifest
+        self.rejected.update(other.rejected)
+
+    def get_mean(self):
+        ''' Get 3D array with mean values of bands (nan if no data) '''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum / self.count
+
+    def get_std(self):
+        ''' Get 3D array with standard deviation of bands (nan if no data)'''
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(self.m2 / self.count)
+
+    def save(self, fileName):
+        '''Save accumulator into NPZ-file
+
+        Parameters
+        -----------
+        fileName : str
+            name of the output file
+
+        '''
+        # write into file object, otherwise savez appends '.npz' to the name
+        with open(fileName, 'wb') as outFile:
+            np.savez(outFile, count=self.count, mask=self.mask, sum=self.sum,
+                     m2=self.m2,
+                     bands=np.array([str(b) for b in self.bands]),
+                     metadata=json.dumps(self.metadata),
+                     manifest=np.array(self.manifest, 'str'),
+                     rejected=np.array(self.rejected.keys(), 'str'),
+                     rejectedStatus=np.array(self.rejected.values(), 'str'))
+
+    def load(self, fileName):
+        '''Load accumulator from NPZ-file
+
+        Parameters
+        -----------
+        fileName : str
+            name of the file made by Accumulator.save()
+
+        '''
+        data = np.load(fileName)
+        self.count = data['count']
+        self.mask = data['mask']
+        self.sum = data['sum']
+        self.m2 = data['m2']
+        self.bands = [str(b) for b in data['bands']]
+        self.metadata = json.loads(str(data['metadata']))
+        if self.metadata is not None:
+            self.metadata = [dict((str(key), str(val))
+                                  for key, val in bandMeta.items())
+                             for bandMeta in self.metadata]
+        self.manifest = [str(f) for f in data['manifest']]
+        self.rejected = {}
+        if 'rejected' in data.files:
+            self.rejected = dict((str(f), str(status)) for f, status in
+                                 zip(data['rejected'], data['rejectedStatus']))
+
+
 class Mosaic(Nansat):
     '''Container for mosaicing methods
 
@@ -182,7 +608,9 @@ class Mosaic(Nansat):
         opener : child of Nansat, [Nansat]
             This class is used to read input files
         threads : int
-            number of parallel processes to use
+            number of parallel processes to use. Each process accumulates
+            sums in its own copy of the output arrays, the copies are
+            added together at the end.
         eResampleAlg : int, [0]
             agorithm for reprojection, see Nansat.reproject()
         period : [datetime0, datetime1]
@@ -191,7 +619,9 @@ class Mosaic(Nansat):
         '''
         # shared array for multiple threads
         global sharedArray
+        global sharedShape
         global domain
+        global workerSlot
 
         # check inputs
         if len(files) == 0:
@@ -200,11 +630,10 @@ class Mosaic(Nansat):
 
         # get desired shape
         dstShape = self.shape()
-        # preallocate shared mem array
-        sharedArray = mp.Array(ctypes.c_float,
-                               [0]*(2 +
-                                    len(bands) +
-                                    len(bands)) * dstShape[0] * dstShape[1])
+        # preallocate shared mem array with one slot for each worker
+        threads = max(1, min(threads, len(files)))
+        sharedShape = (threads, 2 + len(bands) * 2, dstShape[0], dstShape[1])
+        sharedArray = mp.RawArray(ctypes.c_double, int(np.prod(sharedShape)))
 
         # create list of layers
         domain = Nansat(domain=self)
@@ -212,32 +641,41 @@ class Mosaic(Nansat):
                         eResampleAlg, period, self.logger.level)
                         for ifile in files]
 
-        # test in debug
-        # sumup(layers[0])
+        if threads == 1:
+            # run reprojection and summing up in this process
+            workerSlot = 0
+            results = map(sumup, layers)
+        else:
+            # prepare pool of processors, each with own slot
+            slotCounter = mp.Value(ctypes.c_int, 0)
+            pool = mp.Pool(threads, init_worker, (slotCounter,))
+
+            # run reprojection and summing up
+            results = pool.map(sumup, layers)
 
-        # prepare pool of processors
-        pool = mp.Pool(threads)
+            # tree reduction of slots: 0 += 1, 2 += 3, ...; 0 += 2, ...
+            step = 1
+            while step < threads:
+                pool.map(reduce_slots, [(i, i + step) for i in
+                                        range(0, threads - step, step * 2)])
+                step *= 2
 
-        # run reprojection and summing up
-        metadata = pool.map(sumup, layers)
+            # cleanup
+            pool.terminate()
+            pool = None
 
         # get band metadata from the first valid file
-        for bandsMeta in metadata:
+        for result in results:
+            bandsMeta = result[3]
             if type(bandsMeta) is list:
                 break
 
-        # average products
-        sharedNDArray = mparray2ndarray(sharedArray,
-                                        (2+len(bands)*2,
-                                        dstShape[0],
-                                        dstShape[1]),
-                                        'float32')
+        # average products (all slots are reduced into the first one)
+        sharedNDArray = mparray2ndarray(sharedArray, sharedShape,
+                                        'float64')[0]
 
         # cleanup
-        pool.terminate()
-        pool = None
         layers = None
-        metadata = None
         sharedArray = None
 
         cntMat = sharedNDArray[0]
@@ -254,31 +692,306 @@ class Mosaic(Nansat):
             # STD = sqrt(sum((x-M)^2)/n) = (sqrt((sum(x^2) -
             #                                2*mean(x)*sum(x) +
             #                                sum(mean(x)^2))/n))
-            stdMat[bi] = np.sqrt((stdMat[bi] - 2.0 * avg * avgMat[bi] +
-                                  np.square(avg) * cntMat) / cntMat)
+            stdMat[bi] = np.sqrt(np.maximum((stdMat[bi] -
+                                             2.0 * avg * avgMat[bi] +
+                                             np.square(avg) * cntMat) /
+                                            cntMat, 0))
             # set mean
             avgMat[bi] = avg
 
         self.logger.debug('Adding bands')
         # add mask band
         self.logger.debug('    mask')
-        self.add_band(array=maskMat, parameters={'name': maskName,
-                                                 'long_name': 'L2-mask',
-                                                 'standard_name': 'status_flag'})
+        self.add_band(array=maskMat.astype('float32'),
+                      parameters={'name': maskName,
+                                  'long_name': 'L2-mask',
+                                  'standard_name': 'status_flag'})
 
         # add averaged bands with metadata
         for bi, b in enumerate(bands):
             self.logger.debug('    %s' % b)
             # add band and std with metadata
-            self.add_band(array=avgMat[bi], parameters=bandsMeta[bi])
+            self.add_band(array=avgMat[bi].astype('float32'),
+                          parameters=bandsMeta[bi])
             bandsMeta[bi]['name'] = bandsMeta[bi]['name'] + '_std'
-            self.add_band(array=stdMat[bi], parameters=bandsMeta[bi])
+            self.add_band(array=stdMat[bi].astype('float32'),
+                          parameters=bandsMeta[bi])
+
+        self._set_layers_metadata(results)
+
+    def update(self, files=[], accumulatorFile=None, bands=[1],
+               doReproject=True, maskName='mask', opener=Nansat, threads=1,
+               eResampleAlg=0, period=(None, None)):
+        '''Incrementally average input files using a persistent accumulator
+
+        Sums (count, sum, sum of squared deviations, mask, metadata) of
+        all previously processed files are loaded from <accumulatorFile>.
+        Only files which are neither in the manifest of the accumulator nor
+        rejected earlier (out of <period> or not overlapping) are opened,
+        reprojected and added. Therefore <period> should not be changed
+        between calls with the same accumulator. With several threads each
+        process adds files into its own slot of a shared array (as in
+        Mosaic.average()) and the slots are combined at the end. The
+        accumulator is saved back and averaged
+        bands (and STD, and mask) are added to the object as in
+        Mosaic.average().
+
+        Parameters
+        -----------
+        files : list
+            list of input files (both old and new)
+        accumulatorFile : str
+            name of NPZ-file with accumulator. Created if does not exist.
+        bands : list
+            list of names of bands to be processed
+        threads : int
+            number of parallel processes for reading and adding input files
+        other parameters : see Mosaic.average()
+
+        Returns
+        --------
+        newFiles : list
+            names of files added to the accumulator
+
+        '''
+        global sharedArray
+        global sharedShape
+        global domain
+
+        if accumulatorFile is not None and os.path.exists(accumulatorFile):
+            accumulator = Accumulator(accumulatorFile)
+            if (accumulator.bands != [str(b) for b in bands] or
+                    accumulator.count.shape != self.shape()):
+                raise OptionError('Bands or shape of the mosaic differ from '
+                                  'the accumulator %s' % accumulatorFile)
+        else:
+            accumulator = Accumulator(shape=self.shape(), bands=bands)
+
+        newFiles = [f for f in files if f not in accumulator.manifest and
+                    f not in accumulator.rejected]
+        self.logger.info('%d new files' % len(newFiles))
+
+        domain = Nansat(domain=self)
+        layers = [Layer(ifile, bands, opener, maskName, doReproject,
+                        eResampleAlg, period, self.logger.level)
+                  for ifile in newFiles]
+        threads = max(1, min(threads, len(layers)))
+        if threads == 1:
+            # fold layers into accumulator one by one
+            layerResults = accumulator.add_layers(layers)
+        else:
+            # each process folds layers into accumulator in own slot
+            dstShape = self.shape()
+            sharedShape = (threads, 2 + len(bands) * 2,
+                           dstShape[0], dstShape[1])
+            sharedArray = mp.RawArray(ctypes.c_double,
+                                      int(np.prod(sharedShape)))
+            slotCounter = mp.Value(ctypes.c_int, 0)
+            pool = mp.Pool(threads, init_worker, (slotCounter,))
+            try:
+                results = pool.map(accumulate_layer, layers)
+                # tree reduction of slots as in Mosaic.average()
+                step = 1
+                while step < threads:
+                    pool.map(reduce_accumulator_slots,
+                             [(i, i + step) for i in
+                              range(0, threads - step, step * 2)])
+                    step *= 2
+            finally:
+                pool.terminate()
+                pool = None
+
+            # manifest and rejected files in order of input files
+            sharedNDArray = mparray2ndarray(sharedArray, sharedShape,
+                                            'float64')
+            newAccumulator = slot_accumulator(sharedNDArray[0], bands)
+            for fileName, status, duration, bandMetadata in results:
+                if bandMetadata is None:
+                    newAccumulator.rejected[fileName] = status
+                else:
+                    newAccumulator.manifest.append(fileName)
+                    if newAccumulator.metadata is None:
+                        newAccumulator.metadata = bandMetadata
+            accumulator.combine(newAccumulator)
+            sharedArray = None
+            layerResults = [result[:3] for result in results]
+        usedFiles = set(r[0] for r in layerResults if r[1] == 'used')
+        addedFiles = [f for f in newFiles if f in usedFiles]
+
+        if accumulatorFile is not None:
+            accumulator.save(accumulatorFile)
+
+        # add mask, averaged bands and STD with metadata
+        self.add_band(array=accumulator.mask.astype('float32'),
+                      parameters={'name': maskName,
+                                  'long_name': 'L2-mask',
+                                  'standard_name': 'status_flag'})
+        avgMat = accumulator.get_mean()
+        stdMat = accumulator.get_std()
+        for bi, b in enumerate(bands):
+            if accumulator.metadata is None:
+                bandMeta = {'name': str(b)}
+            else:
+                bandMeta = dict(accumulator.metadata[bi])
+            self.add_band(array=avgMat[bi].astype('float32'),
+                          parameters=bandMeta)
+            bandMeta['name'] = bandMeta['name'] + '_std'
+            self.add_band(array=stdMat[bi].astype('float32'),
+                          parameters=bandMeta)
+
+        self._set_layers_metadata(layerResults)
+
+        return addedFiles
+
+    def composite(self, files=[], bands=[1], mode='latest', qualityBand=None,
+                  doReproject=True, maskName='mask', opener=Nansat,
+                  threads=1, eResampleAlg=0, period=(None, None),
+                  blockSize=1000):
+        '''Make composite of input files by selection of pixels
+
+        For each pixel of the mosaic, values of all bands are taken from
+        one input file, selected by <mode>:
+            'latest' : file with the latest time_coverage_start
+            'first' : file with the earliest time_coverage_start
+            'max' : file with maximum value of the first band in <bands>
+            'min' : file with minimum value of the first band in <bands>
+            'best' : file with maximum value of <qualityBand> (which is
+                not necessarily composited)
+        In modes 'latest' and 'first' all used files must have metadata
+        time_coverage_start (OptionError is raised otherwise). Files with
+        equal time or value are taken in the order of the list.
+        Only valid pixels (mask == 64, see Mosaic.average) are used.
+        Files are processed in one pass by blocks of rows in parallel
+        processes, each process keeps the best pixels in own copy of the
+        output arrays, the copies are merged at the end.
+
+        Adds composited bands (with metadata from the input files) and band
+        'source_index' with index of the selected file in <files> (-1 if no
+        valid data). List of files is added to metadata 'composite_files'.
+
+        Parameters
+        -----------
+        files : list
+            list of input files
+        bands : list
+            list of names/band_numbers to be processed
+        mode : str
+            'latest', 'first', 'max', 'min' or 'best'
+        qualityBand : str
+            name of band for selection of pixels in mode 'best' only
+        threads : int
+            number of parallel processes to use
+        blockSize : int
+            number of rows read from input files at once
+        other parameters : see Mosaic.average()
+
+        '''
+        global sharedArray
+        global sharedShape
+        global domain
+        global workerSlot
+
+        if mode not in ['latest', 'first', 'max', 'min', 'best']:
+            raise OptionError('Wrong mode %s' % mode)
+        if mode == 'best' and qualityBand is None:
+            raise OptionError('qualityBand is required for mode "best"')
+        if mode != 'best' and qualityBand is not None:
+            raise OptionError('qualityBand is used only in mode "best"')
+        if len(files) == 0:
+            self.logger.error('No input files given!')
+            return
+
+        # bands which are read from input files
+        keyBand = qualityBand
+        if keyBand is None:
+            keyBand = bands[0]
+        readBands = list(bands)
+        if keyBand not in readBands:
+            readBands.append(keyBand)
+
+        # preallocate shared mem array with one slot for each worker:
+        # key, source index, bands
+        dstShape = self.shape()
+        threads = max(1, min(threads, len(files)))
+        sharedShape = (threads, 2 + len(readBands), dstShape[0], dstShape[1])
+        sharedArray = mp.RawArray(ctypes.c_double, int(np.prod(sharedShape)))
+        sharedNDArray = mparray2ndarray(sharedArray, sharedShape, 'float64')
+        sharedNDArray[:, 0] = -np.inf
+        sharedNDArray[:, 1] = len(files)
+
+        domain = Nansat(domain=self)
+        tasks = [(Layer(ifile, readBands, opener, maskName, doReproject,
+                        eResampleAlg, period, self.logger.level),
+                  index, mode, keyBand, blockSize)
+                 for index, ifile in enumerate(files)]
+
+        if threads == 1:
+            workerSlot = 0
+            results = map(composite_layer, tasks)
+        else:
+            slotCounter = mp.Value(ctypes.c_int, 0)
+            pool = mp.Pool(threads, init_worker, (slotCounter,))
+            results = pool.map(composite_layer, tasks)
+            step = 1
+            while step < threads:
+                pool.map(reduce_composite_slots,
+                         [(i, i + step) for i in
+                          range(0, threads - step, step * 2)])
+                step *= 2
+            pool.terminate()
+            pool = None
+
+        composite = sharedNDArray[0]
+        sharedArray = None
+        tasks = None
+
+        # get band metadata from the first valid file
+        bandsMeta = [{'name': str(band)} for band in readBands]
+        for result in results:
+            if type(result[3]) is list:
+                bandsMeta = result[3]
+                break
+
+        noData = composite[1] == len(files)
+        for bi, band in enumerate(bands):
+            array = composite[2 + bi].astype('float32')
+            array[noData] = np.nan
+            self.add_band(array=array, parameters=bandsMeta[bi])
+        sourceIndex = composite[1].astype('int32')
+        sourceIndex[noData] = -1
+        self.add_band(array=sourceIndex,
+                      parameters={'name': 'source_index',
+                                  'long_name': 'Index of source file'})
+        self.set_metadata('composite_files', json.dumps(list(files)))
+        self.set_metadata('composite_mode', mode)
+        self._set_layers_metadata([result[:3] for result in results])
+
+    def _set_layers_metadata(self, results):
+        '''Add number of used and skipped input files and timing to metadata
+
+        Metadata keys are mosaic_files_<status> and mosaic_time_<status>
+        (seconds) where status is 'used', 'period' (skipped as out of
+        period) or 'overlap' (skipped as not overlapping).
+
+        Parameters
+        -----------
+        results : list
+            (fileName, status, duration) for each processed input file
+
+        '''
+        for status in ['used', 'period', 'overlap']:
+            fileNames = set(r[0] for r in results if r[1] == status)
+            duration = sum(r[2] for r in results if r[1] == status)
+            self.set_metadata('mosaic_files_%s' % status, str(len(fileNames)))
+            self.set_metadata('mosaic_time_%s' % status, '%.3f' % duration)
 
     def _get_cube(self, files, band, doReproject, maskName, opener,
                                                     eResampleAlg,
                                                     period,
                                                     vmin=-np.inf,
-                                                    vmax=np.inf):
+                                                    vmax=np.inf,
+                                                    cubeFile=None,
+                                                    layerResults=None):
         '''Make cube with data from one band of input files
 
         Open files, reproject, get band, insert into cube
@@ -299,17 +1012,30 @@ class Mosaic(Nansat):
             parameter for Nansat.reproject()
         period : tuple
             valid (start_date, end_date) or (None, None)
+        cubeFile : str
+            If given, the cube is kept in this file (numpy memmap)
+            instead of memory
+        layerResults : list
+            If given, (fileName, status, duration) of each file is appended
 
         Returns:
         --------
-            dataCube : Numpy 3D array with bands
+            dataCube : Numpy 3D array (float32) with bands
             mask : Numpy array with L2-mask
             metadata : dict with band metadata
         '''
         # preallocate 3D cube and mask
         self.logger.debug('Allocating 3D cube')
-        dataCube = np.zeros((len(files), self.shape()[0], self.shape()[1]))
+        cubeShape = (len(files), self.shape()[0], self.shape()[1])
+        if cubeFile is None:
+            dataCube = np.zeros(cubeShape, 'float32')
+        else:
+            dataCube = np.memmap(cubeFile, 'float32', 'w+', shape=cubeShape)
+        dataCube[:] = np.nan
         maskMat = np.zeros((2, self.shape()[0], self.shape()[1]), 'int8')
+        bandMetadata = {'name': str(band)}
+        if layerResults is None:
+            layerResults = []
 
         # for all input files
         for i, f in enumerate(files):
@@ -317,11 +1043,12 @@ class Mosaic(Nansat):
             layer = Layer(f, [band], opener, maskName, doReproject,
                             eResampleAlg, period, logLevel=self.logger.level)
             # get nansat from the input Layer
-            layer.make_nansat_object(domain)
-
-            # if not in the period, quit
-            if not layer.within_period():
+            # if not in the period or not overlapping, quit
+            status = layer.make_nansat_object(self)
+            if status != 'used':
+                layerResults.append((f, status, layer.duration))
                 continue
+            t0 = time.time()
             # get mask
             mask = layer.get_mask_array()
             # get arrays with data
@@ -340,16 +1067,51 @@ class Mosaic(Nansat):
             # add data to mask matrix (maximum of 0, 1, 2, 64)
             maskMat[0, :, :] = mask
             maskMat[1, :, :] = maskMat.max(0)
+            layer.n = None
+            layerResults.append((f, status,
+                                 layer.duration + time.time() - t0))
 
         return dataCube, maskMat.max(0), bandMetadata
 
+    def _reduce_cube(self, cube, function, memoryLimit, **kwargs):
+        '''Apply reducing function along the first axis of cube by blocks
+
+        Parameters
+        -----------
+        cube : numpy 3D array or memmap
+            input data
+        function : function
+            reducing function with parameter <axis> (e.g. nanmedian)
+        memoryLimit : int
+            approximate maximum size (bytes) of the processed block
+        **kwargs : additional parameters for the function
+
+        Returns
+        --------
+        result : numpy 2D array (float32)
+
+        '''
+        # function may create a few copies of the block
+        rowBytes = cube.shape[0] * cube.shape[2] * cube.dtype.itemsize * 4
+        blockSize = max(1, int(memoryLimit / rowBytes))
+        result = np.zeros(cube.shape[1:], 'float32')
+        for row in range(0, cube.shape[1], blockSize):
+            self.logger.debug('Reducing rows %d - %d' % (row, row + blockSize))
+            block = np.array(cube[:, row:row + blockSize, :])
+            result[row:row + blockSize] = function(block, axis=0, **kwargs)
+
+        return result
+
     def median(self, files=[], bands=[1], doReproject=True, maskName='mask',
                 opener=Nansat, eResampleAlg=0, period=(None, None),
-                vmin=-np.inf, vmax=np.inf):
+                vmin=-np.inf, vmax=np.inf, tmpDir=None,
+                memoryLimit=256 * 1024 ** 2):
         '''Calculate median of input bands
 
-        Memory and CPU greedy method. Generates 3D cube from bands of
-        all input images and calculates median. Adds median bands to self
+        Generates 3D cube from bands of all input images and calculates
+        median by blocks of rows. Adds median bands to self.
+        If <tmpDir> is given the cube is kept in a memory mapped file
+        so only one input image and one block of the cube are in memory.
 
         Parameters
         -----------
@@ -367,6 +1129,36 @@ class Mosaic(Nansat):
             agorithm for reprojection, see Nansat.reproject()
         period : [datetime0, datetime1]
             Start and stop datetime objects from pyhon datetime.
+        tmpDir : str
+            directory for temporary file with the cube (e.g. on a local
+            disk). If None, the cube is kept in memory.
+        memoryLimit : int
+            approximate maximum memory (bytes) used for calculation of
+            median in one block of rows
+
+        '''
+        self.percentile(files, bands, None, doReproject, maskName, opener,
+                        eResampleAlg, period, vmin, vmax, tmpDir, memoryLimit)
+
+    def percentile(self, files=[], bands=[1], q=50, doReproject=True,
+                   maskName='mask', opener=Nansat, eResampleAlg=0,
+                   period=(None, None), vmin=-np.inf, vmax=np.inf,
+                   tmpDir=None, memoryLimit=256 * 1024 ** 2):
+        '''Calculate percentile of input bands
+
+        Generates 3D cube from bands of all input images and calculates
+        percentile by blocks of rows. Adds bands named <name>_p<q> to self.
+
+        Parameters
+        -----------
+        files : list
+            list of input files
+        bands : list
+            list of names/band_numbers to be processed
+        q : float
+            percentile (0 - 100). If None, median is calculated and bands
+            keep original names.
+        other parameters : see Mosaic.median()
 
         '''
         # check inputs
@@ -374,17 +1166,34 @@ class Mosaic(Nansat):
             self.logger.error('No input files given!')
             return
 
-        # add medians of all bands
+        # add percentiles of all bands
+        layerResults = []
         for band in bands:
-            cube, mask, metadata = self._get_cube(files, band,
-                                                    doReproject,
-                                                    maskName,
-                                                    opener,
-                                                    eResampleAlg,
-                                                    period, vmin, vmax)
-            median = nanmedian(cube, axis=0)
+            cubeFile = None
+            if tmpDir is not None:
+                fd, cubeFile = tempfile.mkstemp(suffix='.cube', dir=tmpDir)
+                os.close(fd)
+            try:
+                cube, mask, metadata = self._get_cube(files, band,
+                                                      doReproject,
+                                                      maskName,
+                                                      opener,
+                                                      eResampleAlg,
+                                                      period, vmin, vmax,
+                                                      cubeFile, layerResults)
+                if q is None:
+                    result = self._reduce_cube(cube, nanmedian, memoryLimit)
+                else:
+                    result = self._reduce_cube(cube, np.nanpercentile,
+                                               memoryLimit, q=q)
+                    metadata['name'] = '%s_p%g' % (metadata['name'], q)
+            finally:
+                cube = None
+                if cubeFile is not None:
+                    os.remove(cubeFile)
 
             # add band and std with metadata
-            self.add_band(array=median, parameters=metadata)
+            self.add_band(array=result, parameters=metadata)
 
         self.add_band(array=mask, parameters={'name': 'mask'})
+        self._set_layers_metadata(layerResults)
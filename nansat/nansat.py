@@ -20,12 +20,21 @@ import os
 import glob
 import sys
 import tempfile
+import shutil
+import threading
 import datetime
 import pkgutil
+import json
 import warnings
+import multiprocessing as mp
+from multiprocessing.pool import ThreadPool
 
 from scipy.io.netcdf import netcdf_file
 import numpy as np
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
 if 'nanmedian' in np.__all__:
     from numpy import nanmedian
 else:
@@ -40,10 +49,11 @@ from nansat.nsr import NSR
 from nansat.domain import Domain
 from nansat.figure import Figure
 from nansat.vrt import VRT
-from nansat.tools import add_logger, gdal
+from nansat.tools import add_logger, gdal, osr
 from nansat.tools import OptionError, WrongMapperError, NansatReadError, GDALError
 from nansat.tools import parse_time, test_openable
 from nansat.node import Node
+from nansat.mapper_registry import is_candidate, get_missing_imports
 from nansat.pointbrowser import PointBrowser
 import collections
 if hasattr(collections, 'OrderedDict'):
@@ -181,28 +191,96 @@ class Nansat(Domain):
 
         Parameters
         -----------
-        bandID : int or str
+        bandID : int or str or tuple
             If int, array from band with number <bandID> is returned
             If string, array from band with metadata 'name' equal to
             <bandID> is returned
+            If tuple (band, rows, columns), only the window given by
+            slices (or indices) of rows and columns is read, e.g.
+            n['L_469', 100:200, 300:400] or n[1, 100:200]. As in numpy,
+            dimensions given by integer indices are removed (n[1, 5] is
+            the 1D row 5).
 
         Returns
         --------
         self.get_GDALRasterBand(bandID).ReadAsArray() : NumPy array
 
+        '''
+        if not isinstance(bandID, tuple):
+            return self._get_band_data(bandID)
+
+        # read window given by slices of rows and columns
+        bandID, window = bandID[0], list(bandID[1:])
+        if len(window) > 2:
+            raise OptionError('Too many indices: %s' % str(window))
+        window += [slice(None)] * (2 - len(window))
+        offsets, sizes, steps, squeeze = [], [], [], []
+        for dimSlice, dimSize in zip(window, self.shape()):
+            # remove dimensions given by integer index (as numpy)
+            squeeze.append(slice(None))
+            if not isinstance(dimSlice, slice):
+                squeeze[-1] = 0
+                if dimSlice < -dimSize or dimSlice >= dimSize:
+                    raise IndexError('Index %d is out of bounds' % dimSlice)
+                dimSlice = slice(dimSlice, dimSlice + 1 or None)
+            start, stop, step = dimSlice.indices(dimSize)
+            if step < 1:
+                raise OptionError('Only positive steps are supported')
+            offsets.append(start)
+            sizes.append(max(stop - start, 0))
+            steps.append(step)
+        squeeze = tuple(squeeze)
+
+        bandData = self._get_band_data(bandID, offsets[1], offsets[0],
+                                       sizes[1], sizes[0], steps[1], steps[0])
+        return bandData[squeeze]
+
+    def _get_band_data(self, bandID, xOff=0, yOff=0, xSize=None, ySize=None,
+                       xStep=1, yStep=1):
+        ''' Read a (decimated) window of the band into a NumPy array
+
+        Fill values, infs and out-of-swath pixels are replaced with np.nan
+        (for floats only) in the same way as in Nansat.__getitem__
+
+        Parameters
+        -----------
+        bandID : int or str
+            number or name of the band
+        xOff, yOff : int
+            offset of the window (pixels, lines)
+        xSize, ySize : int
+            size of the window. The full width/height by default.
+        xStep, yStep : int
+            step of columns/rows, every xStep-th column and yStep-th row
+            of the window are read (see _read_decimated)
+
+        Returns
+        --------
+        bandData : NumPy array
+
         '''
         # get band
         band = self.get_GDALRasterBand(bandID)
+        if xSize is None:
+            xSize = band.XSize - xOff
+        if ySize is None:
+            ySize = band.YSize - yOff
         # get expression from metadata
         expression = band.GetMetadata().get('expression', '')
         # get data
-        bandData = band.ReadAsArray()
+        bandData = _read_decimated(band, xOff, yOff, xSize, ySize,
+                                   xStep, yStep)
         if bandData is None:
             raise GDALError('Cannot read array from band %s' % str(bandID))
 
         # execute expression if any
         if expression != '':
+            windowShape = bandData.shape
             bandData = eval(expression)
+            # expression is evaluated on full bands: cut the window
+            if bandData.shape != windowShape:
+                bandData = bandData[yOff:yOff + ySize:yStep,
+                                    xOff:xOff + xSize:xStep]
 
         # Set invalid and missing data to np.nan (for floats only)
         if ('_FillValue' in band.GetMetadata() and
@@ -222,7 +300,9 @@ class Nansat(Domain):
         # erase out-of-swath pixels with np.Nan (if not integer)
         if (self.has_band('swathmask') and bandData.dtype.char in
                                             np.typecodes['AllFloat']):
-            swathmask = self.get_GDALRasterBand('swathmask').ReadAsArray()
+            swathmask = _read_decimated(self.get_GDALRasterBand('swathmask'),
+                                        xOff, yOff, xSize, ySize,
+                                        xStep, yStep)
             bandData[swathmask == 0] = np.nan
 
         return bandData
@@ -356,7 +436,8 @@ class Nansat(Domain):
         return bandExists
 
     def export(self, fileName, bands=None, rmMetadata=[], addGeolocArray=True,
-               addGCPs=True, driver='netCDF', bottomup=False, options=None):
+               addGCPs=True, driver='netCDF', bottomup=False, options=None,
+               workers=1, blockSize=256):
         '''Export Nansat object into netCDF or GTiff file
 
         Parameters
@@ -383,6 +464,15 @@ class Nansat(Domain):
             GDAL export options in format of: 'OPT=VAL', or
             ['OPT1=VAL1', 'OP2='VAL2']
             See also http://www.gdal.org/frmt_netcdf.html
+        workers : int
+            number of threads for evaluation of bands. If more than one,
+            blocks of all bands are read from the VRT (warping, pixel
+            functions, etc) in parallel and written into the output file
+            by one writer. This requires a driver which can create files
+            and bands of the same data type, otherwise bands are
+            evaluated serially.
+        blockSize : int
+            number of rows read at once by each thread
 
 
         Modifies
@@ -405,6 +495,10 @@ class Nansat(Domain):
         Metadata strings with special characters are escaped with XML/HTML
         encoding.
 
+        If <fileName> is the input file of the Nansat object, data is
+        written into a temporary file in the same directory, which then
+        replaces the input file, and the object is reopened from it.
+
         Examples
         --------
         n.export(netcdfile)
@@ -413,6 +507,590 @@ class Nansat(Domain):
         n.export(driver='GTiff')
         # export all bands into a GeoTiff
 
+        '''
+        exportVRT = self._make_export_vrt(bands, rmMetadata, addGeolocArray)
+
+        # if output filename is same as input one, write into a temporary
+        # file in the same directory and replace the input file at the end
+        outFileName = fileName
+        sameFile = (self.fileName != '' and os.path.abspath(self.fileName) ==
+                    os.path.abspath(fileName))
+        if sameFile:
+            fid, outFileName = tempfile.mkstemp(
+                            suffix=os.path.splitext(fileName)[1],
+                            prefix='.%s.' % os.path.basename(fileName),
+                            dir=os.path.dirname(os.path.abspath(fileName)))
+            os.close(fid)
+
+        # get CreateCopy() options
+        if options is None:
+            options = []
+        if type(options) == str:
+            options = [options]
+
+        # set bottomup option
+        if bottomup:
+            options += ['WRITE_BOTTOMUP=NO']
+        else:
+            options += ['WRITE_BOTTOMUP=YES']
+
+        # if GCPs should be added
+        gcps = exportVRT.dataset.GetGCPs()
+        srs = exportVRT.get_projection()
+        addGCPs = addGCPs and driver == 'netCDF' and len(gcps) > 0
+        if addGCPs:
+            #  remove GeoTransform
+            exportVRT._remove_geotransform()
+            exportVRT.dataset.SetMetadataItem(
+                'NANSAT_GCPProjection', srs.replace(',', '|').replace('"', '&'))
+        elif driver == 'GTiff':
+            #  remove GeoTransform
+            exportVRT._remove_geotransform()
+        else:
+            # add projection metadata
+            exportVRT.dataset.SetMetadataItem(
+                'NANSAT_Projection', srs.replace(',', '|').replace('"', '&'))
+
+            # add GeoTransform metadata
+            geoTransformStr = str(
+                    self.vrt.dataset.GetGeoTransform()).replace(',', '|')
+            exportVRT.dataset.SetMetadataItem(
+                    'NANSAT_GeoTransform', geoTransformStr)
+
+        # Create an output file using GDAL
+        self.logger.debug('Exporting to %s using %s and %s...' % (fileName,
+                                                                  driver,
+                                                                  options))
+
+        try:
+            dataset = None
+            if workers > 1:
+                dataset = self._create_export_dataset(exportVRT, outFileName,
+                                                      driver, options)
+                if dataset is None:
+                    self.logger.warning('%s cannot create file with these '
+                                        'bands, bands are evaluated serially'
+                                        % driver)
+            if dataset is not None:
+                # evaluate bands in parallel and write blocks
+                self._write_export_blocks(dataset, exportVRT, workers,
+                                          blockSize)
+            else:
+                dataset = gdal.GetDriverByName(driver).CreateCopy(
+                                                        outFileName,
+                                                        exportVRT.dataset,
+                                                        options=options)
+            dataset = None
+
+            # add GCPs into netCDF file as separate float variables
+            if addGCPs:
+                self._add_gcps(outFileName, gcps, bottomup)
+
+            # replace the input file and reopen self from it
+            if sameFile:
+                # release all datasets (self.vrt with its bandVRTs) which
+                # keep the input file open
+                exportVRT = None
+                self.vrt = None
+                os.rename(outFileName, fileName)
+                reopened = Nansat(fileName, logLevel=self.logger.level)
+                self.vrt = reopened.vrt
+                self.mapper = reopened.mapper
+                self.addedBands = {}
+        except:
+            if sameFile:
+                if os.path.exists(outFileName):
+                    os.remove(outFileName)
+                # input file was not replaced, reopen self from it
+                if self.vrt is None:
+                    reopened = Nansat(fileName, logLevel=self.logger.level)
+                    self.vrt = reopened.vrt
+                    self.mapper = reopened.mapper
+                    self.addedBands = {}
+            raise
+
+        self.logger.debug('Export - OK!')
+
+    def export_netcdf4(self, fileName, bands=None, rmMetadata=[],
+                       addGeolocArray=True, addGCPs=True, bottomup=False,
+                       zlib=True, complevel=4, shuffle=True, chunksizes=None,
+                       varOptions=None, blockSize=None, format='NETCDF4'):
+        '''Export Nansat object into compressed and chunked NetCDF4 file
+
+        The file is written with netCDF4-python directly, data is read from
+        the VRT and written block by block (never the full band in memory).
+        GCPs are written into the same file (variables GCPX, GCPY, GCPZ,
+        GCPPixel, GCPLine) and georeference is stored in global metadata
+        (as by Nansat.export()), so the file can be opened with Nansat.
+
+        Parameters
+        -----------
+        fileName : str
+            output file name
+        bands, rmMetadata, addGeolocArray, addGCPs : see Nansat.export()
+        bottomup : bool
+            False: Default. Store rows in the order used by GDAL
+                (last row first), see Nansat.export()
+            True: Store rows in the original order
+        zlib : bool
+            compress variables with deflate?
+        complevel : int
+            deflate level (1-9)
+        shuffle : bool
+            apply HDF5 shuffle filter before compression?
+        chunksizes : tuple
+            (rows, columns) shape of chunks. Default is (512, 512) or
+            the shape of data, if smaller.
+        varOptions : dict
+            {'band_name': {'complevel': 9, 'chunksizes': (1, 1000)}}
+            options of netCDF4.Dataset.createVariable for individual bands,
+            override zlib, complevel, shuffle and chunksizes
+        blockSize : int
+            number of rows read from VRT at once. Default is number of rows
+            in the chunk.
+        format : str
+            'NETCDF4' or 'NETCDF4_CLASSIC'
+
+        Modifies
+        ---------
+        Create a netCDF4 file
+
+        Examples
+        --------
+        n.export_netcdf4('compressed.nc', complevel=6)
+        # export with compression and chunks of 256 x 256 pixels
+        n.export_netcdf4('chunked.nc', chunksizes=(256, 256))
+
+        '''
+        if netCDF4 is None:
+            raise ImportError('netCDF4 is required for export_netcdf4')
+
+        exportVRT = self._make_export_vrt(bands, rmMetadata, addGeolocArray,
+                                          escapeMetadata=False)
+        ySize = exportVRT.dataset.RasterYSize
+        xSize = exportVRT.dataset.RasterXSize
+        if chunksizes is None:
+            chunksizes = (min(512, ySize), min(512, xSize))
+        if blockSize is None:
+            blockSize = chunksizes[0]
+        if varOptions is None:
+            varOptions = {}
+
+        ncFile = netCDF4.Dataset(fileName, 'w', format=format)
+        ncFile.createDimension('y', ySize)
+        ncFile.createDimension('x', xSize)
+
+        # add georeference into global metadata and variables
+        globMetadata = exportVRT.dataset.GetMetadata()
+        gcps = exportVRT.dataset.GetGCPs()
+        srs = exportVRT.get_projection()
+        gridMapping = None
+        if len(gcps) > 0:
+            if addGCPs:
+                globMetadata['NANSAT_GCPProjection'] = (srs.replace(',', '|').
+                                                        replace('"', '&'))
+                self._write_gcp_variables(ncFile, gcps)
+        else:
+            geoTransform = exportVRT.dataset.GetGeoTransform()
+            globMetadata['NANSAT_Projection'] = (srs.replace(',', '|').
+                                                 replace('"', '&'))
+            globMetadata['NANSAT_GeoTransform'] = (str(geoTransform).
+                                                   replace(',', '|'))
+            gridMapping = self._write_grid_mapping(ncFile, geoTransform, srs,
+                                                   bottomup)
+        ncFile.setncatts(globMetadata)
+
+        for iBand in range(exportVRT.dataset.RasterCount):
+            band = exportVRT.dataset.GetRasterBand(iBand + 1)
+            bandMetadata = band.GetMetadata()
+            varName = bandMetadata.pop('NETCDF_VARNAME', 'band_%03d' % iBand)
+            varName = varName.replace('/', '_')
+            fillValue = bandMetadata.pop('_FillValue', None)
+            options = {'zlib': zlib, 'complevel': complevel,
+                       'shuffle': shuffle, 'chunksizes': chunksizes}
+            options.update(varOptions.get(bandMetadata.get('name', varName),
+                                          {}))
+            ncVar = None
+            self.logger.debug('Writing variable %s' % varName)
+            for yOff in range(0, ySize, blockSize):
+                rows = min(blockSize, ySize - yOff)
+                data = band.ReadAsArray(0, yOff, xSize, rows)
+                if ncVar is None:
+                    # create variable when the data type is known
+                    if fillValue is not None:
+                        fillValue = np.array([fillValue]).astype(data.dtype)[0]
+                    ncVar = ncFile.createVariable(varName, data.dtype,
+                                                  ('y', 'x'),
+                                                  fill_value=fillValue,
+                                                  **options)
+                    ncVar.set_auto_maskandscale(False)
+                    if gridMapping is not None:
+                        bandMetadata['grid_mapping'] = gridMapping
+                    ncVar.setncatts(bandMetadata)
+                if bottomup:
+                    ncVar[yOff:yOff + rows] = data
+                else:
+                    ncVar[ySize - yOff - rows:ySize - yOff] = data[::-1]
+
+        ncFile.close()
+        self.logger.debug('Export - OK!')
+
+    def export_cog(self, fileName, bands=None, compress='DEFLATE',
+                   blocksize=512, overviews='auto', resampling='average',
+                   rmMetadata=[], numThreads='ALL_CPUS'):
+        '''Export Nansat object into Cloud Optimized GeoTIFF
+
+        The file is tiled, compressed and has internal overviews, with
+        overviews and tiles placed in the beginning of the file (COG
+        layout). The COG driver is used if available (GDAL >= 3.1) and
+        overviews are 'auto' or None. Otherwise (or if overviews are given
+        as a list of factors) a temporary tiled GeoTIFF with overviews is
+        made and copied with COPY_SRC_OVERVIEWS=YES.
+
+        Parameters
+        -----------
+        fileName : str
+            output file name
+        bands : list (default=None)
+            Specify band numbers or names to export.
+            If None, all bands are exported.
+        compress : str
+            GeoTIFF compression (e.g. 'DEFLATE', 'LZW', 'NONE')
+        blocksize : int
+            size of tiles
+        overviews : str or list or None
+            'auto' : make overviews until the smallest one fits in one tile
+            list of int : factors of overviews, e.g. [2, 4, 8, 16]
+            None : no overviews
+        resampling : str
+            resampling method for overviews ('average', 'nearest', etc)
+        rmMetadata : list
+            metadata names for removal before export
+        numThreads : str or int
+            number of threads for compression (and for computing overviews)
+
+        Modifies
+        ---------
+        Create a GeoTIFF file
+
+        Examples
+        --------
+        n.export_cog('image.tif', ['L_645', 'L_555', 'L_469'])
+
+        '''
+        exportVRT = self._make_export_vrt(bands, rmMetadata,
+                                          addGeolocArray=False)
+        if overviews not in ['auto', None] and type(overviews) != list:
+            raise OptionError('overviews should be "auto", None or list')
+
+        cogDriver = gdal.GetDriverByName('COG')
+        if cogDriver is not None and type(overviews) != list:
+            # COG driver makes 'auto' overviews itself (explicit factors are
+            # not supported by the driver, the GTiff path is used for them)
+            options = ['COMPRESS=%s' % compress,
+                       'BLOCKSIZE=%d' % blocksize,
+                       'RESAMPLING=%s' % resampling.upper(),
+                       'NUM_THREADS=%s' % numThreads,
+                       'BIGTIFF=IF_SAFER']
+            if overviews is None:
+                options.append('OVERVIEWS=NONE')
+            self.logger.debug('Exporting to %s using COG and %s' %
+                              (fileName, options))
+            cogDriver.CreateCopy(fileName, exportVRT.dataset, options=options)
+            return
+
+        ySize = exportVRT.dataset.RasterYSize
+        xSize = exportVRT.dataset.RasterXSize
+        if overviews == 'auto':
+            overviews = []
+            while max(xSize, ySize) / 2 ** len(overviews) > blocksize:
+                overviews.append(2 ** (len(overviews) + 1))
+        if overviews is None:
+            overviews = []
+
+        options = ['TILED=YES',
+                   'BLOCKXSIZE=%d' % blocksize,
+                   'BLOCKYSIZE=%d' % blocksize,
+                   'COMPRESS=%s' % compress,
+                   'NUM_THREADS=%s' % numThreads,
+                   'BIGTIFF=IF_SAFER']
+        gtiffDriver = gdal.GetDriverByName('GTiff')
+
+        # make temporary tiled GeoTIFF with overviews
+        fid, tmpName = tempfile.mkstemp(suffix='.tif',
+                                        dir=os.path.dirname(
+                                                os.path.abspath(fileName)))
+        os.close(fid)
+        dataset = None
+        try:
+            dataset = gtiffDriver.CreateCopy(tmpName, exportVRT.dataset,
+                                             options=options)
+            if len(overviews) > 0:
+                configOptions = {'COMPRESS_OVERVIEW': compress,
+                                 'GDAL_NUM_THREADS': str(numThreads)}
+                oldOptions = {}
+                try:
+                    for key in configOptions:
+                        oldOptions[key] = gdal.GetConfigOption(key)
+                        gdal.SetConfigOption(key, configOptions[key])
+                    dataset.BuildOverviews(resampling.upper(), overviews)
+                finally:
+                    for key in oldOptions:
+                        gdal.SetConfigOption(key, oldOptions[key])
+
+            # copy tiles and overviews into the COG layout
+            self.logger.debug('Exporting to %s using GTiff and %s' %
+                              (fileName, options))
+            gtiffDriver.CreateCopy(fileName, dataset,
+                                   options=options + ['COPY_SRC_OVERVIEWS=YES'])
+        finally:
+            dataset = None
+            if os.path.exists(tmpName):
+                os.remove(tmpName)
+
+    def export_store(self, dirName, bands=None, chunks=(256, 256),
+                     compresslevel=6, rmMetadata=[], addGeolocArray=True):
+        '''Export Nansat object into chunked directory store
+
+        The store is a directory with file nansat_store.json (with
+        georeference, GCPs, global and band metadata) and one subdirectory
+        per band with chunks of data. Each chunk is saved as a small
+        DEFLATE compressed GeoTIFF (edge chunks have their true size) in
+        file <row>.<column>.tif, where <row> and <column> are indices of
+        the chunk. The store is opened with Nansat(dirName) and reading of
+        a window (e.g. n['band', 100:200, 300:400]) touches only the
+        chunks which intersect the window.
+
+        Parameters
+        -----------
+        dirName : str
+            name of the output directory
+        bands : list
+            numbers or names of bands to export. All bands by default.
+        chunks : tuple
+            (rows, columns) shape of chunks
+        compresslevel : int
+            DEFLATE compression level (1-9)
+        rmMetadata : list
+            metadata names for removal before export
+        addGeolocArray : bool
+            add geolocation arrays to the store?
+
+        Modifies
+        ---------
+        Create directory <dirName> with chunked data
+
+        Examples
+        --------
+        n.export_store('store_dir', chunks=(128, 128))
+        n2 = Nansat('store_dir')
+        window = n2['L_469', 1000:1100, 2000:2100]
+
+        '''
+        exportVRT = self._make_export_vrt(bands, rmMetadata, addGeolocArray,
+                                          escapeMetadata=False)
+        ySize = exportVRT.dataset.RasterYSize
+        xSize = exportVRT.dataset.RasterXSize
+        chunkYSize, chunkXSize = chunks
+        gtiffDriver = gdal.GetDriverByName('GTiff')
+
+        if not os.path.exists(dirName):
+            os.makedirs(dirName)
+
+        globMetadata = exportVRT.dataset.GetMetadata()
+        globMetadata.pop('fileName', None)
+        store = {'format': 'nansat_store',
+                 'version': 1,
+                 'shape': [ySize, xSize],
+                 'chunks': [chunkYSize, chunkXSize],
+                 'compression': 'deflate',
+                 'geotransform': list(exportVRT.dataset.GetGeoTransform()),
+                 'projection': exportVRT.dataset.GetProjection(),
+                 'gcps': [[gcp.GCPPixel, gcp.GCPLine,
+                           gcp.GCPX, gcp.GCPY, gcp.GCPZ]
+                          for gcp in exportVRT.dataset.GetGCPs()],
+                 'gcpProjection': exportVRT.dataset.GetGCPProjection(),
+                 'metadata': globMetadata,
+                 'bands': []}
+
+        for iBand in range(exportVRT.dataset.RasterCount):
+            band = exportVRT.dataset.GetRasterBand(iBand + 1)
+            bandMetadata = band.GetMetadata()
+            bandMetadata.pop('NETCDF_VARNAME', None)
+            bandPath = 'band_%03d' % (iBand + 1)
+            if not os.path.exists(os.path.join(dirName, bandPath)):
+                os.makedirs(os.path.join(dirName, bandPath))
+            self.logger.debug('Writing chunks of %s' % bandPath)
+
+            for yOff in range(0, ySize, chunkYSize):
+                rows = min(chunkYSize, ySize - yOff)
+                data = band.ReadAsArray(0, yOff, xSize, rows)
+                for xOff in range(0, xSize, chunkXSize):
+                    chunk = data[:, xOff:xOff + chunkXSize]
+                    chunkDataset = gtiffDriver.Create(
+                            os.path.join(dirName, bandPath, '%d.%d.tif' % (
+                                                    yOff / chunkYSize,
+                                                    xOff / chunkXSize)),
+                            chunk.shape[1], chunk.shape[0], 1, band.DataType,
+                            ['COMPRESS=DEFLATE',
+                             'ZLEVEL=%d' % compresslevel,
+                             'BLOCKYSIZE=%d' % chunk.shape[0]])
+                    chunkDataset.GetRasterBand(1).WriteArray(chunk)
+                    chunkDataset = None
+
+            store['bands'].append({'path': bandPath,
+                                   'dataType': gdal.GetDataTypeName(
+                                                            band.DataType),
+                                   'metadata': bandMetadata})
+
+        with open(os.path.join(dirName, 'nansat_store.json'), 'w') as f:
+            json.dump(store, f, indent=1)
+
+    def _write_gcp_variables(self, ncFile, gcps):
+        ''' Write variables with GCPs into netCDF4.Dataset '''
+        gcpVariables = ['GCPX', 'GCPY', 'GCPZ', 'GCPPixel', 'GCPLine', ]
+        ncFile.createDimension('gcps', len(gcps))
+        for var in gcpVariables:
+            ncVar = ncFile.createVariable(var, 'f4', ('gcps',))
+            ncVar[:] = [getattr(gcp, var) for gcp in gcps]
+
+    def _write_grid_mapping(self, ncFile, geoTransform, srs, bottomup):
+        ''' Write x/y coordinates and grid mapping into netCDF4.Dataset
+
+        Returns
+        --------
+        gridMapping : str
+            name of the grid mapping variable
+
+        '''
+        gridMapping = 'crs'
+        ncVar = ncFile.createVariable(gridMapping, 'c')
+        ncVar.setncatts({'spatial_ref': srs,
+                         'GeoTransform': ' '.join(['%r' % v for v in
+                                                   geoTransform])})
+
+        ySize, xSize = len(ncFile.dimensions['y']), len(ncFile.dimensions['x'])
+        xValues = geoTransform[0] + geoTransform[1] * (np.arange(xSize) + 0.5)
+        yValues = geoTransform[3] + geoTransform[5] * (np.arange(ySize) + 0.5)
+        if not bottomup:
+            yValues = yValues[::-1]
+        for name, values in [('x', xValues), ('y', yValues)]:
+            ncVar = ncFile.createVariable(name, 'f8', (name, ))
+            ncVar[:] = values
+            ncVar.axis = name.upper()
+
+        return gridMapping
+
+    def _create_export_dataset(self, exportVRT, fileName, driver, options):
+        '''Create empty output dataset with georeference and metadata
+
+        Parameters
+        -----------
+        exportVRT : VRT
+            VRT made by Nansat._make_export_vrt()
+        fileName : str
+            output file name
+        driver : str
+            name of GDAL driver
+        options : list
+            GDAL creation options
+
+        Returns
+        --------
+        dataset : gdal.Dataset or None
+            dataset with the same size, georeference and metadata as
+            exportVRT. None if the driver cannot create datasets or if
+            bands have different data types.
+
+        '''
+        gdalDriver = gdal.GetDriverByName(driver)
+        dataTypes = set(exportVRT.dataset.GetRasterBand(iBand + 1).DataType
+                        for iBand in range(exportVRT.dataset.RasterCount))
+        if (gdalDriver.GetMetadataItem(gdal.DCAP_CREATE) != 'YES' or
+                len(dataTypes) != 1):
+            return None
+
+        dataset = gdalDriver.Create(fileName,
+                                    exportVRT.dataset.RasterXSize,
+                                    exportVRT.dataset.RasterYSize,
+                                    exportVRT.dataset.RasterCount,
+                                    dataTypes.pop(), options)
+        if dataset is None:
+            return None
+
+        geoTransform = exportVRT.dataset.GetGeoTransform()
+        if geoTransform != (0.0, 1.0, 0.0, 0.0, 0.0, 1.0):
+            dataset.SetGeoTransform(geoTransform)
+            dataset.SetProjection(exportVRT.dataset.GetProjection())
+        gcps = exportVRT.dataset.GetGCPs()
+        if len(gcps) > 0 and driver != 'netCDF':
+            dataset.SetGCPs(gcps, exportVRT.dataset.GetGCPProjection())
+        dataset.SetMetadata(exportVRT.dataset.GetMetadata())
+        for iBand in range(exportVRT.dataset.RasterCount):
+            srcBand = exportVRT.dataset.GetRasterBand(iBand + 1)
+            dstBand = dataset.GetRasterBand(iBand + 1)
+            dstBand.SetMetadata(srcBand.GetMetadata())
+            dstBand.SetDescription(srcBand.GetDescription())
+            noDataValue = srcBand.GetNoDataValue()
+            if noDataValue is not None:
+                dstBand.SetNoDataValue(noDataValue)
+
+        return dataset
+
+    def _write_export_blocks(self, dataset, exportVRT, workers, blockSize):
+        '''Evaluate bands of the export VRT in parallel into the output
+
+        Blocks of rows of all bands are read from the VRT by a pool of
+        threads (each thread opens its own dataset handle) and written by
+        the calling thread (the only writer) into the output dataset.
+
+        Parameters
+        -----------
+        dataset : gdal.Dataset
+            output dataset made by Nansat._create_export_dataset()
+        exportVRT : VRT
+            VRT made by Nansat._make_export_vrt()
+        workers : int
+            number of threads for reading
+        blockSize : int
+            number of rows read at once
+
+        '''
+        exportVRT.dataset.FlushCache()
+        ySize = exportVRT.dataset.RasterYSize
+        tasks = [(exportVRT.fileName, iBand + 1, yOff,
+                  min(blockSize, ySize - yOff))
+                 for iBand in range(exportVRT.dataset.RasterCount)
+                 for yOff in range(0, ySize, blockSize)]
+
+        pool = ThreadPool(workers)
+        try:
+            for bandNumber, yOff, data in pool.imap_unordered(_read_block,
+                                                              tasks):
+                dataset.GetRasterBand(bandNumber).WriteArray(data, 0, yOff)
+        finally:
+            # stop the reading threads also if reading or writing failed
+            pool.terminate()
+            pool.join()
+        dataset.FlushCache()
+
+    def _make_export_vrt(self, bands=None, rmMetadata=[],
+                         addGeolocArray=True, escapeMetadata=True):
+        '''Create VRT with bands and metadata prepared for export
+
+        Parameters
+        -----------
+        bands, rmMetadata, addGeolocArray : see Nansat.export()
+        escapeMetadata : bool
+            escape global metadata strings with XML/HTML encoding?
+
+        Returns
+        --------
+        exportVRT : VRT
+            copy of self.vrt with selected bands only, complex bands split
+            into real and imaginary parts and (optionally) with bands of
+            geolocation arrays
+
         '''
         # temporary VRT for exporting
         exportVRT = self.vrt.copy()
@@ -509,75 +1187,17 @@ class Nansat(Domain):
 
         # Apply escaping to metadata strings to preserve special characters (in
         # XML/HTML format)
-        globMetadata_escaped = {}
-        for key, val in globMetadata.iteritems():
-            # Keys not escaped - this may be changed if needed...
-            globMetadata_escaped[key] = gdal.EscapeString(val, gdal.CPLES_XML)
-        exportVRT.dataset.SetMetadata(globMetadata_escaped)
-
-        # if output filename is same as input one...
-        if self.fileName == fileName:
-            numOfBands = self.vrt.dataset.RasterCount
-            # create VRT from each band and add it
-            for iBand in range(numOfBands):
-                vrt = VRT(array=self[iBand + 1])
-                self.add_band(vrt=vrt)
-                metadata = self.get_metadata(bandID=iBand + 1)
-                self.set_metadata(key=metadata,
-                                  bandID=numOfBands + iBand + 1)
-
-            # remove source bands
-            self.vrt.delete_bands(range(1, numOfBands))
-
-        # get CreateCopy() options
-        if options is None:
-            options = []
-        if type(options) == str:
-            options = [options]
-
-        # set bottomup option
-        if bottomup:
-            options += ['WRITE_BOTTOMUP=NO']
-        else:
-            options += ['WRITE_BOTTOMUP=YES']
-
-        # if GCPs should be added
-        gcps = exportVRT.dataset.GetGCPs()
-        srs = exportVRT.get_projection()
-        addGCPs = addGCPs and driver == 'netCDF' and len(gcps) > 0
-        if addGCPs:
-            #  remove GeoTransform
-            exportVRT._remove_geotransform()
-            exportVRT.dataset.SetMetadataItem(
-                'NANSAT_GCPProjection', srs.replace(',', '|').replace('"', '&'))
-        elif driver == 'GTiff':
-            #  remove GeoTransform
-            exportVRT._remove_geotransform()
-        else:
-            # add projection metadata
-            exportVRT.dataset.SetMetadataItem(
-                'NANSAT_Projection', srs.replace(',', '|').replace('"', '&'))
-
-            # add GeoTransform metadata
-            geoTransformStr = str(
-                    self.vrt.dataset.GetGeoTransform()).replace(',', '|')
-            exportVRT.dataset.SetMetadataItem(
-                    'NANSAT_GeoTransform', geoTransformStr)
-
-        # Create an output file using GDAL
-        self.logger.debug('Exporting to %s using %s and %s...' % (fileName,
-                                                                  driver,
-                                                                  options))
+        if escapeMetadata:
+            globMetadata_escaped = {}
+            for key, val in globMetadata.iteritems():
+                # Keys not escaped - this may be changed if needed...
+                globMetadata_escaped[key] = gdal.EscapeString(val,
+                                                              gdal.CPLES_XML)
+            globMetadata = globMetadata_escaped
+        exportVRT.dataset.SetMetadata(globMetadata)
 
-        dataset = gdal.GetDriverByName(driver).CreateCopy(fileName,
-                                                          exportVRT.dataset,
-                                                          options=options)
+        return exportVRT
 
-        # add GCPs into netCDF file as separate float variables
-        if addGCPs:
-            self._add_gcps(fileName, gcps, bottomup)
-
-        self.logger.debug('Export - OK!')
 
     def _add_gcps(self, fileName, gcps, bottomup):
         ''' Add 4 variables with gcps to the generated netCDF file '''
@@ -616,7 +1236,8 @@ class Nansat(Domain):
 
     def export2thredds(self, fileName, bands, metadata=None,
                        maskName=None, rmMetadata=[],
-                       time=None, createdTime=None):
+                       time=None, createdTime=None, append=False,
+                       blockSize=1000):
         ''' Export data into a netCDF formatted for THREDDS server
 
         Parameters
@@ -646,6 +1267,16 @@ class Nansat(Domain):
             aqcuisition time of original data. That value will be in time dim
         createdTime : datetime
             date of creation. Will be in metadata 'created'
+        append : bool
+            If True and <fileName> exists, data is added as a new time step
+            into the existing file (e.g. an aggregation of several dates).
+            The file should have been created by export2thredds with the
+            same domain and bands.
+        blockSize : int
+            number of rows read from VRT and written at once
+
+        The file is written directly from the VRT, block by block, in
+        NetCDF3 format (with netCDF4-python, if available, or with scipy).
 
         !! NB
         ------
@@ -665,6 +1296,9 @@ class Nansat(Domain):
                  'L_555' : {'type': '>i2', 'scale': 0.1, 'offset': 0}}
         n.export2thredds(filename, bands)
 
+        # add data from another date into the same file
+        n2.export2thredds(filename, bands, append=True)
+
         '''
         # raise error if self is not projected (has GCPs)
         if len(self.vrt.dataset.GetGCPs()) > 0:
@@ -673,221 +1307,300 @@ class Nansat(Domain):
         # replace bands as list with bands as dict
         if type(bands) is list:
             bands = dict.fromkeys(bands, {})
+        else:
+            bands = dict(bands)
 
-        # Create temporary empty Nansat object with self domain
-        data = Nansat(domain=self)
-
-        # get mask (if exist)
-        if maskName is not None:
-            mask = self[maskName]
-
-        # add required bands to data
-        dstBands = {}
+        # skip non exiting bands
         srcBands = [self.bands()[b]['name'] for b in self.bands()]
-        for iband in bands:
-            # skip non exiting bands
+        for iband in list(bands):
             if iband not in srcBands:
                 self.logger.error('%s is not found' % str(iband))
-                continue
+                bands.pop(iband)
+
+        # get time from Nansat object or from input datetime
+        if time is None:
+            time = self.time_coverage_start
+        # create value of time variable
+        td = time - datetime.datetime(1900, 1, 1)
+        days = td.days + (float(td.seconds) / 60.0 / 60.0 / 24.0)
 
-            array = self[iband]
+        if append and os.path.exists(fileName):
+            ncO = self._open_netcdf3(fileName, 'a')
+            timeIndex = ncO.variables['time'].shape[0]
+            for iband in bands:
+                if iband not in ncO.variables:
+                    ncO.close()
+                    raise OptionError('%s is not in %s' % (iband, fileName))
+        else:
+            ncO = self._open_netcdf3(fileName, 'w')
+            timeIndex = 0
+            self._create_thredds_layout(ncO, metadata, rmMetadata,
+                                        createdTime, blockSize)
 
-            # catch None band error
-            if array is None:
-                raise GDALError('%s is None' % str(iband))
-
-            # set type, scale and offset from input data or by default
-            dstBands[iband] = {}
-            dstBands[iband]['type'] = bands[iband].get('type',
-                                             array.dtype.str.replace('u', 'i'))
-            dstBands[iband]['scale'] = float(bands[iband].get('scale', 1.0))
-            dstBands[iband]['offset'] = float(bands[iband].get('offset', 0.0))
-            if '_FillValue' in bands[iband]:
-                dstBands[iband]['_FillValue'] = np.array(
-                                            [bands[iband]['_FillValue']],
-                                            dtype=dstBands[iband]['type'])[0]
-
-            # mask values with np.nan
-            if maskName is not None and iband != maskName:
-                array[mask != 64] = np.nan
-
-            # add array to a temporary Nansat object
+        # write bands directly from VRT by blocks
+        ySize, xSize = self.shape()
+        for iband in bands:
             bandMetadata = self.get_metadata(bandID=iband)
-            data.add_band(array=array, parameters=bandMetadata)
-        self.logger.debug('Bands for export: %s' % str(dstBands))
+            if iband in ncO.variables:
+                ncOVar = ncO.variables[iband]
+                if hasattr(ncOVar, 'data'):
+                    varType = ncOVar.data.dtype.str
+                else:
+                    varType = ncOVar.dtype.str
+                dstBand = {'type': varType,
+                           'scale': float(getattr(ncOVar, 'scale_factor', 1)),
+                           'offset': float(getattr(ncOVar, 'add_offset', 0))}
+                fillValue = getattr(ncOVar, '_FillValue', None)
+            else:
+                ncOVar = None
+            if hasattr(ncOVar, 'set_auto_maskandscale'):
+                ncOVar.set_auto_maskandscale(False)
+            self.logger.debug('Writing variable: %s' % iband)
+            for yOff in range(0, ySize, blockSize):
+                rows = min(blockSize, ySize - yOff)
+                array = self._get_band_data(iband, 0, yOff, None, rows)
+                # catch None band error
+                if array is None:
+                    raise GDALError('%s is None' % str(iband))
+
+                if ncOVar is None:
+                    # set type, scale and offset from input data or default
+                    dstBand = {
+                        'type': bands[iband].get('type',
+                                        array.dtype.str.replace('u', 'i')),
+                        'scale': float(bands[iband].get('scale', 1.0)),
+                        'offset': float(bands[iband].get('offset', 0.0))}
+                    fillValue = None
+                    if '_FillValue' in bands[iband]:
+                        fillValue = np.array([bands[iband]['_FillValue']],
+                                             dtype=dstBand['type'])[0]
+                    ncOVar = self._create_thredds_variable(
+                                    ncO, iband, dstBand, fillValue,
+                                    bandMetadata, bands[iband], rmMetadata)
+
+                # mask values with np.nan
+                array = array.astype('float64')
+                if maskName is not None and iband != maskName:
+                    mask = self._get_band_data(maskName, 0, yOff, None, rows)
+                    array[mask != 64] = np.nan
+
+                # apply offset and scale, replace non-value by '_FillValue'
+                if not (dstBand['offset'] == 0.0 and dstBand['scale'] == 1.0):
+                    array = (array - dstBand['offset']) / dstBand['scale']
+                if fillValue is not None:
+                    array[np.isnan(array)] = fillValue
+
+                # rows are written bottom-up (as by GDAL)
+                ncOVar[timeIndex, ySize - yOff - rows:ySize - yOff] = (
+                            array[::-1].astype(dstBand['type']))
+
+        # write time after the records of bands (record dimension may grow)
+        ncO.variables['time'][timeIndex] = days
+
+        # write output file
+        ncO.close()
+
+        return 0
+
+    def _open_netcdf3(self, fileName, mode):
+        ''' Open NetCDF3 file with netCDF4 (if available) or with scipy '''
+        if netCDF4 is not None:
+            return netCDF4.Dataset(fileName, mode, format='NETCDF3_64BIT')
+        return netcdf_file(fileName, mode, mmap=False, version=2)
+
+    def _set_nc_attribute(self, ncObject, key, value):
+        ''' Set attribute of netCDF4 or scipy file or variable '''
+        if hasattr(ncObject, 'setncattr'):
+            ncObject.setncattr(key, value)
+        elif key in ncObject.__dict__ and key not in ncObject._attributes:
+            # do not hide internal attributes of scipy objects
+            ncObject._attributes[key] = value
+        else:
+            # scipy objects keep attributes both in __dict__ and _attributes
+            setattr(ncObject, key, value)
+
+    def _create_thredds_layout(self, ncO, metadata, rmMetadata, createdTime,
+                               blockSize):
+        '''Create dimensions, time, grid mapping, coordinates and metadata
+
+        Parameters
+        -----------
+        ncO : netCDF4.Dataset or scipy.io.netcdf.netcdf_file
+            output file open for writing
+        metadata, rmMetadata, createdTime : see Nansat.export2thredds()
+        blockSize : int
+            number of rows of lon/lat grids computed at once
+
+        '''
+        ySize, xSize = self.shape()
+        nsr = NSR(self.vrt.get_projection())
+        geoTransform = self.vrt.dataset.GetGeoTransform()
+        if nsr.IsGeographic():
+            xName, yName = 'lon', 'lat'
+        else:
+            xName, yName = 'x', 'y'
+
+        # add time dimention (unlimited, for appending time steps)
+        ncO.createDimension('time', None)
+        ncO.createDimension(yName, ySize)
+        ncO.createDimension(xName, xSize)
+        ncOVar = ncO.createVariable('time', '>f8',  ('time', ))
+        for key, val in [('calendar', 'standard'),
+                         ('long_name', 'time'),
+                         ('standard_name', 'time'),
+                         ('units', 'days since 1900-1-1 0:0:0 +0'),
+                         ('axis', 'T')]:
+            self._set_nc_attribute(ncOVar, key, val)
+
+        # create projection var
+        gridMappingName, gridMappingAttributes = nsr.get_cf_grid_mapping()
+        ncOVar = ncO.createVariable(gridMappingName, 'c', ())
+        for key in gridMappingAttributes:
+            self._set_nc_attribute(ncOVar, key, gridMappingAttributes[key])
+
+        # create x/y (or lon/lat) variables, values are increasing
+        xValues = geoTransform[0] + geoTransform[1] * (np.arange(xSize) + 0.5)
+        yValues = geoTransform[3] + geoTransform[5] * (np.arange(ySize) + 0.5)
+        yValues = yValues[::-1]
+        if nsr.IsGeographic():
+            coordinates = [
+                ('lon', xValues, {'standard_name': 'longitude',
+                                  'long_name': 'longitude',
+                                  'units': 'degrees_east'}),
+                ('lat', yValues, {'standard_name': 'latitude',
+                                  'long_name': 'latitude',
+                                  'units': 'degrees_north'})]
+        else:
+            coordinates = [
+                ('x', np.floor(xValues), {'standard_name':
+                                          'projection_x_coordinate',
+                                          'long_name': 'x coordinate of '
+                                                       'projection',
+                                          'units': 'm', 'axis': 'X'}),
+                ('y', np.floor(yValues), {'standard_name':
+                                          'projection_y_coordinate',
+                                          'long_name': 'y coordinate of '
+                                                       'projection',
+                                          'units': 'm', 'axis': 'Y'})]
+        for name, values, attributes in coordinates:
+            ncOVar = ncO.createVariable(name, '>f4', (name, ))
+            ncOVar[:] = values.astype('>f4')
+            for key in attributes:
+                self._set_nc_attribute(ncOVar, key, attributes[key])
+
+        # add 2D lon/lat grids to projected data
+        if not nsr.IsGeographic():
+            transformation = osr.CoordinateTransformation(nsr, NSR())
+            lonVar = ncO.createVariable('lon', '>f4', ('y', 'x'))
+            latVar = ncO.createVariable('lat', '>f4', ('y', 'x'))
+            for ncOVar, name, units in [(lonVar, 'longitude', 'degrees_east'),
+                                        (latVar, 'latitude', 'degrees_north')]:
+                for key, val in [('standard_name', name),
+                                 ('long_name', name),
+                                 ('units', units)]:
+                    self._set_nc_attribute(ncOVar, key, val)
+            for yOff in range(0, ySize, blockSize):
+                rows = min(blockSize, ySize - yOff)
+                x, y = np.meshgrid(xValues, yValues[yOff:yOff + rows])
+                lonlat = np.array(transformation.TransformPoints(
+                                    np.array([x.flat, y.flat]).T.tolist()))
+                lonVar[yOff:yOff + rows] = lonlat[:, 0].reshape(x.shape)
+                latVar[yOff:yOff + rows] = lonlat[:, 1].reshape(x.shape)
 
         # get corners of reprojected data
-        minLat, maxLat, minLon, maxLon = data.get_min_max_lat_lon()
+        minLat, maxLat, minLon, maxLon = self.get_min_max_lat_lon(exact=True)
 
         # common global attributes:
         if createdTime is None:
             createdTime = (datetime.datetime.utcnow().
                            strftime('%Y-%m-%d %H:%M:%S UTC'))
 
-        globMetadata = {'institution': 'NERSC',
-                        'source': 'satellite remote sensing',
-                        'creation_date': createdTime,
-                        'northernmost_latitude': np.float(maxLat),
-                        'southernmost_latitude': np.float(minLat),
-                        'westernmost_longitude': np.float(minLon),
-                        'easternmost_longitude': np.float(maxLon),
-                        'history': ' '}
+        globMetadata = self.get_metadata()
+        for key in rmMetadata + ['fileName']:
+            globMetadata.pop(key, None)
+        globMetadata.update({'Conventions': 'CF-1.5',
+                             'institution': 'NERSC',
+                             'source': 'satellite remote sensing',
+                             'creation_date': createdTime,
+                             'northernmost_latitude': np.float(maxLat),
+                             'southernmost_latitude': np.float(minLat),
+                             'westernmost_longitude': np.float(minLon),
+                             'easternmost_longitude': np.float(maxLon),
+                             'history': ' '})
 
         # join or replace default by custom global metadata
         if metadata is not None:
-            for metaKey in metadata:
-                globMetadata[metaKey] = metadata[metaKey]
-
-        # export temporary Nansat object to a temporary netCDF
-        fid, tmpName = tempfile.mkstemp(suffix='.nc')
-        data.export(tmpName)
-
-        # open files for input and output
-        ncI = netcdf_file(tmpName, 'r')
-        ncO = netcdf_file(fileName, 'w')
-
-        # collect info on dimention names
-        dimNames = []
-        gridMappingName = None
-        for ncIVarName in ncI.variables:
-            ncIVar = ncI.variables[ncIVarName]
-            dimNames += list(ncIVar.dimensions)
-            # get grid_mapping_name
-            if hasattr(ncIVar, 'grid_mapping_name'):
-                gridMappingName = ncIVar.grid_mapping_name
-                gridMappingVarName = ncIVarName
-        dimNames = list(set(dimNames))
-
-        # collect info on dimention shapes
-        dimShapes = {}
-        for dimName in dimNames:
-            dimVar = ncI.variables[dimName]
-            dimShapes[dimName] = dimVar.shape[0]
-
-        # create dimensions
-        for dimName in dimNames:
-            ncO.createDimension(dimName, dimShapes[dimName])
-
-        # add time dimention
-        ncO.createDimension('time', 1)
-        ncOVar = ncO.createVariable('time', '>f8',  ('time', ))
-        ncOVar.calendar = 'standard'
-        ncOVar.long_name = 'time'
-        ncOVar.standard_name = 'time'
-        ncOVar.units = 'days since 1900-1-1 0:0:0 +0'
-        ncOVar.axis = 'T'
+            globMetadata.update(metadata)
+        for key in globMetadata:
+            self._set_nc_attribute(ncO, key, globMetadata[key])
 
-        # get time from Nansat object or from input datetime
-        if time is None:
-            time = self.time_coverage_start
+    def _create_thredds_variable(self, ncO, name, dstBand, fillValue,
+                                 bandMetadata, bandParameters, rmMetadata):
+        '''Create variable for band data in THREDDS file
 
-        # create value of time variable
-        td = time - datetime.datetime(1900, 1, 1)
-        days = td.days + (float(td.seconds) / 60.0 / 60.0 / 24.0)
-        # add date
-        ncOVar[:] = days
-
-        # recreate file
-        for ncIVarName in ncI.variables:
-            ncIVar = ncI.variables[ncIVarName]
-            self.logger.debug('Creating variable: %s' % ncIVarName)
-            if ncIVarName in ['x', 'y', 'lon', 'lat']:
-                # create simple x/y variables
-                ncOVar = ncO.createVariable(ncIVarName, '>f4',
-                                            ncIVar.dimensions)
-            elif ncIVarName == gridMappingVarName:
-                # create projection var
-                ncOVar = ncO.createVariable(gridMappingName, ncIVar.typecode(),
-                                            ncIVar.dimensions)
-            elif 'name' in ncIVar._attributes and ncIVar.name in dstBands:
-                # dont add time-axis to lon/lat grids
-                if ncIVar.name in ['lon', 'lat']:
-                    dimensions = ncIVar.dimensions
-                else:
-                    dimensions = ('time', ) + ncIVar.dimensions
-
-                ncOVar = ncO.createVariable(ncIVar.name,
-                                            dstBands[ncIVar.name]['type'],
-                                            dimensions)
-
-            # copy array from input data
-            data = np.array(ncIVar.data)
-
-            # copy rounded data from x/y
-            if ncIVarName in ['x', 'y']:
-                ncOVar[:] = np.floor(data).astype('>f4')
-                # add axis=X or axis=Y
-                ncOVar.axis = {'x': 'X', 'y': 'Y'}[ncIVarName]
-                for attrib in ncIVar._attributes:
-                    if len(ncIVar._attributes[attrib]) > 0:
-                        ncOVar._attributes[attrib] = ncIVar._attributes[attrib]
-
-            # copy data from lon/lat
-            if ncIVarName in ['lon', 'lat']:
-                ncOVar[:] = data.astype('>f4')
-                ncOVar._attributes = ncIVar._attributes
-
-            # copy projection data (only all attributes)
-            if ncIVarName == gridMappingVarName:
-                ncOVar._attributes = ncIVar._attributes
-
-            # copy data from variables in the list
-            if (len(ncIVar.dimensions) > 0 and
-                    'name' in ncIVar._attributes and ncIVar.name in dstBands):
-                # add offset and scale attributes
-                scale = dstBands[ncIVar.name]['scale']
-                offset = dstBands[ncIVar.name]['offset']
-                if not (offset == 0.0 and scale == 1.0):
-                    ncOVar._attributes['add_offset'] = offset
-                    ncOVar._attributes['scale_factor'] = scale
-                    data = (data - offset) / scale
-                # replace non-value by '_FillValue'
-                if (ncIVar.name in dstBands):
-                    if '_FillValue' in dstBands[ncIVar.name].keys():
-                        data[np.isnan(data)] = dstBands[
-                                                ncIVar.name]['_FillValue']
-                        ncOVar._attributes['_FillValue'] = dstBands[
-                                                ncIVar.name]['_FillValue']
-
-                ncOVar[:] = data.astype(dstBands[ncIVar.name]['type'])
-                # copy (some) attributes
-                for inAttrName in ncIVar._attributes:
-                    if str(inAttrName) not in rmMetadata + ['dataType',
-                                    'SourceFilename', 'SourceBand', '_Unsigned',
-                                    'FillValue', 'time', '_FillValue']:
-                        ncOVar._attributes[inAttrName] = ncIVar._attributes[inAttrName]
-
-                # add custom attributes from input parameter bands
-                if ncIVar.name in bands:
-                    for newAttr in bands[ncIVar.name]:
-                        if newAttr not in rmMetadata + ['type', 'scale',
-                                                        'offset',
-                                                        '_FillValue']:
-                            ncOVar._attributes[newAttr] = bands[ncIVar.name][newAttr]
-                    # add grid_mapping info
-                    if gridMappingName is not None:
-                        ncOVar._attributes['grid_mapping'] = gridMappingName
-
-        # copy (some) global attributes
-        for globAttr in ncI._attributes:
-            if not(globAttr.strip().startswith('GDAL')):
-                ncO._attributes[globAttr] = ncI._attributes[globAttr]
-
-        # add common and custom global attributes
-        for globMeta in globMetadata:
-            ncO._attributes[globMeta] = globMetadata[globMeta]
-
-        # write output file
-        ncO.close()
+        Parameters
+        -----------
+        ncO : netCDF4.Dataset or scipy.io.netcdf.netcdf_file
+            output file open for writing
+        name : str
+            name of the band and variable
+        dstBand : dict
+            type, scale and offset of the output variable
+        fillValue : number or None
+            value of _FillValue
+        bandMetadata : dict
+            metadata of the band
+        bandParameters : dict
+            custom attributes, see <bands> in Nansat.export2thredds()
+        rmMetadata : list
+            unwanted metadata names
 
-        # close original files
-        ncI.close()
+        Returns
+        --------
+        ncOVar : variable in the output file
 
-        # Delete the temprary netCDF file
-        fid = None
-        os.remove(tmpName)
+        '''
+        if 'x' in ncO.dimensions:
+            dimensions = ('time', 'y', 'x')
+        else:
+            dimensions = ('time', 'lat', 'lon')
 
-        return 0
+        if netCDF4 is not None:
+            ncOVar = ncO.createVariable(name, dstBand['type'], dimensions,
+                                        fill_value=fillValue)
+            ncOVar.set_auto_maskandscale(False)
+        else:
+            ncOVar = ncO.createVariable(name, dstBand['type'], dimensions)
+            if fillValue is not None:
+                self._set_nc_attribute(ncOVar, '_FillValue', fillValue)
+
+        # add offset and scale attributes
+        if not (dstBand['offset'] == 0.0 and dstBand['scale'] == 1.0):
+            self._set_nc_attribute(ncOVar, 'add_offset', dstBand['offset'])
+            self._set_nc_attribute(ncOVar, 'scale_factor', dstBand['scale'])
+
+        # copy (some) attributes
+        for key in bandMetadata:
+            if key not in rmMetadata + ['dataType', 'SourceFilename',
+                                        'SourceBand', '_Unsigned',
+                                        'FillValue', 'time', '_FillValue',
+                                        'NETCDF_VARNAME']:
+                self._set_nc_attribute(ncOVar, key, bandMetadata[key])
+
+        # add custom attributes from input parameter bands
+        for key in bandParameters:
+            if key not in rmMetadata + ['type', 'scale', 'offset',
+                                        '_FillValue']:
+                self._set_nc_attribute(ncOVar, key, bandParameters[key])
+
+        # add grid_mapping info
+        gridMapping = [var for var in ncO.variables
+                       if hasattr(ncO.variables[var], 'grid_mapping_name') or
+                       var == 'crs']
+        if len(gridMapping) > 0:
+            self._set_nc_attribute(ncOVar, 'grid_mapping', gridMapping[0])
+
+        return ncOVar
 
     def resize(self, factor=1, width=None, height=None,
                pixelsize=None, eResampleAlg=-1):
@@ -1186,6 +1899,322 @@ class Nansat(Domain):
         subMetaData.pop('fileName')
         self.set_metadata(subMetaData)
 
+    def bin_to_domain(self, dstDomain, bands, stats=['mean'], blockSize=None):
+        ''' Bin pixels of the object into cells of the destination Domain
+
+        Instead of interpolation (as in Nansat.reproject), all pixels
+        falling into a cell of <dstDomain> are aggregated (e.g. averaged)
+        as in production of L3 products from L2 swaths. The object is read
+        in blocks of lines, so memory usage depends only on the size of
+        <dstDomain> and of the block. Coordinates of pixels are computed
+        for each block as numpy arrays: directly in the projection of
+        <dstDomain> (see Domain._get_coordinates) and converted into cells
+        with the inverse GeoTransform of <dstDomain>. Standard deviation
+        is accumulated with the algorithm of Chan et al. (as in
+        nansat.mosaic.Accumulator), which is stable also for data with
+        large offset.
+
+        Parameters
+        -----------
+        dstDomain : Domain
+            destination grid
+        bands : list
+            names or numbers of bands to bin
+        stats : list of str
+            statistics to calculate in each cell. Any of:
+            'mean', 'count', 'min', 'max', 'std', 'sum'
+        blockSize : int
+            number of lines to process at once. By default blocks of
+            about one million pixels are used.
+
+        Returns
+        --------
+        binned : Nansat
+            object with the georeference of <dstDomain> and a band for each
+            band and statistic. The band with mean keeps the original name,
+            other bands are named <name>_<stat> (e.g. 'sst_std').
+
+        Examples
+        --------
+        b = n.bin_to_domain(d, ['sst'], ['mean', 'count', 'std'])
+        # average all pixels of band 'sst' in cells of Domain <d>
+        sst = b['sst']
+        cnt = b['sst_count']
+
+        '''
+        allStats = ['mean', 'count', 'min', 'max', 'std', 'sum']
+        for stat in stats:
+            if stat not in allStats:
+                raise OptionError('Wrong statistic %s. Available: %s'
+                                  % (stat, str(allStats)))
+
+        xSize, ySize = self.vrt.dataset.RasterXSize, self.vrt.dataset.RasterYSize
+        dstYSize, dstXSize = dstDomain.shape()
+        nCells = dstXSize * dstYSize
+        if blockSize is None:
+            blockSize = max(1, 1000000 / xSize)
+
+        # accumulators for each band (flat arrays of size of destination)
+        accums = []
+        for band in bands:
+            accum = {'count': np.zeros(nCells, 'int64'),
+                     'sum': np.zeros(nCells, 'float64')}
+            if 'std' in stats:
+                accum['mean'] = np.zeros(nCells, 'float64')
+                accum['m2'] = np.zeros(nCells, 'float64')
+            if 'min' in stats:
+                accum['min'] = np.zeros(nCells, 'float64') + np.inf
+            if 'max' in stats:
+                accum['max'] = np.zeros(nCells, 'float64') - np.inf
+            accums.append(accum)
+
+        # cells of destination are found by the inverse GeoTransform from
+        # coordinates in the destination SRS (or by the GDAL transformer
+        # from lon/lat, if the destination has GCPs)
+        dstHasGCPs = (len(dstDomain.vrt.dataset.GetGCPs()) > 0 or
+                      len(dstDomain.vrt.geolocationArray.d) > 0)
+        if dstHasGCPs:
+            dstSRS = NSR()
+        else:
+            dstSRS = NSR(dstDomain.vrt.get_projection())
+            gt = dstDomain.vrt.dataset.GetGeoTransform()
+            det = gt[1] * gt[5] - gt[2] * gt[4]
+
+        # pixel centers
+        cols = np.arange(xSize) + 0.5
+        for yOff in range(0, ySize, blockSize):
+            blockYSize = min(blockSize, ySize - yOff)
+            self.logger.debug('Binning lines %d - %d'
+                              % (yOff, yOff + blockYSize))
+            rows = np.arange(yOff, yOff + blockYSize)[:, None] + 0.5
+            # coordinates of source pixels => col/row of destination cells
+            x, y = self._get_coordinates(cols, rows, dstSRS)
+            x, y = x.flatten(), y.flatten()
+            if dstHasGCPs:
+                dstCol, dstRow = dstDomain.transform_points(x, y, DstToSrc=1)
+                dstCol, dstRow = np.array(dstCol), np.array(dstRow)
+            else:
+                x -= gt[0]
+                y -= gt[3]
+                dstCol = (gt[5] * x - gt[2] * y) / det
+                dstRow = (gt[1] * y - gt[4] * x) / det
+            with np.errstate(invalid='ignore'):
+                dstCol = np.floor(dstCol)
+                dstRow = np.floor(dstRow)
+            gpi = (np.isfinite(dstCol) * np.isfinite(dstRow) *
+                   (dstCol >= 0) * (dstCol < dstXSize) *
+                   (dstRow >= 0) * (dstRow < dstYSize))
+            if not gpi.any():
+                continue
+            cellIndex = (dstRow[gpi] * dstXSize + dstCol[gpi]).astype('int64')
+
+            for band, accum in zip(bands, accums):
+                data = self._get_band_data(band, 0, yOff, xSize, blockYSize)
+                data = data.flatten()[gpi].astype('float64')
+                valid = np.isfinite(data)
+                index = cellIndex[valid]
+                data = data[valid]
+                blockCount = np.bincount(index, minlength=nCells)
+                blockSum = np.bincount(index, data, minlength=nCells)
+                if 'm2' in accum:
+                    # add M2 of the block (Chan algorithm)
+                    gpc = blockCount > 0
+                    blockMean = blockSum[gpc] / blockCount[gpc]
+                    cellMean = np.zeros(nCells)
+                    cellMean[gpc] = blockMean
+                    blockM2 = np.bincount(index,
+                                          np.square(data - cellMean[index]),
+                                          minlength=nCells)
+                    countA = accum['count'][gpc].astype('float64')
+                    countB = blockCount[gpc].astype('float64')
+                    delta = blockMean - accum['mean'][gpc]
+                    accum['mean'][gpc] += delta * countB / (countA + countB)
+                    accum['m2'][gpc] += (blockM2[gpc] + np.square(delta) *
+                                         countA * countB / (countA + countB))
+                accum['count'] += blockCount
+                accum['sum'] += blockSum
+                if 'min' in accum:
+                    np.minimum.at(accum['min'], index, data)
+                if 'max' in accum:
+                    np.maximum.at(accum['max'], index, data)
+
+        # calculate statistics and add bands to a new object
+        binned = Nansat(domain=dstDomain, logLevel=self.logger.level)
+        for band, accum in zip(bands, accums):
+            count = accum['count'].reshape(dstYSize, dstXSize)
+            metadata = self.get_metadata(bandID=band)
+            for key in ['expression', '_FillValue', 'SourceFilename',
+                        'SourceBand']:
+                metadata.pop(key, None)
+            name = metadata['name']
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = accum['sum'].reshape(count.shape) / count
+                for stat in stats:
+                    parameters = dict(metadata)
+                    parameters['name'] = '%s_%s' % (name, stat)
+                    if stat == 'mean':
+                        parameters['name'] = name
+                        array = mean
+                    elif stat == 'count':
+                        parameters = {'name': parameters['name']}
+                        array = count
+                    elif stat == 'sum':
+                        array = accum['sum'].reshape(count.shape)
+                    elif stat == 'std':
+                        array = np.sqrt(accum['m2'].reshape(count.shape) /
+                                        count)
+                    else:
+                        array = accum[stat].reshape(count.shape)
+                        array[count == 0] = np.nan
+                    if stat == 'count':
+                        array = array.astype('int32')
+                    else:
+                        array = array.astype('float32')
+                    binned.add_band(array=array, parameters=parameters)
+
+        return binned
+
+    def reproject_tiled(self, dstDomain, tile=(4096, 4096), out=None,
+                        bands=None, driver='GTiff', eResampleAlg=0, **kwargs):
+        ''' Reproject the object onto a large Domain tile by tile
+
+        The destination Domain is split into tiles, each tile is
+        reprojected with Nansat.reproject() and written into <out>, so that
+        neither the full warped VRT, nor the full destination grid are kept
+        in memory. Tiles which do not overlap the object are skipped
+        (they are filled with np.nan if <out> is created here: new arrays
+        and files are initialised with np.nan, which is also set as nodata
+        value of the file bands).
+        The object itself is not modified.
+
+        Parameters
+        -----------
+        dstDomain : Domain
+            destination Domain (with GeoTransform, not GCPs)
+        tile : (int, int)
+            (ySize, xSize) of tiles
+        out : str or numpy array (or memmap)
+            If str: name of the output file created by GDAL <driver>.
+            If array: array with shape (number of bands, ySize, xSize) of
+            <dstDomain> where the reprojected bands are written.
+            If None: a new numpy array is created.
+        bands : list
+            names or numbers of bands to reproject. All bands by default
+        driver : str
+            name of GDAL driver for output file (e.g. 'GTiff', 'netCDF')
+        eResampleAlg : int
+            resampling algorithm, see Nansat.reproject()
+        **kwargs : additional parameters for Nansat.reproject()
+
+        Returns
+        --------
+        out : str or numpy array
+            name of the output file or the array with reprojected bands
+
+        Examples
+        --------
+        d = Domain(3413, '-te -4e6 -4e6 4e6 4e6 -tr 200 200')
+        n.reproject_tiled(d, out='pan_arctic.tif', bands=['sigma0_HH'])
+        # reproject one band onto a 40000 x 40000 grid and write to GeoTIFF
+
+        a = np.memmap('pan_arctic.dat', 'float32', 'w+',
+                      shape=(1, 40000, 40000))
+        n.reproject_tiled(d, out=a, bands=['sigma0_HH'])
+        # same but write into a memory mapped array
+
+        '''
+        if len(dstDomain.vrt.dataset.GetGCPs()) > 0:
+            raise OptionError('Tiled reprojection requires GeoTransform in '
+                              'the destination Domain')
+        if bands is None:
+            bands = [self.bands()[b]['name'] for b in self.bands()
+                     if self.bands()[b]['name'] != 'swathmask']
+        # use names of bands: numbers may change after reprojection
+        bands = [self.get_metadata(bandID=band)['name'] for band in bands]
+
+        dstYSize, dstXSize = dstDomain.shape()
+        dstGeoTransform = dstDomain.vrt.dataset.GetGeoTransform()
+        dstProjection = dstDomain.vrt.dataset.GetProjection()
+
+        # prepare output
+        outDataset = None
+        if out is None:
+            out = np.zeros((len(bands), dstYSize, dstXSize), 'float32')
+            out[:] = np.nan
+        elif isinstance(out, basestring):
+            options = []
+            if driver == 'GTiff':
+                options = ['TILED=YES', 'BIGTIFF=IF_SAFER', 'SPARSE_OK=TRUE']
+            outDataset = gdal.GetDriverByName(driver).Create(
+                out, dstXSize, dstYSize, len(bands), gdal.GDT_Float32,
+                options)
+            if outDataset is None:
+                raise GDALError('Cannot create %s with %s' % (out, driver))
+            outDataset.SetGeoTransform(dstGeoTransform)
+            outDataset.SetProjection(dstProjection)
+            for bi, band in enumerate(bands):
+                outBand = outDataset.GetRasterBand(bi + 1)
+                outBand.SetNoDataValue(np.nan)
+                if driver != 'GTiff':
+                    # sparse GeoTIFF reads unwritten blocks as nodata, other
+                    # drivers may return zeros or their own fill value
+                    outBand.Fill(np.nan)
+                outBand.SetDescription(band)
+                metadata = self.get_metadata(bandID=band)
+                metadata.pop('expression', None)
+                outBand.SetMetadata(metadata)
+        elif out.shape != (len(bands), dstYSize, dstXSize):
+            raise OptionError('Shape of <out> should be %s'
+                              % str((len(bands), dstYSize, dstXSize)))
+
+        srcVRT = self.vrt
+        for yOff in range(0, dstYSize, tile[0]):
+            for xOff in range(0, dstXSize, tile[1]):
+                tileYSize = min(tile[0], dstYSize - yOff)
+                tileXSize = min(tile[1], dstXSize - xOff)
+                # geotransform of the tile
+                tileGeoTransform = (dstGeoTransform[0] +
+                                    xOff * dstGeoTransform[1] +
+                                    yOff * dstGeoTransform[2],
+                                    dstGeoTransform[1],
+                                    dstGeoTransform[2],
+                                    dstGeoTransform[3] +
+                                    xOff * dstGeoTransform[4] +
+                                    yOff * dstGeoTransform[5],
+                                    dstGeoTransform[4],
+                                    dstGeoTransform[5])
+                tileVRT = VRT(srcGeoTransform=tileGeoTransform,
+                              srcProjection=dstProjection,
+                              srcRasterXSize=tileXSize,
+                              srcRasterYSize=tileYSize)
+                tileDomain = Domain(ds=tileVRT.dataset,
+                                    logLevel=self.logger.level)
+                if not tileDomain.overlaps(self):
+                    self.logger.debug('Skip tile %d %d' % (xOff, yOff))
+                    continue
+
+                self.logger.debug('Reproject tile %d %d' % (xOff, yOff))
+                try:
+                    self.reproject(tileDomain, eResampleAlg=eResampleAlg,
+                                   **kwargs)
+                    for bi, band in enumerate(bands):
+                        data = self[band]
+                        if outDataset is None:
+                            out[bi, yOff:yOff + tileYSize,
+                                    xOff:xOff + tileXSize] = data
+                        else:
+                            outDataset.GetRasterBand(bi + 1).WriteArray(
+                                                          data, xOff, yOff)
+                finally:
+                    self.vrt = srcVRT
+
+        if outDataset is not None:
+            outDataset.FlushCache()
+            outDataset = None
+
+        return out
+
     def undo(self, steps=1):
         '''Undo reproject, resize, add_band or crop of Nansat object
 
@@ -1319,6 +2348,9 @@ class Nansat(Domain):
             None (default) : figure created using array in provided band
             function : figure created using array modified by provided function
         **kwargs : parameters for Figure().
+            If latlonStepSize is given without latGrid and lonGrid, lat/lon
+            grid lines and labels are added using geolocation grids
+            decimated with that step.
 
         Modifies
         ---------
@@ -1375,6 +2407,12 @@ class Nansat(Domain):
             else:
                 array = np.append(array, iArray, axis=0)
 
+        # get decimated lat/lon grids for grid lines
+        if ('latlonStepSize' in kwargs and 'latGrid' not in kwargs and
+                'lonGrid' not in kwargs):
+            kwargs['lonGrid'], kwargs['latGrid'] = self.get_geolocation_grids(
+                                                    kwargs['latlonStepSize'])
+
         # == CREATE FIGURE object and parse input parameters ==
         fig = Figure(array, **kwargs)
         array = None
@@ -1487,10 +2525,13 @@ class Nansat(Domain):
         bandNo = self._get_band_number(bandID)
         band = self.get_GDALRasterBand(bandID)
         minmax = band.GetMetadataItem('minmax')
-        # Get min and max from band histogram if not given (from wkv)
+        data = self.__getitem__(bandNo)
+        # Get min and max of the band if not given (from wkv)
         if minmax is None:
-            (rmin, rmax) = band.ComputeRasterMinMax(1)
-            minmax = str(rmin) + ' ' + str(rmax)
+            if np.all(np.isnan(data)):
+                raise OptionError('Band %s has no valid values, minmax '
+                                  'cannot be estimated' % str(bandID))
+            minmax = str(np.nanmin(data)) + ' ' + str(np.nanmax(data))
 
         bMin = float(minmax.split(' ')[0])
         bMax = float(minmax.split(' ')[1])
@@ -1512,7 +2553,6 @@ class Nansat(Domain):
                                                           band.YSize, 1,
                                                           gdal.GDT_Byte,
                                                           ['COMPRESS=LZW'])
-        data = self.__getitem__(bandNo)
         scaledData = ((data - bMin) / (bMax - bMin)) * 255
         outDataset.GetRasterBand(1).WriteArray(scaledData)
         outDataset.GetRasterBand(1).SetMetadata(band.GetMetadata())
@@ -1525,6 +2565,114 @@ class Nansat(Domain):
         outDataset = None
         self.vrt.copyproj(fileName)
 
+    def write_tiles(self, outDir, band=1, zoomLevels=range(0, 8), clim=None,
+                    cmapName='jet', workers=1, eResampleAlg=0, tms=False):
+        ''' Write a pyramid of web map tiles (XYZ or TMS) for a given band
+
+        Tiles of 256 x 256 pixels in Web Mercator (EPSG:3857) are written
+        into <outDir>/<zoom>/<x>/<y>.png. Only tiles of the highest zoom
+        level are reprojected (as in Nansat.reproject_tiled()), tiles which
+        do not overlap the object or have no valid pixels in the swathmask
+        are skipped. Tiles of lower zoom levels are made by averaging 2x2
+        pixels of the four tiles of the next zoom level. Tiles are rendered
+        by Figure with the same colormap and color limits; pixels without
+        data are transparent. Reprojection, averaging and rendering of tiles
+        are distributed over <workers> processes.
+
+        Parameters
+        -----------
+        outDir : str
+            name of the output directory
+        band : int or str
+            number or name of the band
+        zoomLevels : list of int
+            zoom levels to write
+        clim : [float, float]
+            color limits. By default the metadata item 'minmax' of the band
+            or minimum and maximum of the band are used
+        cmapName : str
+            name of the matplotlib colormap
+        workers : int
+            number of processes
+        eResampleAlg : int
+            resampling algorithm, see Nansat.reproject()
+        tms : bool
+            If True, y index of tiles starts from the south (TMS).
+            If False, from the north (XYZ, as in Google and OSM).
+
+        Returns
+        --------
+        tiles : list
+            (zoom, x, y) of the written tiles
+
+        Examples
+        --------
+        n.write_tiles('tiles', 'sigma0_HH', range(3, 10), [0, 0.1], 'gray',
+                      workers=4)
+
+        '''
+        zoomLevels = sorted(set(zoomLevels))
+        bandName = self.get_metadata(bandID=band)['name']
+        if clim is None:
+            minmax = self.get_metadata(bandID=bandName).get('minmax', None)
+            if minmax is None:
+                data = self[bandName]
+                if np.all(np.isnan(data)):
+                    raise OptionError('Band %s has no valid values, clim '
+                                      'cannot be estimated' % bandName)
+                clim = [np.nanmin(data), np.nanmax(data)]
+            else:
+                clim = [float(val) for val in minmax.split(' ')[:2]]
+
+        # find tiles of the highest zoom level which cover the object
+        zoom = zoomLevels[-1]
+        lon, lat = self.get_border()
+        tiles = _get_border_tiles(lon, lat, zoom)
+
+        tmpDir = tempfile.mkdtemp(prefix='nansat_tiles_')
+        if workers > 1:
+            pool = mp.Pool(workers, _init_tile_worker, (self, tmpDir))
+            mapper = pool.map
+        else:
+            pool = None
+            _init_tile_worker(self, tmpDir)
+            mapper = map
+
+        written = []
+        try:
+            # reproject tiles of the highest zoom level
+            tiles = [tile for tile in
+                     mapper(_warp_tile, [tile + (bandName, eResampleAlg)
+                                         for tile in tiles])
+                     if tile is not None]
+            self.logger.info('%d tiles at zoom %d' % (len(tiles), zoom))
+            levelTiles = {zoom: tiles}
+            # average tiles for lower zoom levels
+            for zoom in range(zoomLevels[-1] - 1, zoomLevels[0] - 1, -1):
+                parents = sorted(set((zoom, x // 2, y // 2)
+                                     for z, x, y in levelTiles[zoom + 1]))
+                levelTiles[zoom] = [tile for tile in
+                                    mapper(_average_tile, parents)
+                                    if tile is not None]
+                self.logger.info('%d tiles at zoom %d' %
+                                 (len(levelTiles[zoom]), zoom))
+
+            # render tiles of the requested zoom levels
+            toRender = [tile + (os.path.join(outDir, '%d' % tile[0],
+                                             '%d' % tile[1]),
+                                clim, cmapName, tms)
+                        for zoom in zoomLevels for tile in levelTiles[zoom]]
+            for dirName in set(tile[3] for tile in toRender):
+                if not os.path.exists(dirName):
+                    os.makedirs(dirName)
+            written = mapper(_render_tile, toRender)
+        finally:
+            if pool is not None:
+                pool.terminate()
+            shutil.rmtree(tmpDir, True)
+
+        return written
+
     @property
     def time_coverage_start(self):
         return parse_time(self.get_metadata('time_coverage_start'))
@@ -1636,11 +2784,11 @@ class Nansat(Domain):
             ff = glob.glob(os.path.join(self.fileName, '*.*'))
             for f in ff:
                 test_openable(f)
-        # lazy import of nansat mappers
-        # if nansat mappers were not imported yet
+        # lazy import of nansat mappers: find mapper modules only once,
+        # import a module when the mapper is a candidate for the file
         global nansatMappers
         if nansatMappers is None:
-            nansatMappers = _import_mappers()
+            nansatMappers = _find_mappers()
 
         # open GDAL dataset. It will be parsed to all mappers for testing
         gdalDataset = None
@@ -1651,10 +2799,12 @@ class Nansat(Domain):
                 self.logger.error('GDAL could not open ' + self.fileName +
                                   ', trying to read with Nansat mappers...')
         if gdalDataset is not None:
-            # get metadata from the GDAL dataset
+            # get metadata and driver from the GDAL dataset
             metadata = gdalDataset.GetMetadata()
+            driver = gdalDataset.GetDriver().ShortName
         else:
             metadata = None
+            driver = None
 
         tmpVRT = None
 
@@ -1669,25 +2819,34 @@ class Nansat(Domain):
             if mapperName not in nansatMappers:
                 raise OptionError('Mapper ' + mapperName + ' not found')
 
+            # import only this mapper
+            mapper = _load_mapper(nansatMappers, mapperName)
+            if mapper is None:
+                raise OptionError('Mapper ' + mapperName + ' not found')
+
             # check if mapper is importbale or raise an ImportError error
-            if isinstance(nansatMappers[mapperName], tuple):
-                errType, err, traceback = nansatMappers[mapperName]
+            if isinstance(mapper, tuple):
+                errType, err, traceback = mapper
                 # self.logger.error(err, exc_info=(errType, err, traceback))
                 raise errType, err, traceback
 
             # create VRT using the selected mapper
-            tmpVRT = nansatMappers[mapperName](self.fileName,
-                                               gdalDataset,
-                                               metadata,
-                                               **kwargs)
+            tmpVRT = mapper(self.fileName, gdalDataset, metadata, **kwargs)
             self.mapper = mapperName.replace('mapper_', '')
         else:
-            # We test all mappers, import one by one
-            for iMapper in nansatMappers:
+            # We test all candidate mappers, import one by one
+            for iMapper in list(nansatMappers):
+                # skip mappers which cannot open the file (not imported)
+                if not is_candidate(iMapper, self.fileName, driver):
+                    continue
+                mapper = _load_mapper(nansatMappers, iMapper)
+                # skip modules without mappers
+                if mapper is None:
+                    continue
                 # skip non-importable mappers
-                if isinstance(nansatMappers[iMapper], tuple):
+                if isinstance(mapper, tuple):
                     # keep errors to show before use of generic mapper
-                    importErrors.append(nansatMappers[iMapper][1])
+                    importErrors.append(mapper[1])
                     continue
 
                 self.logger.debug('Trying %s...' % iMapper)
@@ -1701,10 +2860,8 @@ class Nansat(Domain):
 
                 # create a Mapper object and get VRT dataset from it
                 try:
-                    tmpVRT = nansatMappers[iMapper](self.fileName,
-                                                    gdalDataset,
-                                                    metadata,
-                                                    **kwargs)
+                    tmpVRT = mapper(self.fileName, gdalDataset, metadata,
+                                    **kwargs)
                     self.logger.info('Mapper %s - success!' % iMapper)
                     self.mapper = iMapper.replace('mapper_', '')
                     break
@@ -2174,14 +3331,292 @@ class Nansat(Domain):
         return extent
 
 
-def _import_mappers(logLevel=None):
-    ''' Import available mappers into a dictionary
+# datasets opened by each thread in _read_block()
+_threadDatasets = threading.local()
+
+
+def _read_block(args):
+    ''' Read block of rows from a band of GDAL dataset in a worker thread
+
+    Each thread keeps its own handles of opened datasets.
+
+    Parameters
+    -----------
+    args : tuple
+        (fileName, bandNumber, yOff, ySize)
 
     Returns
     --------
-    nansatMappers : dict
+    bandNumber, yOff, data : int, int, numpy array
+
+    '''
+    fileName, bandNumber, yOff, ySize = args
+    datasets = getattr(_threadDatasets, 'datasets', None)
+    if datasets is None:
+        datasets = _threadDatasets.datasets = {}
+    if fileName not in datasets:
+        datasets[fileName] = gdal.Open(fileName)
+    band = datasets[fileName].GetRasterBand(bandNumber)
+
+    return bandNumber, yOff, band.ReadAsArray(0, yOff, band.XSize, ySize)
+
+
+def _read_decimated(band, xOff, yOff, xSize, ySize, xStep=1, yStep=1):
+    '''Read every xStep-th column and yStep-th row of a window of a band
+
+    Pixels are selected as in numpy (window[::yStep, ::xStep]) and the
+    decimation is done by GDAL in one read. With nearest neighbour
+    resampling GDAL takes the source pixel under the centre of each pixel
+    of the buffer, so the read window is shifted back by half a step. The
+    first and the last row/column of the result, for which the shifted
+    window would be outside the band, are read separately. GDAL would take
+    a decimated window from overviews (e.g. of a COG) if the band has them,
+    then the selected rows are read at full resolution one by one instead.
+
+    Parameters
+    -----------
+    band : gdal.Band
+        band to read
+    xOff, yOff : int
+        offset of the window (pixels, lines)
+    xSize, ySize : int
+        size of the window
+    xStep, yStep : int
+        step of columns and rows
+
+    Returns
+    --------
+    data : numpy array
+        array with ceil(ySize / yStep) rows and ceil(xSize / xStep)
+        columns (None if GDAL cannot read the band)
+
+    '''
+    if xSize < 1 or ySize < 1 or (xStep == 1 and yStep == 1):
+        return band.ReadAsArray(xOff, yOff, xSize, ySize)
+
+    if band.GetOverviewCount() > 0:
+        rows = [band.ReadAsArray(xOff, yOff + iy, xSize, 1)
+                for iy in range(0, ySize, yStep)]
+        if any(row is None for row in rows):
+            return None
+        return np.vstack(rows)[:, ::xStep]
+
+    # number of selected pixels, half step and range of selected pixels
+    # read by the shifted window (i0:i1) for x and y
+    dims = []
+    for off, size, step, bandSize in [(xOff, xSize, xStep, band.XSize),
+                                      (yOff, ySize, yStep, band.YSize)]:
+        n = (size + step - 1) // step
+        half = step // 2
+        i0 = 0 if off - half >= 0 else 1
+        i1 = n if off + n * step - half <= bandSize else n - 1
+        dims.append((n, half, i0, max(i0, i1)))
+    (nx, hx, ix0, ix1), (ny, hy, iy0, iy1) = dims
+
+    reads = []
+    if ix1 > ix0 and iy1 > iy0:
+        reads.append((slice(iy0, iy1), slice(ix0, ix1),
+                      band.ReadAsArray(xOff + ix0 * xStep - hx,
+                                       yOff + iy0 * yStep - hy,
+                                       (ix1 - ix0) * xStep,
+                                       (iy1 - iy0) * yStep,
+                                       ix1 - ix0, iy1 - iy0)))
+    # first/last rows and columns: read the full row/column of the window
+    for iy in sorted(set(range(ny)) - set(range(iy0, iy1))):
+        row = band.ReadAsArray(xOff, yOff + iy * yStep, xSize, 1)
+        if row is not None:
+            row = row[:, ::xStep]
+        reads.append((slice(iy, iy + 1), slice(None), row))
+    for ix in sorted(set(range(nx)) - set(range(ix0, ix1))):
+        column = band.ReadAsArray(xOff + ix * xStep, yOff, 1, ySize)
+        if column is not None:
+            column = column[::yStep, :]
+        reads.append((slice(None), slice(ix, ix + 1), column))
+
+    if any(read[2] is None for read in reads):
+        return None
+    data = np.empty((ny, nx), reads[0][2].dtype)
+    for rows, columns, array in reads:
+        data[rows, columns] = array
+    return data
+
+
+# half length of the equator in Web Mercator, m
+_WEBMERCATOR_ORIGIN = np.pi * 6378137.
+
+# size of web map tiles, pixels
+_TILE_SIZE = 256
+
+# Nansat object and temporary directory used by tile workers
+_tileNansat = None
+_tileDir = None
+
+
+def _lonlat_to_tile(lon, lat, zoom):
+    ''' Get x, y index of the web map tile containing the point at zoom '''
+    nTiles = 2 ** zoom
+    lat = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = int((lon + 180.) / 360. * nTiles)
+    y = int((1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2 * nTiles)
+    return min(max(x, 0), nTiles - 1), min(max(y, 0), nTiles - 1)
+
+
+def _get_border_tiles(lon, lat, zoom):
+    '''Get web map tiles at zoom which cover the area inside the border
+
+    If the border crosses the antimeridian (jump of longitude by more than
+    180 degrees between neighbour points), the tiles are taken from the
+    westernmost longitude eastwards to 180 and from -180 to the
+    easternmost longitude.
+
+    Parameters
+    -----------
+    lon, lat : numpy arrays
+        longitudes and latitudes of the border (e.g. from get_border())
+    zoom : int
+        zoom level
+
+    Returns
+    --------
+    tiles : list
+        (zoom, x, y) of the tiles
+
+    '''
+    lon, lat = np.asarray(lon), np.asarray(lat)
+    nTiles = 2 ** zoom
+    x0, y0 = _lonlat_to_tile(np.min(lon), np.max(lat), zoom)
+    x1, y1 = _lonlat_to_tile(np.max(lon), np.min(lat), zoom)
+    if np.abs(np.diff(lon)).max() > 180:
+        x0 = _lonlat_to_tile(np.min(lon[lon >= 0]), 0, zoom)[0]
+        x1 = _lonlat_to_tile(np.max(lon[lon < 0]), 0, zoom)[0] + nTiles
+        x1 = min(x1, x0 + nTiles - 1)
+    return [(zoom, x % nTiles, y) for x in range(x0, x1 + 1)
+            for y in range(y0, y1 + 1)]
+
+
+def _get_tile_file(zoom, x, y):
+    ''' Get name of the temporary file with float data of the tile '''
+    return os.path.join(_tileDir, '%d_%d_%d.npy' % (zoom, x, y))
+
+
+def _init_tile_worker(nansatObject, tmpDir):
+    ''' Set Nansat object and temporary directory for the tile worker '''
+    global _tileNansat, _tileDir
+    _tileNansat = nansatObject
+    _tileDir = tmpDir
+
+
+def _warp_tile(args):
+    ''' Reproject a band onto a web map tile and save to temporary file
+
+    Parameters
+    -----------
+    args : tuple
+        (zoom, x, y, bandName, eResampleAlg)
+
+    Returns
+    --------
+    tile : (zoom, x, y) or None if the tile has no valid data
+
+    '''
+    zoom, x, y, bandName, eResampleAlg = args
+    tileSize = 2 * _WEBMERCATOR_ORIGIN / 2 ** zoom
+    geoTransform = (-_WEBMERCATOR_ORIGIN + x * tileSize,
+                    tileSize / _TILE_SIZE, 0,
+                    _WEBMERCATOR_ORIGIN - y * tileSize,
+                    0, -tileSize / _TILE_SIZE)
+    tileVRT = VRT(srcGeoTransform=geoTransform,
+                  srcProjection=NSR(3857).wkt,
+                  srcRasterXSize=_TILE_SIZE,
+                  srcRasterYSize=_TILE_SIZE)
+    tileDomain = Domain(ds=tileVRT.dataset,
+                        logLevel=_tileNansat.logger.level)
+    if not tileDomain.overlaps(_tileNansat):
+        return None
+
+    srcVRT = _tileNansat.vrt
+    try:
+        _tileNansat.reproject(tileDomain, eResampleAlg=eResampleAlg)
+        swathmask = _tileNansat['swathmask']
+        if not swathmask.any():
+            return None
+        data = _tileNansat[bandName].astype('float32')
+    finally:
+        _tileNansat.vrt = srcVRT
+
+    data[swathmask == 0] = np.nan
+    np.save(_get_tile_file(zoom, x, y), data)
+    return zoom, x, y
+
+
+def _average_tile(args):
+    ''' Make a tile by averaging 2x2 pixels of four tiles of next zoom
+
+    Parameters
+    -----------
+    args : tuple
+        (zoom, x, y) of the new tile
+
+    Returns
+    --------
+    tile : (zoom, x, y) or None if the tile has no valid data
+
+    '''
+    zoom, x, y = args
+    data = np.zeros((2 * _TILE_SIZE, 2 * _TILE_SIZE), 'float32') + np.nan
+    for dy in [0, 1]:
+        for dx in [0, 1]:
+            fileName = _get_tile_file(zoom + 1, 2 * x + dx, 2 * y + dy)
+            if os.path.exists(fileName):
+                data[dy * _TILE_SIZE:(dy + 1) * _TILE_SIZE,
+                     dx * _TILE_SIZE:(dx + 1) * _TILE_SIZE] = np.load(fileName)
+
+    data = data.reshape(_TILE_SIZE, 2, _TILE_SIZE, 2)
+    valid = np.isfinite(data)
+    count = valid.sum(axis=3).sum(axis=1)
+    if not count.any():
+        return None
+    data[~valid] = 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        data = data.sum(axis=3).sum(axis=1) / count
+    np.save(_get_tile_file(zoom, x, y), data.astype('float32'))
+    return zoom, x, y
+
+
+def _render_tile(args):
+    ''' Render a tile from temporary file into PNG with Figure
+
+    Parameters
+    -----------
+    args : tuple
+        (zoom, x, y, dirName, clim, cmapName, tms)
+
+    Returns
+    --------
+    tile : (zoom, x, y)
+
+    '''
+    zoom, x, y, dirName, clim, cmapName, tms = args
+    data = np.load(_get_tile_file(zoom, x, y))
+    fig = Figure(data, cmin=clim[0], cmax=clim[1], cmapName=cmapName)
+    fig.process()
+    fig.reprojMask = np.isnan(data)
+    fig._make_transparent_color()
+    if tms:
+        y = 2 ** zoom - 1 - y
+    fig.pilImg.save(os.path.join(dirName, '%d.png' % y))
+    return zoom, x, y
+
+
+def _find_mappers(logLevel=None):
+    ''' Find available mapper modules without importing them
+
+    Returns
+    --------
+    nansatMappers : OrderedDict
         key  : mapper name
-        value: class Mapper(VRT) from the mapper module
+        value: loader of the mapper module (replaced by class Mapper(VRT)
+               or by exc_info of ImportError in _load_mapper)
 
     '''
     logger = add_logger('import_mappers', logLevel=logLevel)
@@ -2204,24 +3639,10 @@ def _import_mappers(logLevel=None):
 
     for mappersPackage in mappersPackages:
         logger.debug('From package: %s' % mappersPackage.__path__)
-        # scan through modules and load all modules that contain class Mapper
+        # scan through modules and keep loaders of all modules
         for finder, name, ispkg in (pkgutil.
                                     iter_modules(mappersPackage.__path__)):
-            logger.debug('Loading mapper %s' % name)
-            loader = finder.find_module(name)
-            # try to import mapper module
-            try:
-                module = loader.load_module(name)
-            except ImportError:
-                # keep ImportError instance instead of the mapper
-                exc_info = sys.exc_info()
-                logger.error('Mapper %s could not be imported'
-                             % name, exc_info=exc_info)
-                nansatMappers[name] = exc_info
-            else:
-                # add the imported mapper to nansatMappers
-                if hasattr(module, 'Mapper'):
-                    nansatMappers[name] = module.Mapper
+            nansatMappers[name] = finder.find_module(name)
 
         # move netcdfcdf mapper to the end
         if 'mapper_netcdfcf' in nansatMappers:
@@ -2232,3 +3653,67 @@ def _import_mappers(logLevel=None):
             nansatMappers['mapper_generic'] = nansatMappers.pop('mapper_generic')
 
     return nansatMappers
+
+
+def _load_mapper(nansatMappers, name, logLevel=None):
+    ''' Import mapper module (only once) and keep it in nansatMappers
+
+    Parameters
+    -----------
+    nansatMappers : OrderedDict
+        mappers from _find_mappers()
+    name : str
+        name of the mapper module
+
+    Returns
+    --------
+    mapper : class Mapper(VRT), or tuple
+        Mapper class, or exc_info of ImportError. None if the module does
+        not contain class Mapper (it is then removed from nansatMappers).
+
+    '''
+    mapper = nansatMappers[name]
+    if not hasattr(mapper, 'load_module'):
+        # already imported
+        return mapper
+
+    logger = add_logger('import_mappers', logLevel=logLevel)
+    logger.debug('Loading mapper %s' % name)
+    missing = get_missing_imports(name)
+    # try to import mapper module
+    try:
+        if len(missing) > 0:
+            raise ImportError('Mapper %s requires %s' % (name,
+                                                         ', '.join(missing)))
+        module = mapper.load_module(name)
+    except ImportError:
+        # keep ImportError instance instead of the mapper
+        exc_info = sys.exc_info()
+        logger.error('Mapper %s could not be imported'
+                     % name, exc_info=exc_info)
+        nansatMappers[name] = exc_info
+    else:
+        # add the imported mapper to nansatMappers
+        if hasattr(module, 'Mapper'):
+            nansatMappers[name] = module.Mapper
+        else:
+            nansatMappers.pop(name)
+
+    return nansatMappers.get(name)
+
+
+def _import_mappers(logLevel=None):
+    ''' Import available mappers into a dictionary
+
+    Returns
+    --------
+    nansatMappers : dict
+        key  : mapper name
+        value: class Mapper(VRT) from the mapper module
+
+    '''
+    nansatMappers = _find_mappers(logLevel)
+    for name in list(nansatMappers):
+        _load_mapper(nansatMappers, name, logLevel)
+
+    return nansatMappers
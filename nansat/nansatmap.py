@@ -43,6 +43,7 @@ class Nansatmap(Basemap):
     colorbar = None
     mpl = []
     lon, lat, x, y = None, None, None, None
+    stepSize = 1
     # parameters for smoothing
     # convolve
     convolve_weightSize = 7
@@ -75,6 +76,10 @@ class Nansatmap(Basemap):
         domain : domain object
         kwargs : dictionary
             parameters that are used for all operations.
+            stepSize : int
+                1, reduction factor of geolocation grids and data.
+                Full size data are decimated to the reduced grid, so
+                a large scene can be plotted at screen resolution quickly.
 
         Modifies
         ---------
@@ -94,6 +99,7 @@ class Nansatmap(Basemap):
 
         '''
         self.domain = domain
+        self.stepSize = kwargs.pop('stepSize', self.stepSize)
 
         # get proj4
         proj4 = NSR(domain.vrt.get_projection()).ExportToProj4()
@@ -261,12 +267,13 @@ class Nansatmap(Basemap):
 
         '''
         self._create_xy_grids()
+        data = self._get_data(data)
 
         # if cmap is given, set to self.cmap
         if 'cmap' in kwargs.keys():
             self.cmap = kwargs.pop('cmap')
 
-        # smooth data
+        # smooth data (on the reduced grid)
         if smooth:
             data = self.smooth(data, mode, **kwargs)
 
@@ -359,6 +366,7 @@ class Nansatmap(Basemap):
         '''
         # Create X/Y axes
         self._create_xy_grids()
+        data = self._get_data(data)
 
         # add random colormap
         if 'cmap' in kwargs and kwargs['cmap'] == 'random':
@@ -392,6 +400,7 @@ class Nansatmap(Basemap):
 
         '''
         # mask nan data
+        data = self._get_data(data)
         data = np.ma.array(data, mask=np.isnan(data))
         # Plot a quadrilateral mesh.
         self._create_xy_grids()
@@ -410,6 +419,7 @@ class Nansatmap(Basemap):
             Input data with Y-component
         step : int or (int, int)
             Skip <step> pixels along both dimentions(alternative to quivectors)
+            Pixels of the full size data (step is divided by stepSize)
         quivectors : int or (int,int)
             Number of vectors along both dimentions
         Parameters for Basemap.quiver()
@@ -421,6 +431,8 @@ class Nansatmap(Basemap):
 
         '''
         # if Nan is included, apply mask
+        dataX = self._get_data(dataX)
+        dataY = self._get_data(dataY)
         dataX = np.ma.array(dataX, mask=np.isnan(dataX))
         dataY = np.ma.array(dataY, mask=np.isnan(dataY))
 
@@ -441,6 +453,9 @@ class Nansatmap(Basemap):
             step1 = dataX.shape[1] / quivectors1
         else:
             step0 = step1 = 5
+        if quivectors is None:
+            step0 = max(step0 / self.stepSize, 1)
+            step1 = max(step1 / self.stepSize, 1)
 
         dataX2 = dataX[::step0, ::step1]
         dataY2 = dataY[::step0, ::step1]
@@ -606,13 +621,37 @@ class Nansatmap(Basemap):
     def _create_lonlat_grids(self):
         '''Generate grids with lon/lat coordinates in each cell
 
+        Grids are reduced by self.stepSize
+
         Modifies
         ---------
         self.lon : numpy array with lon coordinates
         self.lat : numpy array with lat coordinates
         '''
         if self.lon is None or self.lat is None:
-            self.lon, self.lat = self.domain.get_geolocation_grids()
+            self.lon, self.lat = self.domain.get_geolocation_grids(
+                                                                self.stepSize)
+
+    def _get_data(self, data):
+        '''Get data on the grid of self.lon, self.lat
+
+        Parameters
+        -----------
+        data : numpy array, or int or str
+            full size data (decimated with self.stepSize), data on the
+            reduced grid (returned as is), or number or name of a band of
+            self.domain (if it is Nansat) which is read with the step.
+
+        Returns
+        --------
+        data : numpy array
+
+        '''
+        if not isinstance(data, np.ndarray):
+            return self.domain[data, ::self.stepSize, ::self.stepSize]
+        if self.stepSize > 1 and data.shape[:2] == self.domain.shape():
+            return data[::self.stepSize, ::self.stepSize]
+        return data
 
     def _create_xy_grids(self):
         '''Generate grids with x/y coordinates in each cell
@@ -661,11 +700,12 @@ class Nansatmap(Basemap):
             zones : numpy array with integer zones
                 the same array as usied in Nansatmap.imshow
         '''
+        zones = self._get_data(zones)
         zoneIndices = np.unique(zones[np.isfinite(zones)])
         for zi in zoneIndices:
             zrows, zcols = np.nonzero(zones == zi)
-            zrc = np.median(zrows)
-            zcc = np.median(zcols)
+            zrc = np.median(zrows) * self.stepSize
+            zcc = np.median(zcols) * self.stepSize
             lon, lat = self.domain.transform_points([zcc], [zrc], 0)
             x, y = self(lon[0], lat[0])
             plt.text(x, y, '%d' % zi, fontsize=fontsize)
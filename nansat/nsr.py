@@ -86,3 +86,97 @@ class NSR(osr.SpatialReference, object):
 
         # set WKT
         self.wkt = self.ExportToWkt()
+
+    def get_cf_grid_mapping(self):
+        '''Get name and attributes of CF grid mapping variable
+
+        Parameters of the most common projections are converted into
+        attributes defined by the CF conventions. WKT is added into
+        attributes 'crs_wkt' and 'spatial_ref' (read by GDAL) for all
+        projections.
+
+        Returns
+        --------
+        name : str
+            value of grid_mapping_name, or 'crs' if the projection
+            is unknown in CF conventions
+        attributes : dict
+            attributes of the grid mapping variable
+
+        '''
+        attributes = {'semi_major_axis': self.GetSemiMajor(),
+                      'inverse_flattening': self.GetInvFlattening(),
+                      'longitude_of_prime_meridian': 0.0}
+        if self.IsGeographic():
+            name = 'latitude_longitude'
+        else:
+            projection = self.GetAttrValue('PROJECTION')
+            if projection not in CF_PROJECTIONS:
+                name = 'crs'
+                attributes = {}
+            else:
+                name, cfParams = CF_PROJECTIONS[projection]
+                for cfParam, osrParam in cfParams:
+                    if type(osrParam) is list:
+                        value = [self.GetProjParm(p, 0.0) for p in osrParam]
+                    else:
+                        value = self.GetProjParm(osrParam, 0.0)
+                    attributes[cfParam] = value
+                attributes['false_easting'] = self.GetProjParm(
+                                                    'false_easting', 0.0)
+                attributes['false_northing'] = self.GetProjParm(
+                                                    'false_northing', 0.0)
+                if name == 'polar_stereographic':
+                    # latitude of origin in OGC WKT is the standard parallel
+                    attributes['latitude_of_projection_origin'] = (
+                        90.0 if attributes['standard_parallel'] >= 0 else -90.0)
+
+        if name != 'crs':
+            attributes['grid_mapping_name'] = name
+        attributes['crs_wkt'] = self.wkt
+        attributes['spatial_ref'] = self.wkt
+
+        return name, attributes
+
+
+# OGC WKT projection: (CF grid_mapping_name, [(CF parameter, OGC parameter)])
+CF_PROJECTIONS = {
+    'Polar_Stereographic': ('polar_stereographic', [
+        ('straight_vertical_longitude_from_pole', 'central_meridian'),
+        ('standard_parallel', 'latitude_of_origin')]),
+    'Stereographic': ('stereographic', [
+        ('longitude_of_projection_origin', 'central_meridian'),
+        ('latitude_of_projection_origin', 'latitude_of_origin'),
+        ('scale_factor_at_projection_origin', 'scale_factor')]),
+    'Oblique_Stereographic': ('stereographic', [
+        ('longitude_of_projection_origin', 'central_meridian'),
+        ('latitude_of_projection_origin', 'latitude_of_origin'),
+        ('scale_factor_at_projection_origin', 'scale_factor')]),
+    'Mercator_1SP': ('mercator', [
+        ('longitude_of_projection_origin', 'central_meridian'),
+        ('scale_factor_at_projection_origin', 'scale_factor')]),
+    'Mercator_2SP': ('mercator', [
+        ('longitude_of_projection_origin', 'central_meridian'),
+        ('standard_parallel', 'standard_parallel_1')]),
+    'Transverse_Mercator': ('transverse_mercator', [
+        ('longitude_of_central_meridian', 'central_meridian'),
+        ('latitude_of_projection_origin', 'latitude_of_origin'),
+        ('scale_factor_at_central_meridian', 'scale_factor')]),
+    'Lambert_Conformal_Conic_1SP': ('lambert_conformal_conic', [
+        ('longitude_of_central_meridian', 'central_meridian'),
+        ('latitude_of_projection_origin', 'latitude_of_origin'),
+        ('standard_parallel', 'latitude_of_origin')]),
+    'Lambert_Conformal_Conic_2SP': ('lambert_conformal_conic', [
+        ('longitude_of_central_meridian', 'central_meridian'),
+        ('latitude_of_projection_origin', 'latitude_of_origin'),
+        ('standard_parallel', ['standard_parallel_1',
+                               'standard_parallel_2'])]),
+    'Lambert_Azimuthal_Equal_Area': ('lambert_azimuthal_equal_area', [
+        ('longitude_of_projection_origin', 'longitude_of_center'),
+        ('latitude_of_projection_origin', 'latitude_of_center')]),
+    'Albers_Conic_Equal_Area': ('albers_conical_equal_area', [
+        ('longitude_of_central_meridian', 'longitude_of_center'),
+        ('latitude_of_projection_origin', 'latitude_of_center'),
+        ('standard_parallel', ['standard_parallel_1',
+                               'standard_parallel_2'])]),
+}
@@ -0,0 +1,343 @@
+# Name:    stats.py
+# Purpose: Fast statistics (histogram, percentiles) of large arrays
+# Authors:      Asuka Yamakawa, Anton Korosov, Knut-Frode Dagestad,
+#               Morten W. Hansen, Alexander Myasoyedov,
+#               Dmitry Petrenko, Evgeny Morozov, Aleksander Vines
+# Created:      19.10.2026
+# Copyright:    (c) NERSC 2011 - 2026
+# Licence:
+# This file is part of NANSAT.
+# NANSAT is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version 3 of the License.
+# http://www.gnu.org/licenses/gpl-3.0.html
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+from __future__ import absolute_import
+
+import numpy as np
+
+from nansat.tools import OptionError
+
+
+def subset_array(array, subsetArraySize=None):
+    '''Get regular subset of array with about subsetArraySize elements
+
+    Parameters
+    -----------
+    array : numpy array
+        input array of any shape
+    subsetArraySize : int
+        approximate size of the subset. If None, the array is returned.
+
+    Returns
+    --------
+    subset : numpy array
+        1D view (if possible) of every n-th element of the array
+
+    '''
+    array = np.asarray(array)
+    if subsetArraySize is None or array.size <= subsetArraySize:
+        return array
+    step = max(int(round(float(array.size) / subsetArraySize)), 1)
+    return array.reshape(-1)[::step]
+
+
+class StreamingHistogram(object):
+    '''Fixed-bin histogram which is updated chunk by chunk
+
+    Exact minimum, maximum and number of finite values are kept together
+    with counts in <bins> bins of equal width, so any amount of data is
+    processed in one pass with fixed memory. If binRange is given, the
+    bins cover that range and values outside (underflow and overflow) are
+    kept in sorted tails, so a few outliers do not reduce the resolution
+    and percentiles in long tails of skewed data are exact. If a tail
+    grows above tailSize values, only every n-th value is kept. Without
+    binRange the bins cover the range of the first chunk and the width is
+    doubled (neighbour bins are merged) when values outside the range are
+    added. Percentiles are estimated by linear interpolation within bins
+    (or between the sorted values of the tails).
+
+    Examples
+    --------
+    hist = StreamingHistogram()
+    for rows in range(0, array.shape[0], 1000):
+        hist.update(array[rows:rows + 1000])
+    pMin, pMax = hist.percentile([2.5, 97.5])
+
+    '''
+    def __init__(self, bins=1000, binRange=None, tailSize=100000):
+        '''Create empty histogram
+
+        Parameters
+        -----------
+        bins : int
+            number of bins (even)
+        binRange : [float, float]
+            fixed range of bins. If None, the range is adjusted to the data.
+        tailSize : int
+            maximum number of values kept in each tail outside binRange
+
+        '''
+        if bins < 2 or bins % 2 != 0:
+            raise OptionError('Number of bins must be even (%s)' % str(bins))
+        self.nBins = int(bins)
+        self.counts = np.zeros(self.nBins, 'int64')
+        self.start = None
+        self.width = None
+        self.fixedRange = binRange is not None
+        self.underflow = 0
+        self.overflow = 0
+        self.tailSize = int(tailSize)
+        # sorted values below and above the range of bins (every step-th)
+        self.tails = {'low': np.zeros(0), 'high': np.zeros(0)}
+        self.tailSteps = {'low': 1, 'high': 1}
+        self.count = 0
+        self.min = None
+        self.max = None
+        if self.fixedRange:
+            vMin, vMax = float(binRange[0]), float(binRange[1])
+            if not vMax > vMin:
+                raise OptionError('Wrong range of bins %s' % str(binRange))
+            self.start = vMin
+            self.width = (vMax - vMin) / self.nBins
+
+    @property
+    def edges(self):
+        ''' Edges of bins (nBins + 1 values) '''
+        if self.start is None:
+            return None
+        return self.start + self.width * np.arange(self.nBins + 1)
+
+    def update(self, array):
+        '''Add finite values of the array to the histogram
+
+        Parameters
+        -----------
+        array : numpy array
+            values of any shape. NaN and inf are skipped.
+
+        '''
+        array = np.asarray(array).reshape(-1)
+        array = array[np.isfinite(array)]
+        if array.size == 0:
+            return
+        aMin, aMax = float(array.min()), float(array.max())
+        self.count += array.size
+        if self.fixedRange:
+            # only count values outside the range of bins
+            below = array < self.start
+            above = array > self.start + self.width * self.nBins
+            self.underflow += int(below.sum())
+            self.overflow += int(above.sum())
+            if below.any() or above.any():
+                self._add_tail('low', array[below])
+                self._add_tail('high', array[above])
+                array = array[~(below | above)]
+        else:
+            if self.start is None:
+                self.start = aMin
+                self.width = (aMax - aMin) / self.nBins
+                if self.width == 0:
+                    self.width = max(abs(aMin), 1.) * 1e-6
+            while aMin < self.start:
+                self._widen(lower=True)
+            while aMax > self.start + self.width * self.nBins:
+                self._widen(lower=False)
+
+        indices = ((array - self.start) / self.width).astype('int64')
+        np.clip(indices, 0, self.nBins - 1, out=indices)
+        self.counts += np.bincount(indices, minlength=self.nBins)
+        self.min = aMin if self.min is None else min(self.min, aMin)
+        self.max = aMax if self.max is None else max(self.max, aMax)
+
+    def _widen(self, lower):
+        ''' Double width of bins and extend range down- or upwards '''
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        empty = np.zeros(self.nBins // 2, 'int64')
+        if lower:
+            self.counts = np.hstack([empty, merged])
+            self.start -= self.width * self.nBins
+        else:
+            self.counts = np.hstack([merged, empty])
+        self.width *= 2
+
+    def _add_tail(self, tail, values):
+        ''' Add values to the sorted tail ('low' or 'high'), thin if needed '''
+        if values.size == 0:
+            return
+        step = self.tailSteps[tail]
+        values = np.sort(values)[step // 2::step]
+        values = np.sort(np.hstack([self.tails[tail], values]),
+                         kind='mergesort')
+        while values.size > self.tailSize:
+            values = values[1::2]
+            self.tailSteps[tail] *= 2
+        self.tails[tail] = values
+
+    def _tail_value(self, tail, index, tailCount):
+        ''' Interpolate sorted tail at <index> (from 0 to tailCount - 1) '''
+        values = self.tails[tail]
+        positions = np.linspace(0, tailCount - 1, values.size)
+        return np.interp(index, positions, values)
+
+    def percentile(self, q):
+        '''Estimate percentile(s) of the added values
+
+        Parameters
+        -----------
+        q : float or list of floats
+            percentile(s) in range 0 - 100. 0 and 100 give exact
+            minimum and maximum.
+
+        Returns
+        --------
+        values : float or numpy array
+            estimated percentiles (None if no values were added)
+
+        '''
+        if self.count == 0:
+            return None
+        qArray = np.atleast_1d(np.array(q, 'float64'))
+        if (qArray < 0).any() or (qArray > 100).any():
+            raise OptionError('Percentiles must be in range 0 - 100')
+        cumsum = (np.hstack([0, np.cumsum(self.counts)]).astype('float64') +
+                  self.underflow)
+        rank = qArray / 100. * self.count
+        iBin = np.searchsorted(cumsum, rank, side='left') - 1
+        iBin = np.clip(iBin, 0, self.nBins - 1)
+        binCount = np.maximum(self.counts[iBin], 1)
+        fraction = np.clip((rank - cumsum[iBin]) / binCount, 0, 1)
+        values = self.start + self.width * (iBin + fraction)
+
+        # ranks of values outside the range of bins are taken from tails
+        # (index of sorted values as in np.percentile)
+        index = qArray / 100. * (self.count - 1)
+        below = rank < self.underflow
+        if below.any():
+            values[below] = self._tail_value('low', index[below],
+                                             self.underflow)
+        above = rank > cumsum[-1]
+        if above.any():
+            values[above] = self._tail_value(
+                                'high', index[above] - cumsum[-1],
+                                self.overflow)
+
+        values = np.clip(values, self.min, self.max)
+        values[qArray == 0] = self.min
+        values[qArray == 100] = self.max
+        if np.isscalar(q):
+            return float(values[0])
+        return values
+
+
+def get_bin_range(array, mask=None, sampleSize=100000, iqrFactor=3.):
+    '''Estimate range of values without far outliers from a regular sample
+
+    The range is limited by the fences of Tukey (quartiles -/+ iqrFactor
+    times the interquartile range) and the extreme values of the sample.
+
+    Parameters
+    -----------
+    array : numpy array
+        input data
+    mask : numpy array (bool)
+        array of the same shape; True marks pixels which are skipped
+    sampleSize : int
+        approximate number of pixels in the sample
+    iqrFactor : float
+        distance of fences from the quartiles in units of the
+        interquartile range
+
+    Returns
+    --------
+    binRange : [float, float]
+        range of values (None if the sample has less than two
+        different finite values)
+
+    '''
+    sample = subset_array(array, sampleSize)
+    if mask is not None:
+        sample = sample[~subset_array(mask, sampleSize)]
+    sample = sample[np.isfinite(sample)]
+    if sample.size == 0:
+        return None
+    sMin, sMax = float(sample.min()), float(sample.max())
+    q1, q3 = np.percentile(sample, [25, 75])
+    iqr = q3 - q1
+    vMin = max(sMin, q1 - iqrFactor * iqr)
+    vMax = min(sMax, q3 + iqrFactor * iqr)
+    if not vMax > vMin:
+        vMin, vMax = sMin, sMax
+    if not vMax > vMin:
+        return None
+    return [vMin, vMax]
+
+
+def get_histogram(array, bins=1000, subsetArraySize=None, mask=None,
+                  blockSize=1000):
+    '''Compute StreamingHistogram of 2D array by blocks of rows
+
+    The range of bins is estimated from a regular sample of the array (see
+    get_bin_range), values outside are counted as under- or overflow.
+
+    Parameters
+    -----------
+    array : numpy array
+        input data
+    bins : int
+        number of bins
+    subsetArraySize : int
+        if given, only a regular subset with about that many pixels is used
+    mask : numpy array (bool)
+        array of the same shape; True marks pixels which are skipped
+    blockSize : int
+        number of rows processed at once (limits size of temporary arrays)
+
+    Returns
+    --------
+    hist : StreamingHistogram
+
+    '''
+    array = np.asarray(array)
+    if array.ndim != 2:
+        array = subset_array(array, subsetArraySize).reshape(1, -1)
+        if mask is not None:
+            mask = subset_array(mask, subsetArraySize).reshape(1, -1)
+    elif subsetArraySize is not None and array.size > subsetArraySize:
+        step = max(int(np.sqrt(float(array.size) / subsetArraySize)), 1)
+        array = array[::step, ::step]
+        if mask is not None:
+            mask = mask[::step, ::step]
+
+    hist = StreamingHistogram(bins, get_bin_range(array, mask))
+    for row in range(0, array.shape[0], blockSize):
+        block = array[row:row + blockSize]
+        if mask is not None:
+            block = block[~mask[row:row + blockSize]]
+        hist.update(block)
+
+    return hist
+
+
+def percentile(array, q, **kwargs):
+    '''Estimate percentile(s) of finite values of an array from histogram
+
+    Parameters
+    -----------
+    array : numpy array
+        input data
+    q : float or list of floats
+        percentile(s) in range 0 - 100
+    **kwargs : dict
+        parameters for get_histogram (bins, subsetArraySize, mask,
+        blockSize)
+
+    Returns
+    --------
+    values : float or numpy array
+        estimated percentiles (None if the array has no finite values)
+
+    '''
+    return get_histogram(array, **kwargs).percentile(q)
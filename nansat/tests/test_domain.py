@@ -83,6 +83,69 @@ class DomainTest(unittest.TestCase):
         self.assertEqual(type(lat), np.ndarray)
         self.assertEqual(lat.shape, (500, 500))
 
+    def test_get_geolocation_grids_projected(self):
+        d = Domain('+proj=stere +datum=WGS84 +ellps=WGS84 +lat_0=75 +lon_0=10'
+                   ' +no_defs', '-te -100000 -100000 100000 100000 -ts 100 80')
+        lon, lat = d.get_geolocation_grids(stepSize=3)
+        cols, rows = np.meshgrid(range(0, 100, 3), range(0, 80, 3))
+        lon2, lat2 = d.transform_points(cols.flatten(), rows.flatten())
+
+        self.assertEqual(lon.shape, (27, 34))
+        self.assertTrue(np.allclose(lon.flatten(), lon2))
+        self.assertTrue(np.allclose(lat.flatten(), lat2))
+
+    def test_get_geolocation_grids_keeps_dstSRS(self):
+        d = Domain('+proj=stere +datum=WGS84 +ellps=WGS84 +lat_0=75 +lon_0=10'
+                   ' +no_defs', '-te -100000 -100000 100000 100000 -ts 100 80')
+        dstSRS = NSR(4326)
+        if not hasattr(dstSRS, 'GetAxisMappingStrategy'):
+            self.skipTest('Axis mapping strategy is not supported by GDAL')
+        strategy = dstSRS.GetAxisMappingStrategy()
+        d.get_geolocation_grids(stepSize=10, dstSRS=dstSRS)
+
+        self.assertEqual(dstSRS.GetAxisMappingStrategy(), strategy)
+
+    def test_get_geolocation_grids_float32_out(self):
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        out = (np.zeros((500, 500), 'float32'),
+               np.zeros((500, 500), 'float32'))
+        lon, lat = d.get_geolocation_grids(out=out)
+        lon32, lat32 = d.get_geolocation_grids(dtype='float32')
+
+        self.assertTrue(lon is out[0])
+        self.assertEqual(lon32.dtype, np.float32)
+        self.assertTrue(np.allclose(lon32, lon))
+        self.assertTrue(np.allclose(lat32, lat))
+
+    def test_get_geolocation_grids_cache(self):
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        lon1, lat1 = d.get_geolocation_grids(cache=True)
+        lon2, lat2 = d.get_geolocation_grids(cache=True)
+
+        self.assertTrue(lon1 is lon2)
+        self.assertFalse(lon1.flags.writeable)
+
+    def test_fingerprint(self):
+        d1 = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        d2 = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        d3 = Domain(4326, "-te 25 70 35 72 -ts 500 400")
+
+        self.assertEqual(d1.fingerprint(), d2.fingerprint())
+        self.assertNotEqual(d1.fingerprint(), d3.fingerprint())
+
+    def test_get_border_cached(self):
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        lon1, lat1 = d.get_border()
+        lon1[:] = 0
+        lon2, lat2 = d.get_border()
+        geometry = d.get_border_geometry()
+        d.vrt = Domain(4326, "-te 0 70 10 72 -ts 500 500").vrt
+        lon3, lat3 = d.get_border()
+
+        self.assertTrue(lon2.min() >= 25)
+        self.assertTrue(lon3.max() <= 10)
+        self.assertFalse(geometry.Intersects(d.get_border_geometry()))
+
     def test_get_border(self):
         d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
         lon, lat = d.get_border()
@@ -209,6 +272,31 @@ class DomainTest(unittest.TestCase):
         self.assertEqual(gcpproj.GetAttrValue('PROJECTION'),
                         'Stereographic')
 
+    def test_get_min_max_lat_lon(self):
+        d = Domain(4326, "-te 25 70 35 72 -ts 500 500")
+        minLat, maxLat, minLon, maxLon = d.get_min_max_lat_lon()
+
+        self.assertAlmostEqual(minLat, 70, 1)
+        self.assertAlmostEqual(maxLat, 72, 1)
+        self.assertAlmostEqual(minLon, 25, 1)
+        self.assertAlmostEqual(maxLon, 35, 1)
+
+    def test_get_min_max_lat_lon_exact(self):
+        d = Domain(ds=gdal.Open(self.test_file))
+        approx = d.get_min_max_lat_lon()
+        exact = d.get_min_max_lat_lon(exact=True)
+
+        self.assertTrue(np.allclose(approx, exact, atol=0.05))
+
+    def test_get_min_max_lat_lon_pole(self):
+        d = Domain('+proj=stere +datum=WGS84 +ellps=WGS84 +lat_0=90 +lon_0=0'
+                   ' +no_defs', '-te -100000 -100000 100000 100000 -ts 99 99')
+        minLat, maxLat, minLon, maxLon = d.get_min_max_lat_lon()
+
+        self.assertEqual(maxLat, 90)
+        self.assertTrue(minLon < -170)
+        self.assertTrue(maxLon > 170)
+
     def test_overlaps_contains(self):
         Bergen = Domain(4326, "-te 5 60 6 61 -ts 500 500")
         WestCoast = Domain(4326, "-te 1 58 6 64 -ts 500 500")
@@ -0,0 +1,66 @@
+#------------------------------------------------------------------------------
+# Name:         test_domain_index.py
+# Purpose:      Test the DomainIndex class
+#
+# Author:       Anton Korosov
+#
+# Created:      19.10.2026
+# Copyright:    (c) NERSC
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import unittest
+import os
+import datetime
+
+from nansat import Domain
+from nansat.domain_index import DomainIndex
+
+import nansat_test_data as ntd
+
+
+class DomainIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = DomainIndex(nodeSize=2)
+        for lon in range(0, 50, 5):
+            d = Domain(4326, '-te %d 60 %d 62 -ts 10 10' % (lon, lon + 4))
+            self.index.add(d, 'd%02d' % lon,
+                           start=datetime.datetime(2016, 1, 1 + lon / 5))
+
+    def test_query(self):
+        roi = Domain(4326, '-te 7 59 16 61 -ts 10 10')
+
+        self.assertEqual(len(self.index), 10)
+        self.assertEqual(self.index.query(roi), ['d05', 'd10', 'd15'])
+
+    def test_query_outside(self):
+        roi = Domain(4326, '-te 7 40 16 41 -ts 10 10')
+
+        self.assertEqual(self.index.query(roi), [])
+
+    def test_query_period(self):
+        roi = Domain(4326, '-te 7 59 16 61 -ts 10 10')
+        found = self.index.query(roi,
+                                 start=datetime.datetime(2016, 1, 2, 12),
+                                 end=datetime.datetime(2016, 1, 10))
+
+        self.assertEqual(found, ['d10', 'd15'])
+
+    def test_query_unicode_wkt(self):
+        wkt = u'POLYGON((7 59,16 59,16 61,7 61,7 59))'
+
+        self.assertEqual(self.index.query(wkt), ['d05', 'd10', 'd15'])
+
+    def test_save_load(self):
+        tmpfilename = os.path.join(ntd.tmp_data_path, 'domain_index.npz')
+        roi = Domain(4326, '-te 7 59 16 61 -ts 10 10')
+        self.index.save(tmpfilename)
+        index2 = DomainIndex(tmpfilename)
+
+        self.assertEqual(len(index2), 10)
+        self.assertEqual(index2.query(roi), self.index.query(roi))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -22,9 +22,10 @@ import datetime
 
 import matplotlib.pyplot as plt
 import numpy as np
+from PIL import Image
 from scipy.io.netcdf import netcdf_file
 
-from nansat import Figure, Nansat, Domain
+from nansat import Figure, FigureRenderer, Nansat, Domain
 from nansat.tools import gdal, OptionError
 
 import nansat_test_data as ntd
@@ -117,6 +118,26 @@ class FigureTest(unittest.TestCase):
         self.assertTrue(os.path.exists(tmpfilename))
 
 
+    def test_add_latlon_grids_decimated(self):
+        ''' Should draw the same grid lines from decimated lon/lat grids '''
+        rows, cols = np.mgrid[0:200:1, 0:300:1]
+        lat = 70 + rows / 100. + cols / 1000.
+        lon = 20 + cols / 100. - rows / 2000.
+        masks = []
+        for step in [1, 10]:
+            f = Figure(np.random.rand(200, 300))
+            f.process(cmin=0., cmax=1., latGrid=lat[::step, ::step],
+                      lonGrid=lon[::step, ::step], latTicks=[71],
+                      lonTicks=[22], latlonStepSize=step)
+            masks.append(f.array[0] == f.numOfColor)
+
+        self.assertTrue(masks[1][100, 0])
+        self.assertTrue(masks[1][0, 200])
+        # lines reach the last column and the last row
+        self.assertTrue(masks[1][:, 299].any())
+        self.assertTrue(masks[1][199, :].any())
+        self.assertTrue((masks[0] * masks[1]).sum() > 0.5 * masks[1].sum())
+
     def test_get_tick_index_from_grid(self):
         ''' Should return indeces of pixel closest to ticks '''
         n = Nansat(self.test_file_gcps)
@@ -128,5 +149,93 @@ class FigureTest(unittest.TestCase):
         n.logger.error(str(lonTicksIdx))
         n.logger.error(str(latTicksIdx))
 
+    def test_process_keeps_input(self):
+        ''' Should render uint8 image with legend without changing input '''
+        array = np.linspace(0, 2, 2000).reshape(40, 50)
+        arrayCopy = array.copy()
+        f = Figure(array)
+        f.process(cmin=0., cmax=1., legend=True)
+
+        np.testing.assert_array_equal(array, arrayCopy)
+        self.assertEqual(f.array.dtype, np.uint8)
+        self.assertEqual(f.pilImg.size, (50, 44))
+        self.assertEqual(f.array[0, 0, 0], 0)
+        self.assertEqual(f.array[0, 39, 49], f.numOfColor - 1)
+
+    def test_apply_mask_keeps_input(self):
+        ''' Should color masked pixels without changing input '''
+        array = np.zeros((20, 30), 'uint8')
+        arrayCopy = array.copy()
+        maskArray = np.zeros((20, 30), 'uint8')
+        maskArray[:5] = 2
+        f = Figure(array, mask_array=maskArray, mask_lut={2: [255, 0, 0]})
+        f._create_palette()
+        f.apply_mask()
+
+        np.testing.assert_array_equal(array, arrayCopy)
+        self.assertEqual(f.array[0, 0, 0], f.numOfColor)
+        self.assertEqual(f.array[0, 19, 29], 0)
+
+    def test_renderer_render_many(self):
+        ''' Should save figures and reuse one legend '''
+        fileNames = [os.path.join(ntd.tmp_data_path,
+                                  'figure_renderer_%d.png' % i)
+                     for i in range(3)]
+        renderer = FigureRenderer(legend=True, caption='test', clim=[0, 1])
+        items = [(np.random.rand(50, 60), fileName) for fileName in fileNames]
+        items[2] += ({'clim': 'hist'}, )
+        result = renderer.render_many(items, workers=2)
+
+        self.assertEqual(result, fileNames)
+        for fileName in fileNames:
+            self.assertTrue(os.path.exists(fileName))
+
+        renderer.render(np.random.rand(50, 60))
+        renderer.render(np.random.rand(50, 60))
+        self.assertEqual(len(renderer.legendCache), 1)
+
+    def test_renderer_legend_cache_size(self):
+        ''' Should keep only the most recently used legends '''
+        renderer = FigureRenderer(legend=True, LEGEND_CACHE_SIZE=2)
+        array = np.random.rand(50, 60)
+        renderer.render(array, clim=[0, 1])
+        renderer.render(array, clim=[0, 2])
+        renderer.render(array, clim=[0, 1])
+        renderer.render(array, clim=[0, 3])
+
+        self.assertEqual(len(renderer.legendCache), 2)
+        self.assertEqual([key[3:5] for key in renderer.legendCache],
+                         [((0,), (1,)), ((0,), (3,))])
+
+        # same font from other path gives other legend
+        fontFileName = renderer.render(array, clim=[0, 3]).fontFileName
+        fontFileName2 = os.path.join(os.path.dirname(fontFileName),
+                                     os.curdir,
+                                     os.path.basename(fontFileName))
+        renderer.render(array, clim=[0, 3], fontFileName=fontFileName2)
+        self.assertEqual(len(renderer.legendCache), 2)
+        self.assertEqual([key[-1] for key in renderer.legendCache],
+                         [fontFileName, fontFileName2])
+
+    def test_save_transparent_png_with_legend(self):
+        ''' Should save transparent PNG as palette image with alpha '''
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'figure_transparent_legend.png')
+        array = np.random.rand(50, 60)
+        f = Figure(array)
+        f.process(cmin=0., cmax=1., legend=True, transparency=[0, 0, 0])
+        f.reprojMask = np.zeros(array.shape, bool)
+        f.reprojMask[-5:] = True
+        f.save(tmpfilename)
+
+        img = Image.open(tmpfilename)
+        self.assertEqual(img.mode, 'P')
+        self.assertIn('transparency', img.info)
+        alpha = np.array(img.convert('RGBA'))[:, :, 3]
+        self.assertEqual(alpha.shape[1], 60)
+        self.assertTrue(alpha.shape[0] > 50)
+        self.assertTrue((alpha[45:50] == 0).all())
+        self.assertTrue((alpha[:45] == 255).any())
+
 if __name__ == "__main__":
     unittest.main()
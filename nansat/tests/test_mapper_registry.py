@@ -0,0 +1,51 @@
+#------------------------------------------------------------------------------
+# Name:         test_mapper_registry.py
+# Purpose:      Test the declared capabilities of mappers
+#
+# Author:       Anton Korosov
+#
+# Created:      19.10.2026
+# Copyright:    (c) NERSC
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import unittest
+
+from nansat.mapper_registry import MAPPERS, is_candidate, get_missing_imports
+
+
+class MapperRegistryTest(unittest.TestCase):
+    def test_is_candidate(self):
+        self.assertTrue(is_candidate('mapper_netcdf_cf', '/data/file.nc'))
+        self.assertFalse(is_candidate('mapper_netcdf_cf', '/data/file.tif'))
+        self.assertTrue(is_candidate('mapper_gtopo30', '/data/gtopo30.vrt'))
+        self.assertTrue(is_candidate('mapper_viirs_l1',
+                                     '/data/GMTCO_npp_d20120101.h5'))
+
+    def test_is_candidate_undeclared(self):
+        self.assertFalse('mapper_generic' in MAPPERS)
+        self.assertTrue(is_candidate('mapper_generic', '/data/file.tif'))
+        self.assertTrue(is_candidate('mapper_user', '/data/file.tif'))
+
+    def test_is_candidate_driver(self):
+        MAPPERS['mapper_test'] = {'drivers': ['GTiff']}
+        try:
+            self.assertTrue(is_candidate('mapper_test', 'file.tif', 'GTiff'))
+            self.assertFalse(is_candidate('mapper_test', 'file.tif', 'HDF5'))
+            self.assertFalse(is_candidate('mapper_test', 'file.tif'))
+        finally:
+            MAPPERS.pop('mapper_test')
+
+    def test_get_missing_imports(self):
+        MAPPERS['mapper_test'] = {'imports': ['os', 'nonexisting_module']}
+        try:
+            self.assertEqual(get_missing_imports('mapper_test'),
+                             ['nonexisting_module'])
+        finally:
+            MAPPERS.pop('mapper_test')
+        self.assertEqual(get_missing_imports('mapper_generic'), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
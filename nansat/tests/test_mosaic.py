@@ -23,8 +23,8 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from nansat import Nansat, Domain, Mosaic
-from nansat.mosaic import Layer
-from nansat.tools import gdal
+from nansat.mosaic import Layer, Accumulator
+from nansat.tools import gdal, OptionError
 
 import nansat_test_data as ntd
 
@@ -59,6 +59,133 @@ class MosaicTest(unittest.TestCase):
         mo.set_metadata('time_coverage_start', '2016-01-19')
         mo.export2thredds(tmpfilename, bands)
 
+    def test_average_threads(self):
+        mo1 = Mosaic(domain=self.domain)
+        mo1.average([self.test_file_gcps, self.test_file_stere],
+                    bands=['L_645'])
+        mo2 = Mosaic(domain=self.domain)
+        mo2.average([self.test_file_gcps, self.test_file_stere],
+                    bands=['L_645'], threads=2)
+
+        np.testing.assert_allclose(mo1['L_645'], mo2['L_645'], rtol=1e-5)
+        np.testing.assert_allclose(mo1['L_645_std'], mo2['L_645_std'],
+                                   rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(mo1['mask'], mo2['mask'])
+
+    def test_update(self):
+        accFile = os.path.join(ntd.tmp_data_path, 'mosaic_accumulator.npz')
+        if os.path.exists(accFile):
+            os.remove(accFile)
+        mo1 = Mosaic(domain=self.domain)
+        added1 = mo1.update([self.test_file_gcps], accFile, bands=['L_645'])
+        mo2 = Mosaic(domain=self.domain)
+        added2 = mo2.update([self.test_file_gcps, self.test_file_stere],
+                            accFile, bands=['L_645'])
+        mo3 = Mosaic(domain=self.domain)
+        mo3.average([self.test_file_gcps, self.test_file_stere],
+                    bands=['L_645'])
+
+        self.assertEqual(added1, [self.test_file_gcps])
+        self.assertEqual(added2, [self.test_file_stere])
+        np.testing.assert_allclose(mo2['L_645'], mo3['L_645'], rtol=1e-5)
+        np.testing.assert_allclose(mo2['L_645_std'], mo3['L_645_std'],
+                                   rtol=1e-3, atol=1e-5)
+        np.testing.assert_allclose(mo2['mask'], mo3['mask'])
+
+    def test_update_threads_rejected(self):
+        accFile = os.path.join(ntd.tmp_data_path,
+                               'mosaic_accumulator_threads.npz')
+        if os.path.exists(accFile):
+            os.remove(accFile)
+        domain = Domain(4326, '-te 100 0 110 10 -ts 70 65')
+        mo1 = Mosaic(domain=domain)
+        added1 = mo1.update([self.test_file_gcps, self.test_file_stere],
+                            accFile, bands=['L_645'], threads=2)
+        accumulator = Accumulator(accFile)
+
+        self.assertEqual(added1, [])
+        self.assertEqual(accumulator.rejected,
+                         {self.test_file_gcps: 'overlap',
+                          self.test_file_stere: 'overlap'})
+        # rejected files are not opened again
+        mo2 = Mosaic(domain=domain)
+        mo2.update([self.test_file_gcps, self.test_file_stere], accFile,
+                   bands=['L_645'])
+        self.assertEqual(mo2.get_metadata('mosaic_files_overlap'), '0')
+
+    def test_update_accumulator_name(self):
+        accFile = os.path.join(ntd.tmp_data_path, 'mosaic_accumulator.dat')
+        if os.path.exists(accFile):
+            os.remove(accFile)
+        mo1 = Mosaic(domain=self.domain)
+        mo1.update([self.test_file_gcps], accFile, bands=['L_645'])
+        mo2 = Mosaic(domain=self.domain)
+        added2 = mo2.update([self.test_file_gcps], accFile, bands=['L_645'])
+
+        self.assertTrue(os.path.exists(accFile))
+        self.assertEqual(added2, [])
+        self.assertEqual(Accumulator(accFile).manifest, [self.test_file_gcps])
+
+    def test_accumulator_combine(self):
+        data = np.random.randn(6, 1, 10, 20)
+        mask = np.zeros((10, 20)) + 64
+        acc1 = Accumulator(shape=(10, 20), bands=['a'])
+        acc2 = Accumulator(shape=(10, 20), bands=['a'])
+        acc3 = Accumulator(shape=(10, 20), bands=['a'])
+        for i, layer in enumerate(data):
+            acc1.add_layer(layer, mask, fileName=str(i))
+            [acc2, acc3][i % 2].add_layer(layer, mask, fileName=str(i))
+        acc2.combine(acc3)
+
+        self.assertEqual(sorted(acc2.manifest), sorted(acc1.manifest))
+        np.testing.assert_allclose(acc2.get_mean(), acc1.get_mean())
+        np.testing.assert_allclose(acc2.get_std(), acc1.get_std())
+        np.testing.assert_allclose(acc2.get_std()[0], data.std(axis=0)[0])
+        with self.assertRaises(OptionError):
+            acc2.combine(Accumulator(shape=(10, 20), bands=['b']))
+
+    def test_average_layers_metadata(self):
+        mo = Mosaic(domain=self.domain)
+        mo.average([self.test_file_gcps], bands=['L_645'])
+
+        self.assertEqual(mo.get_metadata('mosaic_files_used'), '1')
+        self.assertEqual(mo.get_metadata('mosaic_files_period'), '0')
+        self.assertEqual(mo.get_metadata('mosaic_files_overlap'), '0')
+        self.assertTrue(float(mo.get_metadata('mosaic_time_used')) > 0)
+
+    def test_composite(self):
+        mo = Mosaic(domain=self.domain)
+        mo.composite([self.test_file_gcps, self.test_file_gcps],
+                     bands=['L_645'], mode='max', threads=2, blockSize=50)
+
+        L_645 = mo['L_645']
+        sourceIndex = mo['source_index']
+        self.assertEqual(L_645.shape, self.domain.shape())
+        self.assertEqual(sourceIndex.dtype, np.int32)
+        # equal values are taken from the first file
+        self.assertTrue(set(np.unique(sourceIndex)).issubset([-1, 0]))
+        self.assertTrue(np.any(sourceIndex == 0))
+        self.assertTrue(np.all(np.isnan(L_645[sourceIndex == -1])))
+        self.assertEqual(mo.get_metadata('composite_mode'), 'max')
+
+    def test_composite_wrong_mode(self):
+        mo = Mosaic(domain=self.domain)
+        with self.assertRaises(OptionError):
+            mo.composite([self.test_file_gcps], bands=['L_645'],
+                         mode='best')
+        with self.assertRaises(OptionError):
+            mo.composite([self.test_file_gcps], bands=['L_645'],
+                         mode='max', qualityBand='L_555')
+
+    def test_composite_latest_requires_time(self):
+        n = Nansat(self.test_file_gcps)
+        if n.get_metadata().get('time_coverage_start') is not None:
+            self.skipTest('Test file has time_coverage_start')
+        mo = Mosaic(domain=self.domain)
+        with self.assertRaises(OptionError):
+            mo.composite([self.test_file_gcps], bands=['L_645'],
+                         mode='latest')
+
     def test_median(self):
         mo = Mosaic(domain=self.domain)
         mo.median([self.test_file_gcps, self.test_file_stere],
@@ -80,6 +207,26 @@ class MosaicTest(unittest.TestCase):
         mo.set_metadata('time_coverage_start', '2016-01-19')
         mo.export2thredds(tmpfilename, bands)
 
+    def test_median_memmap(self):
+        mo1 = Mosaic(domain=self.domain)
+        mo1.median([self.test_file_gcps, self.test_file_stere],
+                   bands=['L_645'])
+        mo2 = Mosaic(domain=self.domain)
+        mo2.median([self.test_file_gcps, self.test_file_stere],
+                   bands=['L_645'], tmpDir=ntd.tmp_data_path,
+                   memoryLimit=100000)
+
+        np.testing.assert_allclose(mo1['L_645'], mo2['L_645'])
+        np.testing.assert_allclose(mo1['mask'], mo2['mask'])
+
+    def test_percentile(self):
+        mo = Mosaic(domain=self.domain)
+        mo.percentile([self.test_file_gcps, self.test_file_stere],
+                      bands=['L_645'], q=90, tmpDir=ntd.tmp_data_path)
+
+        self.assertTrue(mo.has_band('L_645_p90'))
+        self.assertEqual(mo['L_645_p90'].shape, (650, 700))
+
 class LayerTest(unittest.TestCase):
     def setUp(self):
         self.domain = Domain(4326, '-lle 27 70 31 72 -ts 700 650')
@@ -101,6 +248,24 @@ class LayerTest(unittest.TestCase):
         self.assertEqual(type(l.n), Nansat)
         self.assertEqual(l.n.shape(), (200, 200))
 
+    def test_make_nansat_object_no_overlap(self):
+        ''' Mosaic.Layer should skip file which does not overlap domain '''
+        l = Layer(self.test_file_gcps)
+        status = l.make_nansat_object(Domain(4326, '-te 100 0 110 10 '
+                                                   '-ts 70 65'))
+
+        self.assertEqual(status, 'overlap')
+        self.assertEqual(l.n.shape(), (200, 200))
+
+    def test_make_nansat_object_out_of_period(self):
+        ''' Mosaic.Layer should skip file which is out of period '''
+        l = Layer(self.test_file_gcps,
+                  period=(datetime.datetime(2016, 1, 1), None))
+        status = l.make_nansat_object(self.domain)
+
+        self.assertEqual(status, 'period')
+        self.assertEqual(l.n.shape(), (200, 200))
+
     def test_get_mask(self):
         '''Mosaic.Layer should get mask from reprojected file '''
         n = Nansat(self.test_file_gcps)
@@ -21,10 +21,16 @@ from xml.sax.saxutils import unescape
 
 import matplotlib.pyplot as plt
 import numpy as np
+from PIL import Image
 from scipy.io.netcdf import netcdf_file
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
 
 from nansat import Nansat, Domain, NSR
 from nansat.tools import gdal, OptionError
+import nansat.nansat as nansat_module
 
 import nansat_test_data as ntd
 from __builtin__ import int
@@ -50,6 +56,14 @@ class NansatTest(unittest.TestCase):
         self.assertTrue((n.vrt.dataset.GetGCPProjection()
                                             .startswith('GEOGCS["WGS 84",')))
 
+    def test_open_imports_candidate_mappers_only(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+
+        self.assertEqual(type(n), Nansat)
+        # VIIRS mapper cannot open tif files and is not imported
+        self.assertTrue(hasattr(
+            nansat_module.nansatMappers['mapper_viirs_l1'], 'load_module'))
+
     def test_get_time_coverage_start_end(self):
         n = Nansat(self.test_file_gcps, logLevel=40)
         n.set_metadata('time_coverage_start', '2016-01-20')
@@ -237,6 +251,70 @@ class NansatTest(unittest.TestCase):
         np.testing.assert_allclose(lon0, lon1)
         np.testing.assert_allclose(lat0, lat1)
 
+    @unittest.skipIf(netCDF4 is None, 'netCDF4 is not installed')
+    def test_export_netcdf4_gcps(self):
+        n0 = Nansat(self.test_file_gcps, logLevel=40)
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export_netcdf4_gcps.nc')
+        n0.export_netcdf4(tmpfilename, chunksizes=(50, 50), blockSize=30)
+
+        ncf = netCDF4.Dataset(tmpfilename)
+        self.assertTrue('GCPPixel' in ncf.variables)
+        self.assertEqual(ncf.variables['L_469'].chunking(), [50, 50])
+        self.assertTrue(ncf.variables['L_469'].filters()['zlib'])
+        ncf.close()
+
+        n1 = Nansat(tmpfilename)
+        np.testing.assert_allclose(n0['L_469'], n1['L_469'])
+        lon0, lat0 = n0.get_geolocation_grids()
+        lon1, lat1 = n1.get_geolocation_grids()
+        np.testing.assert_allclose(lon0, lon1)
+        np.testing.assert_allclose(lat0, lat1)
+
+    @unittest.skipIf(netCDF4 is None, 'netCDF4 is not installed')
+    def test_export_netcdf4_geotransform(self):
+        n0 = Nansat(self.test_file_stere, logLevel=40)
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export_netcdf4_stere.nc')
+        n0.export_netcdf4(tmpfilename, bands=[1],
+                          varOptions={n0.bands()[1]['name']:
+                                      {'complevel': 9}})
+
+        n1 = Nansat(tmpfilename)
+        np.testing.assert_allclose(n0[1], n1[1])
+        np.testing.assert_allclose(n0.vrt.dataset.GetGeoTransform(),
+                                   n1.vrt.dataset.GetGeoTransform())
+
+    def test_export_workers(self):
+        n0 = Nansat(self.test_file_gcps, logLevel=40)
+        n0.reproject(Domain(4326, '-lle 27 70 31 72 -ts 300 200'))
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export_workers.nc')
+        n0.export(tmpfilename, workers=3, blockSize=16)
+
+        n1 = Nansat(tmpfilename)
+        for band in ['L_469', 'L_555', 'L_645']:
+            np.testing.assert_allclose(n0[band], n1[band])
+        self.assertEqual(n0.get_metadata('time_coverage_start'),
+                         n1.get_metadata('time_coverage_start'))
+
+    def test_export_workers_gtiff(self):
+        n0 = Nansat(self.test_file_gcps, logLevel=40)
+        n0.reproject(Domain(4326, '-lle 27 70 31 72 -ts 300 200'))
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export_workers.tif')
+        bands = ['L_469', 'L_555', 'L_645']
+        n0.export(tmpfilename, bands=bands, driver='GTiff', workers=3,
+                  blockSize=16)
+
+        ds = gdal.Open(tmpfilename)
+        self.assertEqual(ds.RasterCount, 3)
+        for i, band in enumerate(bands):
+            np.testing.assert_allclose(n0[band],
+                                       ds.GetRasterBand(i + 1).ReadAsArray())
+            self.assertEqual(ds.GetRasterBand(i + 1).GetMetadata()['name'],
+                             band)
+
     def test_export_gcps_complex_to_netcdf(self):
         ''' Should export file with GCPs and write correct complex bands'''
         n0 = Nansat(self.test_file_gcps, logLevel=40)
@@ -273,6 +351,120 @@ class NansatTest(unittest.TestCase):
 
         self.assertTrue(os.path.exists(tmpfilename))
 
+    def test_export_cog(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        tmpfilename = os.path.join(ntd.tmp_data_path, 'nansat_export_cog.tif')
+        n.export_cog(tmpfilename, bands=['L_645', 'L_555'], blocksize=64)
+
+        g = gdal.Open(tmpfilename)
+        self.assertEqual(g.RasterCount, 2)
+        self.assertEqual(g.GetRasterBand(1).GetBlockSize(), [64, 64])
+        self.assertEqual(g.GetRasterBand(1).GetOverviewCount(), 2)
+        np.testing.assert_allclose(g.GetRasterBand(1).ReadAsArray(),
+                                   n['L_645'])
+        g = None
+        os.unlink(tmpfilename)
+
+    def test_export_cog_overview_factors(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        tmpdirname = os.path.join(ntd.tmp_data_path, 'nansat_export_cog')
+        if not os.path.exists(tmpdirname):
+            os.makedirs(tmpdirname)
+        tmpfilename = os.path.join(tmpdirname, 'nansat_export_cog.tif')
+        n.export_cog(tmpfilename, bands=['L_645'], blocksize=64,
+                     overviews=[2, 4, 8])
+
+        g = gdal.Open(tmpfilename)
+        band = g.GetRasterBand(1)
+        self.assertEqual(band.GetOverviewCount(), 3)
+        self.assertEqual(band.GetOverview(2).XSize, 25)
+        g = None
+        # temporary file is removed
+        self.assertEqual(os.listdir(tmpdirname), ['nansat_export_cog.tif'])
+        with self.assertRaises(OptionError):
+            n.export_cog(tmpfilename, overviews=4)
+
+    def test_export_store(self):
+        n0 = Nansat(self.test_file_gcps, logLevel=40)
+        tmpdirname = os.path.join(ntd.tmp_data_path, 'nansat_export_store')
+        n0.export_store(tmpdirname, bands=['L_469', 'L_555'],
+                        chunks=(64, 48))
+
+        self.assertTrue(os.path.exists(os.path.join(tmpdirname,
+                                                    'nansat_store.json')))
+        self.assertTrue(os.path.exists(os.path.join(tmpdirname, 'band_001',
+                                                    '0.0.tif')))
+        # edge chunks have true size
+        edgeChunk = gdal.Open(os.path.join(tmpdirname, 'band_001', '%d.%d.tif'
+                                           % (n0.shape()[0] / 64,
+                                              n0.shape()[1] / 48)))
+        self.assertEqual((edgeChunk.RasterYSize, edgeChunk.RasterXSize),
+                         (n0.shape()[0] % 64, n0.shape()[1] % 48))
+        n1 = Nansat(tmpdirname)
+        self.assertEqual(n1.mapper, 'chunked_store')
+        np.testing.assert_allclose(n0['L_469'], n1['L_469'])
+        np.testing.assert_allclose(n0['L_555'][50:120, 10:150:2],
+                                   n1['L_555', 50:120, 10:150:2])
+        self.assertEqual(len(n0.vrt.dataset.GetGCPs()),
+                         len(n1.vrt.dataset.GetGCPs()))
+
+    def test_getitem_window(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+
+        np.testing.assert_allclose(n[1, 10:20, 30:-5], n[1][10:20, 30:-5])
+        np.testing.assert_allclose(n[1, 15], n[1][15])
+        self.assertEqual(n[1, 15].shape, (n.shape()[1], ))
+        self.assertEqual(n[1, 15, 2:4].shape, (2, ))
+        self.assertEqual(n[1, 15, -1], n[1][15, -1])
+        np.testing.assert_allclose(n['L_469', ::3], n['L_469'][::3])
+        np.testing.assert_allclose(n[1, ::10, ::10], n[1][::10, ::10])
+        np.testing.assert_allclose(n[1, 5::7, 2:-3:4], n[1][5::7, 2:-3:4])
+
+    def test_getitem_window_overviews(self):
+        n0 = Nansat(self.test_file_gcps, logLevel=40)
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_getitem_window_cog.tif')
+        n0.export_cog(tmpfilename, bands=['L_645'], blocksize=64)
+        n1 = Nansat(tmpfilename, logLevel=40)
+
+        self.assertTrue(n1.get_GDALRasterBand(1).GetOverviewCount() > 0)
+        np.testing.assert_array_equal(n1[1, ::2, ::2], n1[1][::2, ::2])
+        np.testing.assert_array_equal(n1[1, 5::7, 2:-3:4],
+                                      n1[1][5::7, 2:-3:4])
+        n1 = None
+        os.unlink(tmpfilename)
+
+    def test_getitem_window_swathmask(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        n.add_band(n[1].astype('float32'), {'name': 'float'})
+        n.reproject(Domain(4326, '-lle 27 70 31 72 -ts 130 120'))
+
+        np.testing.assert_allclose(n['float', 3::5, ::4],
+                                   n['float'][3::5, ::4])
+
+    def test_export_to_input_file(self):
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export_to_input_file.tif')
+        gdal.GetDriverByName('GTiff').CreateCopy(
+                                    tmpfilename, gdal.Open(self.test_file_gcps))
+        n = Nansat(tmpfilename, logLevel=40)
+        b3 = n[3]
+        halved = (n[1] // 2).astype(n[1].dtype)
+        n.add_band(halved, {'name': 'halved'})
+        n.export(tmpfilename, bands=[3, 'halved'], driver='GTiff')
+
+        self.assertEqual(n.vrt.dataset.RasterCount, 2)
+        np.testing.assert_allclose(n[1], b3)
+        np.testing.assert_allclose(n[2], halved)
+        # temporary file is renamed
+        self.assertFalse(any([f.startswith('.nansat_export_to_input_file')
+                              for f in os.listdir(ntd.tmp_data_path)]))
+        n2 = Nansat(tmpfilename, logLevel=40)
+        self.assertEqual(n2.vrt.dataset.RasterCount, 2)
+        np.testing.assert_allclose(n2[1], b3)
+        np.testing.assert_allclose(n2[2], halved)
+        os.unlink(tmpfilename)
+
     def test_export_band(self):
         n = Nansat(self.test_file_gcps, logLevel=40)
         tmpfilename = os.path.join(ntd.tmp_data_path,
@@ -437,6 +629,47 @@ class NansatTest(unittest.TestCase):
         self.assertTrue(ncIVar.grid_mapping in ncI.variables.keys())
         self.assertEqual(ncIVar[:].dtype, np.int8)
 
+    def _export2thredds_append(self, tmpfilename):
+        d = Domain("+proj=stere +lat_0=90 +lat_ts=70 +lon_0=0 +datum=WGS84",
+                   "-te -100000 -1900000 100000 -1700000 -ts 100 50")
+        if os.path.exists(tmpfilename):
+            os.unlink(tmpfilename)
+        for day in [19, 20]:
+            n = Nansat(domain=d)
+            n.add_band(np.zeros(d.shape(), np.float32) + day,
+                       parameters={'name': 'L_469'})
+            n.set_metadata('time_coverage_start', '2016-01-%d' % day)
+            n.export2thredds(tmpfilename, {'L_469': {'type': '>i2'}},
+                             append=True, blockSize=20)
+
+        ncI = netcdf_file(tmpfilename, 'r')
+        days = (datetime.datetime(2016, 1, 19) -
+                datetime.datetime(1900, 1, 1)).days
+        self.assertEqual(ncI.variables['time'].shape, (2, ))
+        self.assertEqual(list(ncI.variables['time'][:]), [days, days + 1])
+        self.assertEqual(ncI.variables['L_469'].shape, (2, 50, 100))
+        self.assertEqual(ncI.variables['L_469'][1, 0, 0], 20)
+        self.assertEqual(ncI.variables['L_469'].grid_mapping,
+                         'polar_stereographic')
+        self.assertEqual(ncI.variables['lon'].shape, (50, 100))
+        ncI.close()
+        os.unlink(tmpfilename)
+
+    def test_export2thredds_append(self):
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export2thredds_append.nc')
+        self._export2thredds_append(tmpfilename)
+
+    def test_export2thredds_append_scipy(self):
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_export2thredds_append_scipy.nc')
+        netCDF4 = nansat_module.netCDF4
+        nansat_module.netCDF4 = None
+        try:
+            self._export2thredds_append(tmpfilename)
+        finally:
+            nansat_module.netCDF4 = netCDF4
+
     def test_resize_by_pixelsize(self):
         n = Nansat(self.test_file_gcps, logLevel=40)
         n.resize(pixelsize=500, eResampleAlg=1)
@@ -627,6 +860,92 @@ class NansatTest(unittest.TestCase):
         self.assertEqual(n1.shape()[1], n2.shape()[1] * 2)
         self.assertEqual(type(n1[1]), np.ndarray)
 
+    def test_reproject_tiled(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        d = Domain(4326, "-te 27 70 30 72 -ts 500 500")
+        shape = n.shape()
+        a = n.reproject_tiled(d, tile=(200, 200), bands=[1])
+        self.assertEqual(n.shape(), shape)
+        n.reproject(d)
+        b = n[1]
+
+        self.assertEqual(a.shape, (1, 500, 500))
+        self.assertTrue(np.allclose(a[0][np.isfinite(b)],
+                                    b[np.isfinite(b)]))
+
+    def test_reproject_tiled_to_file(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        d = Domain(4326, "-te 27 70 30 72 -ts 500 500")
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_reproject_tiled.tif')
+        shape = n.shape()
+        n.reproject_tiled(d, tile=(256, 256), out=tmpfilename)
+        n2 = Nansat(tmpfilename, logLevel=40)
+
+        self.assertEqual(n2.shape(), (500, 500))
+        self.assertEqual(n.shape(), shape)
+        self.assertEqual(n2.vrt.dataset.RasterCount,
+                         n.vrt.dataset.RasterCount)
+
+    def test_reproject_tiled_skipped_tiles_netcdf(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        d = Domain(4326, "-te 10 60 40 80 -ts 200 200")
+        tmpfilename = unicode(os.path.join(ntd.tmp_data_path,
+                                           'nansat_reproject_tiled.nc'))
+        n.reproject_tiled(d, tile=(50, 50), out=tmpfilename, bands=[1],
+                          driver='netCDF')
+        a = gdal.Open(tmpfilename).ReadAsArray()
+
+        self.assertEqual(a.shape, (200, 200))
+        # tile in the corner does not overlap the object and is skipped
+        self.assertTrue(np.isnan(a[:50, :50]).all())
+        self.assertTrue(np.isfinite(a).any())
+
+    def test_bin_to_domain(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        d = Domain(4326, "-te 27 70 30 72 -ts 50 50")
+        b = n.bin_to_domain(d, [1], ['mean', 'count', 'min', 'max', 'std'],
+                            blockSize=50)
+        name = n.get_metadata(bandID=1)['name']
+        mean = b[name]
+        count = b[name + '_count']
+
+        self.assertEqual(type(b), Nansat)
+        self.assertEqual(b.shape(), (50, 50))
+        self.assertTrue(count.sum() > 0)
+        self.assertTrue(count.sum() <= n.shape()[0] * n.shape()[1])
+        self.assertTrue(np.all(np.isnan(mean[count == 0])))
+        self.assertTrue(np.all(b[name + '_min'][count > 0] <=
+                               mean[count > 0] + 1e-3))
+        self.assertTrue(np.all(b[name + '_max'][count > 0] >=
+                               mean[count > 0] - 1e-3))
+        self.assertTrue(np.all(b[name + '_std'][count > 0] >= 0))
+
+    def test_bin_to_domain_std_offset(self):
+        np.random.seed(0)
+        array = 1e6 + np.random.randn(200, 300) * 0.01
+        n = Nansat(domain=Domain(4326, '-te 27 70 30 72 -ts 300 200'),
+                   array=array, parameters={'name': 'bt'}, logLevel=40)
+        d = Domain(4326, '-te 27 70 30 72 -ts 30 20')
+        b = n.bin_to_domain(d, ['bt'], ['mean', 'count', 'std'],
+                            blockSize=15)
+        cells = array.reshape(20, 10, 30, 10)
+
+        np.testing.assert_array_equal(b['bt_count'], 100)
+        np.testing.assert_allclose(b['bt'], cells.mean(axis=3).mean(axis=1),
+                                   rtol=1e-6)
+        np.testing.assert_allclose(b['bt_std'],
+                                   cells.transpose(0, 2, 1, 3).reshape(
+                                            20, 30, 100).std(axis=2),
+                                   rtol=1e-4)
+
+    def test_bin_to_domain_wrong_stat(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        d = Domain(4326, "-te 27 70 30 72 -ts 50 50")
+
+        with self.assertRaises(OptionError):
+            n.bin_to_domain(d, [1], ['median'])
+
     def test_undo(self):
         n1 = Nansat(self.test_file_stere, logLevel=40)
         shape1 = n1.shape()
@@ -676,6 +995,69 @@ class NansatTest(unittest.TestCase):
 
         self.assertTrue(os.path.exists(tmpfilename))
 
+    def test_write_geotiffimage_no_valid_values(self):
+        n1 = Nansat(self.test_file_stere, logLevel=40)
+        n1.add_band(np.zeros(n1.shape(), np.float32) + np.nan,
+                    {'name': 'nanBand'})
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansat_write_geotiffimage_nan.tif')
+
+        with self.assertRaises(OptionError):
+            n1.write_geotiffimage(tmpfilename, 'nanBand')
+
+    def test_write_tiles(self):
+        n = Nansat(self.test_file_gcps, logLevel=40)
+        tmpdirname = os.path.join(ntd.tmp_data_path, 'nansat_write_tiles')
+        shape = n.shape()
+        tiles = n.write_tiles(tmpdirname, 'L_645', [3, 4, 5],
+                              clim=[0, 100], workers=2)
+
+        self.assertEqual(n.shape(), shape)
+        self.assertEqual(sorted(set(tile[0] for tile in tiles)), [3, 4, 5])
+        for zoom, x, y in tiles:
+            fileName = os.path.join(tmpdirname, str(zoom), str(x),
+                                    '%d.png' % y)
+            self.assertTrue(os.path.exists(fileName))
+        self.assertTrue(os.path.exists(os.path.join(tmpdirname, '3', '4',
+                                                    '1.png')))
+        # pixels without data are transparent
+        image = Image.open(os.path.join(tmpdirname, '3', '4', '1.png'))
+        alpha = np.array(image.convert('RGBA'))[:, :, 3]
+        self.assertTrue((alpha == 0).any())
+        self.assertTrue((alpha == 255).any())
+        # pixels of lower zoom are averages of 2 x 2 pixels of higher zoom
+        zoom, x, y = [tile for tile in tiles if tile[0] == 4][0]
+        parent = np.array(Image.open(os.path.join(tmpdirname, '4', str(x),
+                                                  '%d.png' % y)))
+        children = np.zeros((512, 512)) + np.nan
+        for dy in [0, 1]:
+            for dx in [0, 1]:
+                fileName = os.path.join(tmpdirname, '5', str(2 * x + dx),
+                                        '%d.png' % (2 * y + dy))
+                if os.path.exists(fileName):
+                    children[dy * 256:(dy + 1) * 256,
+                             dx * 256:(dx + 1) * 256] = np.array(
+                                                    Image.open(fileName))
+        children = children.reshape(256, 2, 256, 2)
+        # compare only pixels where children are valid and not clipped
+        # (transparent index is above the last color index)
+        with np.errstate(invalid='ignore'):
+            valid = (children < 249).all(axis=3).all(axis=1)
+        self.assertTrue(valid.any())
+        np.testing.assert_allclose(parent[valid],
+                                   children.mean(axis=3).mean(axis=1)[valid],
+                                   atol=1)
+
+    def test_get_border_tiles_antimeridian(self):
+        lon = [170, 180, -170, -170, 180, 170]
+        lat = [60, 60, 60, 70, 70, 70]
+        tiles = nansat_module._get_border_tiles(lon, lat, 3)
+        tiles27 = nansat_module._get_border_tiles([27, 31, 31, 27],
+                                                  [70, 70, 72, 72], 3)
+
+        self.assertEqual(sorted(set(tile[1] for tile in tiles)), [0, 7])
+        self.assertEqual(sorted(set(tile[1] for tile in tiles27)), [4])
+
     def test_get_metadata(self):
         n1 = Nansat(self.test_file_stere, logLevel=40)
         m = n1.get_metadata()
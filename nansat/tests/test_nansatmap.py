@@ -82,6 +82,23 @@ class NansatmapTest(unittest.TestCase):
 
         self.assertTrue(os.path.exists(tmpfilename))
 
+    def test_step_size(self):
+        ''' Should plot full size data and bands on the reduced grid '''
+        n = Nansat(self.test_file_stere, logLevel=40)
+        b1 = n[1]
+        nmap = Nansatmap(n, stepSize=4)
+        nmap.pcolormesh(b1)
+        nmap.contour(1, smooth=True)
+        nmap.quiver(b1, b1, step=20)
+        tmpfilename = os.path.join(ntd.tmp_data_path,
+                                   'nansatmap_step_size.png')
+        nmap.save(tmpfilename)
+
+        self.assertEqual(nmap.lon.shape, b1[::4, ::4].shape)
+        self.assertEqual(nmap._get_data(b1).shape, nmap.lon.shape)
+        np.testing.assert_array_equal(nmap._get_data(1), b1[::4, ::4])
+        self.assertTrue(os.path.exists(tmpfilename))
+
     def test_add_labels(self):
         size, npo = 100, 10
         xy = np.random.randint(0, size, npo*2).reshape(npo, 2)
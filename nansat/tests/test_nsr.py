@@ -72,3 +72,22 @@ class NSRTest(unittest.TestCase):
     def test_dont_init_from_invalid(self):
         self.assertRaises(ProjectionError, NSR, -10)
         self.assertRaises(ProjectionError, NSR, 'some crap')
+
+    def test_get_cf_grid_mapping_longlat(self):
+        name, attributes = NSR(4326).get_cf_grid_mapping()
+
+        self.assertEqual(name, 'latitude_longitude')
+        self.assertEqual(attributes['grid_mapping_name'], name)
+        self.assertAlmostEqual(attributes['semi_major_axis'], 6378137)
+
+    def test_get_cf_grid_mapping_polar_stereographic(self):
+        nsr = NSR('+proj=stere +lat_0=90 +lat_ts=70 +lon_0=-45 '
+                  '+datum=WGS84 +units=m +no_defs')
+        name, attributes = nsr.get_cf_grid_mapping()
+
+        self.assertEqual(name, 'polar_stereographic')
+        self.assertEqual(attributes['latitude_of_projection_origin'], 90)
+        self.assertEqual(attributes['standard_parallel'], 70)
+        self.assertEqual(
+            attributes['straight_vertical_longitude_from_pole'], -45)
+        self.assertEqual(attributes['spatial_ref'], nsr.wkt)
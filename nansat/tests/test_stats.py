@@ -0,0 +1,131 @@
+#------------------------------------------------------------------------------
+# Name:         test_stats.py
+# Purpose:      Test the streaming histogram and percentiles
+#
+# Author:       Anton Korosov
+#
+# Created:      19.10.2026
+# Copyright:    (c) NERSC
+# Licence:      This file is part of NANSAT. You can redistribute it or modify
+#               under the terms of GNU General Public License, v.3
+#               http://www.gnu.org/licenses/gpl-3.0.html
+#------------------------------------------------------------------------------
+import unittest
+
+import numpy as np
+
+from nansat.stats import StreamingHistogram, get_histogram, percentile
+from nansat.tools import OptionError
+
+
+class StatsTest(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.array = np.random.randn(500, 400)
+        self.array[10, 10] = np.nan
+        self.array[20, 20] = np.inf
+
+    def test_percentile(self):
+        valid = self.array[np.isfinite(self.array)]
+        values = percentile(self.array, [0, 5, 50, 95, 100])
+        expected = np.percentile(valid, [0, 5, 50, 95, 100])
+
+        self.assertEqual(values[0], valid.min())
+        self.assertEqual(values[-1], valid.max())
+        np.testing.assert_allclose(values, expected, atol=0.01)
+
+    def test_percentile_subset(self):
+        value = percentile(self.array, 50, subsetArraySize=1000)
+
+        self.assertTrue(isinstance(value, float))
+        self.assertAlmostEqual(value, 0, 1)
+
+    def test_percentile_mask(self):
+        mask = np.zeros(self.array.shape, bool)
+        mask[self.array > 0] = True
+        value = percentile(self.array, 100, mask=mask)
+
+        self.assertTrue(value <= 0)
+
+    def test_update_widens_range(self):
+        hist = StreamingHistogram(10)
+        hist.update(np.arange(10))
+        hist.update([-100, 1000])
+
+        self.assertEqual(hist.count, 12)
+        self.assertEqual(hist.counts.sum(), 12)
+        self.assertEqual(hist.min, -100)
+        self.assertEqual(hist.max, 1000)
+        self.assertTrue(hist.edges[0] <= -100)
+        self.assertTrue(hist.edges[-1] >= 1000)
+
+    def test_percentile_outliers(self):
+        uniform = np.random.uniform(0, 1, (500, 400))
+        for outlier in [1e6, -9999]:
+            array = uniform.copy()
+            array[100, 100] = outlier
+            values = percentile(array, [0, 2.5, 97.5, 100])
+
+            np.testing.assert_allclose(values[1:3], [0.025, 0.975],
+                                       atol=0.005)
+            self.assertEqual(values[0], min(uniform.min(), outlier))
+            self.assertEqual(values[-1], max(uniform.max(), outlier))
+
+    def test_percentile_skewed(self):
+        array = np.random.lognormal(size=(1000, 600)).astype('float32')
+        for outlier in [None, 1e9]:
+            if outlier is not None:
+                array[100, 100] = outlier
+            values = percentile(array, [2.5, 97.5])
+
+            np.testing.assert_allclose(values,
+                                       np.percentile(array, [2.5, 97.5]),
+                                       rtol=0.001)
+
+    def test_tail_size(self):
+        array = np.random.lognormal(size=100000)
+        hist = StreamingHistogram(10, binRange=[0, 1], tailSize=1000)
+        for chunk in np.array_split(array, 10):
+            hist.update(chunk)
+
+        self.assertTrue(hist.tails['high'].size <= 1000)
+        self.assertTrue(hist.tailSteps['high'] > 1)
+        np.testing.assert_allclose(hist.percentile(90),
+                                   np.percentile(array, 90), rtol=0.02)
+
+    def test_fixed_range(self):
+        hist = StreamingHistogram(10, binRange=[0, 10])
+        hist.update(np.arange(10) + 0.5)
+        hist.update([-100, 1000, 1e6])
+
+        self.assertEqual(hist.count, 13)
+        self.assertEqual(hist.underflow, 1)
+        self.assertEqual(hist.overflow, 2)
+        np.testing.assert_array_equal(hist.counts, np.ones(10))
+        self.assertEqual(hist.edges[-1], 10)
+        self.assertEqual(hist.percentile(0), -100)
+        self.assertEqual(hist.percentile(100), 1e6)
+        np.testing.assert_array_equal(hist.tails['high'], [1000, 1e6])
+        with self.assertRaises(OptionError):
+            StreamingHistogram(10, binRange=[1, 1])
+
+    def test_get_histogram_blocks(self):
+        hist1 = get_histogram(self.array, blockSize=7)
+        hist2 = get_histogram(self.array)
+
+        self.assertEqual(hist1.count, self.array.size - 2)
+        self.assertEqual(hist1.min, hist2.min)
+        self.assertEqual(hist1.max, hist2.max)
+
+    def test_empty(self):
+        self.assertEqual(percentile(np.zeros((2, 2)) + np.nan, 50), None)
+
+    def test_wrong_input(self):
+        with self.assertRaises(OptionError):
+            StreamingHistogram(11)
+        with self.assertRaises(OptionError):
+            get_histogram(self.array).percentile(101)
+
+
+if __name__ == "__main__":
+    unittest.main()
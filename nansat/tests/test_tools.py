@@ -15,8 +15,11 @@
 import unittest
 import datetime
 
+import numpy as np
 from matplotlib.colors import hex2color
-from nansat.tools import get_random_color, parse_time
+import nansat.tools
+from nansat.tools import get_random_color, parse_time, transform_coordinates
+from nansat.nsr import NSR
 
 class ToolsTest(unittest.TestCase):
     def test_get_random_color(self):
@@ -38,3 +41,23 @@ class ToolsTest(unittest.TestCase):
         dt = parse_time('2016-01-19Z')
 
         self.assertEqual(type(dt), datetime.datetime)
+
+    def test_transform_coordinates(self):
+        srcSRS = NSR('+proj=stere +datum=WGS84 +ellps=WGS84 +lat_0=75 '
+                     '+lon_0=10 +no_defs')
+        x, y = np.meshgrid(np.linspace(-1e5, 1e5, 4), np.linspace(0, 1e5, 3))
+        lon, lat = transform_coordinates(srcSRS, NSR(), x, y)
+        pyproj = nansat.tools.pyproj
+        try:
+            # transformation by osr
+            nansat.tools.pyproj = None
+            lon2, lat2 = transform_coordinates(srcSRS, NSR(), x, y)
+        finally:
+            nansat.tools.pyproj = pyproj
+
+        self.assertEqual(lon.shape, (3, 4))
+        np.testing.assert_allclose(lon, lon2)
+        np.testing.assert_allclose(lat, lat2)
+        # symmetric around lon_0
+        self.assertAlmostEqual(lon[0, 1] + lon[0, 2], 20)
+        self.assertTrue((lat > 70).all())
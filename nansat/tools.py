@@ -32,6 +32,12 @@ try:
 except:
     from osgeo import gdal, ogr, osr
 
+# pyproj (optional) transforms numpy arrays of coordinates at once
+try:
+    import pyproj
+except ImportError:
+    pyproj = None
+
 # Force GDAL to raise exceptions
 try:
     gdal.UseExceptions()
@@ -184,6 +190,48 @@ def haversine(lon1, lat1, lon2, lat2):
     return distance_meters
 
 
+def transform_coordinates(srcSRS, dstSRS, x, y):
+    '''Transform arrays of coordinates from srcSRS into dstSRS
+
+    The arrays are transformed at once with pyproj.Transformer if pyproj
+    is installed. Otherwise osr.CoordinateTransformation.TransformPoints()
+    is used. Coordinates are always in x/y (lon/lat) order.
+
+    Parameters
+    -----------
+    srcSRS, dstSRS : osr.SpatialReference (e.g. NSR)
+        source and destination spatial references
+    x, y : numpy arrays
+        coordinates in srcSRS (same shape)
+
+    Returns
+    --------
+    x, y : numpy arrays
+        coordinates in dstSRS (same shape as input)
+
+    '''
+    x = np.asarray(x, 'float64')
+    y = np.asarray(y, 'float64')
+    if pyproj is not None and hasattr(pyproj, 'Transformer'):
+        transformer = pyproj.Transformer.from_crs(srcSRS.ExportToWkt(),
+                                                  dstSRS.ExportToWkt(),
+                                                  always_xy=True)
+        xOut, yOut = transformer.transform(x, y)
+        return (np.asarray(xOut).reshape(x.shape),
+                np.asarray(yOut).reshape(y.shape))
+
+    # change axis order of copies, not of the caller's SRS
+    srcSRS = osr.SpatialReference(srcSRS.ExportToWkt())
+    dstSRS = osr.SpatialReference(dstSRS.ExportToWkt())
+    for srs in [srcSRS, dstSRS]:
+        if hasattr(srs, 'SetAxisMappingStrategy'):
+            srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    transformation = osr.CoordinateTransformation(srcSRS, dstSRS)
+    xy = np.array(transformation.TransformPoints(
+                                    np.array([x.flatten(), y.flatten()]).T))
+    return xy[:, 0].reshape(x.shape), xy[:, 1].reshape(y.shape)
+
+
 def add_logger(logName='', logLevel=None):
     ''' Creates and returns logger with default formatting for Nansat
 